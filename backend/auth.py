@@ -1,6 +1,12 @@
 # auth.py
 
+import asyncio
+import hashlib
+import json
 import os
+import time
+from collections import OrderedDict
+from typing import Optional
 
 import httpx
 from dotenv import load_dotenv
@@ -19,8 +25,23 @@ CLERK_JWKS_URL = os.getenv(
     "CLERK_JWKS_URL", ""
 )  # آدرس برای دریافت کلیدهای عمومی (JWKS)
 
+# تنظیمات کش کلیدهای عمومی (بر حسب ثانیه)
+JWKS_CACHE_TTL = float(os.getenv("CLERK_JWKS_CACHE_TTL", "3600"))  # عمر تازگی کش
+# تا این مدت پس از انقضا، کلیدهای قدیمی در صورت در دسترس نبودن Clerk استفاده میشوند
+JWKS_STALE_TTL = float(os.getenv("CLERK_JWKS_STALE_TTL", "86400"))
+# حداقل فاصله بین دو دریافت اجباری (برای kid ناشناخته)
+JWKS_MIN_REFRESH_INTERVAL = float(os.getenv("CLERK_JWKS_MIN_REFRESH_INTERVAL", "30"))
+
+# تنظیمات کش توکن‌های اعتبارسنجی شده
+TOKEN_CACHE_SIZE = int(os.getenv("CLERK_TOKEN_CACHE_SIZE", "10000"))  # حداکثر تعداد
+TOKEN_CACHE_MAX_BYTES = int(
+    os.getenv("CLERK_TOKEN_CACHE_MAX_BYTES", str(8 * 1024 * 1024))
+)  # حداکثر حجم تقریبی
+
 # طرح احراز هویت Bearer برای دریافت توکن از هدر Authorization
 bearer_scheme = HTTPBearer()
+# همان طرح برای مسیرهای عمومی که ورود کاربر در آنها اختیاری است
+optional_bearer_scheme = HTTPBearer(auto_error=False)
 
 
 async def get_clerk_public_keys():
@@ -34,17 +55,232 @@ async def get_clerk_public_keys():
         return response.json()
 
 
-async def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme),
-):
+class JWKSCache:
+    """کش درون‌پردازه‌ای کلیدهای عمومی Clerk.
+
+    - تا زمان TTL کلیدها بدون درخواست شبکه برگردانده می‌شوند.
+    - دیدن یک kid ناشناخته باعث دریافت مجدد می‌شود (با محدودیت نرخ).
+    - در هر لحظه فقط یک درخواست به Clerk ارسال می‌شود (single-flight).
+    - پس از انقضا، کلیدهای قدیمی فوراً برگردانده شده و به‌روزرسانی در پس‌زمینه
+      انجام می‌شود (stale-while-revalidate)؛ اگر Clerk در دسترس نباشد تا
+      JWKS_STALE_TTL از همان کلیدها استفاده می‌شود.
     """
-    یک وابستگی (Dependency) در FastAPI که توکن کاربر را اعتبارسنجی کرده
-    و اطلاعات (payload) آن را برمی‌گرداند.
+
+    def __init__(
+        self,
+        fetch=get_clerk_public_keys,
+        ttl: float = JWKS_CACHE_TTL,
+        stale_ttl: float = JWKS_STALE_TTL,
+        min_refresh_interval: float = JWKS_MIN_REFRESH_INTERVAL,
+    ):
+        self._fetch = fetch
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.min_refresh_interval = min_refresh_interval
+        self._jwks: Optional[dict] = None
+        self._keys: dict = {}  # kid -> jwk
+        self._fetched_at = 0.0
+        self._last_attempt = 0.0
+        self._lock = asyncio.Lock()
+        self._background: Optional[asyncio.Task] = None
+        # شمارنده‌ها
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
+        self.background_errors = 0
+        self.consecutive_errors = 0  # خطاهای پیاپی از آخرین دریافت موفق
+        self.last_error: Optional[str] = None
+
+    def _age(self) -> float:
+        return time.monotonic() - self._fetched_at
+
+    def _is_fresh(self) -> bool:
+        return self._jwks is not None and self._age() < self.ttl
+
+    def _is_usable(self) -> bool:
+        return self._jwks is not None and self._age() < self.ttl + self.stale_ttl
+
+    def _store(self, jwks: dict):
+        self._jwks = jwks
+        self._keys = {k.get("kid"): k for k in jwks.get("keys", [])}
+        self._fetched_at = time.monotonic()
+
+    async def _refresh(self, force: bool = False, background: bool = False):
+        """کلیدها را دوباره دریافت می‌کند؛ درخواست‌های هم‌زمان منتظر یک دریافت می‌مانند.
+
+        خطای دریافت در پیش‌زمینه با کلیدهای هنوز قابل استفاده نادیده گرفته
+        می‌شود؛ در پس‌زمینه همیشه به task (و _background_done) می‌رسد.
+        """
+        async with self._lock:
+            # شاید در حین انتظار برای قفل، coroutine دیگری کش را به‌روز کرده باشد
+            if not force and self._is_fresh():
+                return
+            if (
+                force
+                and time.monotonic() - self._last_attempt < self.min_refresh_interval
+            ):
+                return
+            self._last_attempt = time.monotonic()
+            try:
+                jwks = await self._fetch()
+            except Exception as e:
+                self.refresh_errors += 1
+                self.consecutive_errors += 1
+                self.last_error = f"{type(e).__name__}: {e}"
+                if self._is_usable() and not background:
+                    return
+                raise
+            self.refreshes += 1
+            self.consecutive_errors = 0
+            self._store(jwks)
+
+    def _revalidate_in_background(self):
+        if self._background is None or self._background.done():
+            self._background = asyncio.create_task(self._refresh(background=True))
+            self._background.add_done_callback(self._background_done)
+
+    def _background_done(self, task: asyncio.Task):
+        # نتیجه task همیشه خوانده می‌شود تا خطا بی‌صدا از دست نرود
+        if task.cancelled() or task.exception() is None:
+            return
+        self.background_errors += 1
+        print(
+            "خطا در به‌روزرسانی کلیدهای Clerk در پس‌زمینه "
+            f"({self.consecutive_errors} خطای پیاپی): {task.exception()}"
+        )
+
+    async def get_key(self, kid: Optional[str]):
+        """کلید مربوط به kid را برمی‌گرداند (یا کل JWKS اگر kid مشخص نباشد)."""
+        if self._is_fresh():
+            key = self._jwks if kid is None else self._keys.get(kid)
+            if key is not None:
+                self.hits += 1
+                return key
+        elif self._is_usable():
+            key = self._jwks if kid is None else self._keys.get(kid)
+            if key is not None:
+                self.stale_hits += 1
+                self._revalidate_in_background()
+                return key
+
+        # کش خالی است یا kid ناشناخته است
+        self.misses += 1
+        await self._refresh(force=self._is_fresh())
+        key = self._jwks if kid is None else self._keys.get(kid)
+        if key is None:
+            raise JWTError("کلید امضای توکن ناشناخته است")
+        return key
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale_hits": self.stale_hits,
+            "refreshes": self.refreshes,
+            "refresh_errors": self.refresh_errors,
+            "background_errors": self.background_errors,
+            "consecutive_errors": self.consecutive_errors,
+            "last_error": self.last_error,
+            "keys": len(self._keys),
+            "age_seconds": round(self._age(), 1) if self._jwks is not None else None,
+        }
+
+
+class TokenCache:
+    """کش LRU از payload توکن‌هایی که امضایشان قبلاً تأیید شده است.
+
+    کلید هر ورودی هش SHA-256 توکن است (خود توکن نگهداری نمی‌شود) و هر ورودی
+    در زمان exp همان توکن منقضی می‌شود. اندازه کش هم از نظر تعداد و هم از نظر
+    حجم تقریبی محدود است.
     """
-    token = credentials.credentials
+
+    # سربار تقریبی هر ورودی (کلید هش، تاپل و گره OrderedDict) بر حسب بایت
+    ENTRY_OVERHEAD = 200
+
+    def __init__(
+        self,
+        max_entries: int = TOKEN_CACHE_SIZE,
+        max_bytes: int = TOKEN_CACHE_MAX_BYTES,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict = OrderedDict()  # hash -> (payload, exp, size)
+        self._bytes = 0
+        # شمارنده‌ها
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def _remove(self, key: bytes):
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def get(self, token: str) -> Optional[dict]:
+        key = self._key(token)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        payload, exp, _ = entry
+        if exp <= time.time():
+            self._remove(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return payload
+
+    def put(self, token: str, payload: dict):
+        exp = payload.get("exp")
+        # توکن بدون زمان انقضا کش نمی‌شود
+        if not isinstance(exp, (int, float)) or self.max_entries <= 0:
+            return
+        size = len(json.dumps(payload, default=str)) + self.ENTRY_OVERHEAD
+        if size > self.max_bytes:
+            return
+        key = self._key(token)
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (payload, exp, size)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+        }
+
+
+# نمونه‌های مشترک کش‌ها برای کل برنامه
+jwks_cache = JWKSCache()
+token_cache = TokenCache()
+
+
+async def verify_token(token: str) -> dict:
+    """
+    توکن JWT را اعتبارسنجی کرده و اطلاعات (payload) آن را برمی‌گرداند.
+    در صورت نامعتبر بودن توکن HTTPException پرتاب می‌شود.
+    """
+    # اگر همین توکن قبلاً تأیید شده و هنوز منقضی نشده، از اعتبارسنجی RSA صرف‌نظر می‌شود
+    cached = token_cache.get(token)
+    if cached is not None:
+        return cached
     try:
-        # دریافت کلیدهای عمومی از Clerk
-        keys = await get_clerk_public_keys()
+        # دریافت کلید عمومی متناظر با توکن از کش
+        kid = jwt.get_unverified_header(token).get("kid")
+        keys = await jwks_cache.get_key(kid)
         # رمزگشایی و اعتبارسنجی توکن JWT
         payload = jwt.decode(
             token,
@@ -53,6 +289,7 @@ async def get_current_user(
             issuer=CLERK_ISSUER,  # بررسی صادرکننده توکن
         )
         # اگر توکن معتبر باشد، اطلاعات کاربر (payload) برگردانده می‌شود
+        token_cache.put(token, payload)
         return payload
     except JWTError as e:
         # اگر توکن نامعتبر باشد، خطای 401 برگردانده می‌شود
@@ -61,9 +298,39 @@ async def get_current_user(
             detail=f"اعتبارنامه نامعتبر است: {e}",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    except httpx.HTTPError:
+        # Clerk در دسترس نیست و کلید معتبری در کش وجود ندارد
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="سرویس احراز هویت موقتاً در دسترس نیست",
+        )
     except Exception:
         # برای سایر خطاهای احتمالی
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="خطای داخلی سرور هنگام اعتبارسنجی توکن",
         )
+
+
+async def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme),
+):
+    """
+    یک وابستگی (Dependency) در FastAPI که توکن کاربر را اعتبارسنجی کرده
+    و اطلاعات (payload) آن را برمی‌گرداند.
+    """
+    return await verify_token(credentials.credentials)
+
+
+async def get_optional_user(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(
+        optional_bearer_scheme
+    ),
+) -> Optional[dict]:
+    """
+    مانند get_current_user اما اگر توکنی ارسال نشده باشد None برمی‌گرداند.
+    برای مسیرهای عمومی که پاسخ برای کاربر وارد شده شخصی‌سازی می‌شود.
+    """
+    if credentials is None:
+        return None
+    return await verify_token(credentials.credentials)
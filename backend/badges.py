@@ -0,0 +1,21 @@
+# badges.py
+
+# این فایل سطح نشان (Badge) کاربر را بر اساس تعداد سکه‌هایش تعیین می‌کند.
+# آستانه‌ها باید با BADGES در frontend/src/utils/badges.ts یکسان بمانند.
+
+# (شناسه نشان، حداقل سکه) به ترتیب صعودی
+BADGE_TIERS = [
+    ("student", 0),
+    ("diligent", 10),
+    ("smart", 40),
+    ("elite", 100),
+]
+
+
+def badge_for(coins: int) -> str:
+    """شناسه نشان متناظر با تعداد سکه‌ها را برمی‌گرداند."""
+    badge = BADGE_TIERS[0][0]
+    for name, min_coins in BADGE_TIERS:
+        if coins >= min_coins:
+            badge = name
+    return badge
@@ -0,0 +1,101 @@
+# bench_leaderboard.py
+#
+# مقایسه موتور لیدربورد با روش قبلی روی یک جدول مصنوعی از کاربران.
+# روش قبلی معادل ORDER BY coins روی کل جدول و پیمایش نتیجه برای یافتن رتبه
+# است (در اینجا با sorted و جستجوی خطی در حافظه شبیه‌سازی می‌شود، بنابراین
+# هزینه شبکه و پایگاه داده را شامل نمی‌شود و به نفع روش قبلی است).
+#
+# اجرا (از پوشه backend):
+#     python benchmarks/bench_leaderboard.py --users 100000 --lookups 2000
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from leaderboard import Leaderboard  # noqa: E402
+
+
+def make_users(count: int, rng: random.Random):
+    # توزیع دم‌بلند مثل سکه‌های واقعی: بیشتر کاربران سکه کمی دارند و تساوی زیاد است
+    return [
+        {
+            "user_id": f"user_{i:06d}",
+            "name": f"User {i}",
+            "coins": int(rng.paretovariate(1.2)) - 1,
+        }
+        for i in range(count)
+    ]
+
+
+def naive_rank(rows, user_id: str) -> int:
+    ordered = sorted(rows, key=lambda r: r["coins"], reverse=True)
+    rank = 0
+    prev = None
+    for index, row in enumerate(ordered, start=1):
+        if row["coins"] != prev:
+            rank, prev = index, row["coins"]
+        if row["user_id"] == user_id:
+            return rank
+    raise KeyError(user_id)
+
+
+def timed(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--lookups", type=int, default=2000)
+    parser.add_argument("--naive-lookups", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    rows = make_users(args.users, rng)
+    ids = [r["user_id"] for r in rows]
+
+    start = time.perf_counter()
+    board = Leaderboard()
+    board.load(rows)
+    build = time.perf_counter() - start
+
+    # درستی: رتبه موتور با روش قبلی برای چند کاربر تصادفی یکسان است
+    for user_id in rng.sample(ids, 5):
+        assert board.rank(user_id)["rank"] == naive_rank(rows, user_id)
+
+    sample = [rng.choice(ids) for _ in range(args.lookups)]
+    it = iter(sample * 2)
+    engine_rank = timed(lambda: board.rank(next(it)), args.lookups)
+    it = iter(sample * 2)
+    engine_neighbors = timed(lambda: board.neighbors(next(it), 2), args.lookups)
+    engine_top = timed(lambda: board.top(10), args.lookups)
+    updates = [(rng.choice(ids), rng.randint(0, 500)) for _ in range(args.lookups)]
+    it = iter(updates)
+    engine_update = timed(lambda: board.update(*next(it)), args.lookups)
+
+    it = iter(sample * 2)
+    naive = timed(lambda: naive_rank(rows, next(it)), args.naive_lookups)
+    naive_top = timed(
+        lambda: sorted(rows, key=lambda r: r["coins"], reverse=True)[:10],
+        args.naive_lookups,
+    )
+
+    print(f"users: {args.users:,}, initial build: {build * 1e3:.1f} ms")
+    print(f"ORDER BY + scan rank: {naive * 1e6:>10.1f} us/lookup")
+    print(f"engine rank:          {engine_rank * 1e6:>10.1f} us/lookup")
+    print(f"engine rank+2 nbrs:   {engine_neighbors * 1e6:>10.1f} us/lookup")
+    print(f"ORDER BY top 10:      {naive_top * 1e6:>10.1f} us/request")
+    print(f"engine top 10:        {engine_top * 1e6:>10.1f} us/request")
+    print(f"engine coin update:   {engine_update * 1e6:>10.1f} us/update")
+    print(f"rank speedup: {naive / engine_rank:,.0f}x")
+
+
+if __name__ == "__main__":
+    main()
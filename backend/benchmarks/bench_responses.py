@@ -0,0 +1,116 @@
+# bench_responses.py
+#
+# هزینه ساخت بدنه پاسخ یک صفحه از پست‌ها (مثل GET /posts) و حجم آن روی شبکه:
+# - pydantic + json: مسیر پیش‌فرض FastAPI (اعتبارسنجی با response_model و
+#   json استاندارد)
+# - pydantic + orjson: همان اعتبارسنجی با FastJSONResponse
+# - trusted + orjson: بدون اعتبارسنجی دوباره (RESPONSE_VALIDATION=false)
+# و حجم بدنه بدون فشرده‌سازی، با gzip و (در صورت نصب بودن) با brotli.
+#
+# اجرا (از پوشه backend):
+#     python benchmarks/bench_responses.py --posts 100 --repeat 200
+
+import argparse
+import gzip
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from compression import BROTLI_QUALITY, GZIP_LEVEL, brotli  # noqa: E402
+from pydantic import TypeAdapter  # noqa: E402
+from responses import FastJSONResponse, orjson, trusted_serializer  # noqa: E402
+from schemas import PostPage  # noqa: E402
+
+WORDS = "سلام دانشگاه جزوه امتحان فیزیک ریاضی کلاس استاد تمرین پروژه".split()
+
+
+def make_page(count: int, rng: random.Random) -> dict:
+    items = []
+    for i in range(count):
+        items.append({
+            "id": 100000 - i,
+            "created_at": f"2024-05-{1 + i % 28:02d}T12:{i % 60:02d}:00.123456+00:00",
+            "creator": f"کاربر {rng.randint(1, 500)}",
+            "user_id": f"user_{rng.getrandbits(64):016x}",
+            "title": " ".join(rng.choices(WORDS, k=6)),
+            "contains": " ".join(rng.choices(WORDS, k=rng.randint(20, 120))),
+            "like_count": rng.randint(0, 300),
+            "view_count": rng.randint(0, 5000),
+            "liked_by_me": rng.random() < 0.2,
+            "viewed_by_me": rng.random() < 0.5,
+            "author_coins": rng.randint(0, 200),
+            # ستون‌های اضافه select("*") که در پاسخ نمی‌آیند
+            "search": "'x':1",
+        })
+    return {"items": items, "next_cursor": "MjAyNC0wNS0wMVQxMjowMDowMFo"}
+
+
+def timed(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--posts", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    page = make_page(args.posts, random.Random(0))
+    adapter = TypeAdapter(PostPage)
+    serializer = trusted_serializer(PostPage)
+    fast = FastJSONResponse(None)
+
+    def pydantic_json() -> bytes:
+        # همان کاری که FastAPI با response_model و JSONResponse انجام می‌دهد
+        content = adapter.dump_python(adapter.validate_python(page), mode="json")
+        return json.dumps(
+            content, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+        ).encode("utf-8")
+
+    def pydantic_fast() -> bytes:
+        content = adapter.dump_python(adapter.validate_python(page), mode="json")
+        return fast.render(content)
+
+    def trusted_fast() -> bytes:
+        return fast.render(serializer.one(page))
+
+    body = pydantic_json()
+    assert json.loads(trusted_fast()).keys() == json.loads(body).keys()
+
+    print(f"posts per page: {args.posts}, orjson: {'yes' if orjson else 'no'}")
+    baseline = timed(pydantic_json, args.repeat)
+    for name, fn in (
+        ("pydantic + json", pydantic_json),
+        ("pydantic + fast json", pydantic_fast),
+        ("trusted + fast json", trusted_fast),
+    ):
+        took = baseline if fn is pydantic_json else timed(fn, args.repeat)
+        print(f"{name:<22} {took * 1e6:>10.1f} us/page  {baseline / took:>5.1f}x")
+
+    gzipped = gzip.compress(body, compresslevel=GZIP_LEVEL)
+    print(f"identity:          {len(body):>10,} bytes")
+    print(
+        f"gzip (level {GZIP_LEVEL}):     {len(gzipped):>10,} bytes"
+        f"  {len(body) / len(gzipped):.1f}x smaller,"
+        f" {timed(lambda: gzip.compress(body, GZIP_LEVEL), 50) * 1e6:.0f} us"
+    )
+    if brotli is not None:
+        compressed = brotli.compress(body, quality=BROTLI_QUALITY)
+        took = timed(lambda: brotli.compress(body, quality=BROTLI_QUALITY), 50)
+        print(
+            f"brotli (quality {BROTLI_QUALITY}): {len(compressed):>10,} bytes"
+            f"  {len(body) / len(compressed):.1f}x smaller, {took * 1e6:.0f} us"
+        )
+    else:
+        print("brotli: not installed (pip install brotli)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+# bench_token_cache.py
+#
+# مقایسه هزینه get_current_user با و بدون کش توکن‌های اعتبارسنجی شده.
+# هر کاربر در هر بارگذاری صفحه چند درخواست با یک توکن می‌فرستد
+# (/getcoins، /posts/{id}/view و یک درخواست سکه برای هر پست).
+#
+# اجرا (از پوشه backend):
+#     python benchmarks/bench_token_cache.py --users 200 --requests-per-page 25
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cryptography.hazmat.primitives import serialization  # noqa: E402
+from cryptography.hazmat.primitives.asymmetric import rsa  # noqa: E402
+from fastapi.security import HTTPAuthorizationCredentials  # noqa: E402
+from jose import jwk, jwt  # noqa: E402
+
+import auth  # noqa: E402
+
+ISSUER = "https://clerk.bench.local"
+KID = "bench-key"
+
+
+def make_keys():
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    private_pem = private_key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    ).decode()
+    public_pem = (
+        private_key.public_key()
+        .public_bytes(
+            serialization.Encoding.PEM,
+            serialization.PublicFormat.SubjectPublicKeyInfo,
+        )
+        .decode()
+    )
+    public_jwk = jwk.construct(public_pem, "RS256").to_dict()
+    public_jwk["kid"] = KID
+    return private_pem, {"keys": [public_jwk]}
+
+
+def make_tokens(private_pem: str, users: int):
+    now = int(time.time())
+    return [
+        jwt.encode(
+            {
+                "sub": f"user_{i}",
+                "name": f"User {i}",
+                "iss": ISSUER,
+                "iat": now,
+                "exp": now + 60,
+            },
+            private_pem,
+            algorithm="RS256",
+            headers={"kid": KID},
+        )
+        for i in range(users)
+    ]
+
+
+async def run(tokens, requests_per_page: int, cache: auth.TokenCache) -> float:
+    auth.token_cache = cache
+    workload = [t for t in tokens for _ in range(requests_per_page)]
+    random.Random(0).shuffle(workload)
+    start = time.perf_counter()
+    for token in workload:
+        await auth.get_current_user(
+            HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+        )
+    return time.perf_counter() - start
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--requests-per-page", type=int, default=25)
+    args = parser.parse_args()
+
+    private_pem, jwks = make_keys()
+
+    async def fetch():
+        return jwks
+
+    auth.CLERK_ISSUER = ISSUER
+    auth.jwks_cache = auth.JWKSCache(fetch=fetch)
+    tokens = make_tokens(private_pem, args.users)
+    total = args.users * args.requests_per_page
+
+    uncached = await run(tokens, args.requests_per_page, auth.TokenCache(0))
+    cache = auth.TokenCache()
+    cached = await run(tokens, args.requests_per_page, cache)
+
+    print(f"requests: {total} ({args.users} users x {args.requests_per_page})")
+    print(
+        f"without token cache: {uncached:.3f}s "
+        f"({total / uncached:,.0f} req/s, {uncached / total * 1e6:.1f} us/req)"
+    )
+    print(
+        f"with token cache:    {cached:.3f}s "
+        f"({total / cached:,.0f} req/s, {cached / total * 1e6:.1f} us/req)"
+    )
+    print(f"speedup: {uncached / cached:.1f}x, cache stats: {cache.stats()}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
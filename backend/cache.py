@@ -0,0 +1,294 @@
+# cache.py
+
+import asyncio
+import json
+import os
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, List, Optional
+
+from dotenv import load_dotenv
+
+# این فایل یک کش read-through برای پاسخ‌های پرتکرار (مثل لیست پست‌ها) فراهم می‌کند.
+# ذخیره‌ساز کش قابل تعویض است: به صورت پیش‌فرض درون‌پردازه‌ای (LRU با TTL) و در
+# صورت تنظیم CACHE_REDIS_URL یک سرور سازگار با Redis که بین چند پردازه مشترک است.
+
+# بارگذاری متغیرهای محیطی از فایل .env
+load_dotenv()
+
+CACHE_TTL = float(os.getenv("CACHE_TTL", "30"))  # عمر هر ورودی بر حسب ثانیه
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "5000"))  # فقط کش حافظه
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL", "")  # خالی یعنی کش درون‌پردازه‌ای
+CACHE_KEY_PREFIX = os.getenv("CACHE_KEY_PREFIX", "levelup:")
+
+
+class MemoryCache:
+    """ذخیره‌ساز درون‌پردازه‌ای با TTL برای هر ورودی و حذف LRU بر اساس تعداد.
+
+    مقادیر همان‌طور که ذخیره شده‌اند برگردانده می‌شوند و نباید تغییر داده شوند.
+    """
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: OrderedDict = OrderedDict()  # key -> (value, expires_at)
+        self.evictions = 0
+
+    async def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        if self.max_entries <= 0:
+            return
+        expires_at = time.monotonic() + ttl if ttl else None
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def add(self, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+        """value را فقط اگر key وجود نداشته باشد ذخیره می‌کند (True یعنی ذخیره شد)."""
+        if await self.get(key) is not None:
+            return False
+        await self.set(key, value, ttl)
+        return True
+
+    async def delete(self, key: str):
+        self._entries.pop(key, None)
+
+    async def close(self):
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "evictions": self.evictions}
+
+
+class RedisCache:
+    """ذخیره‌ساز روی یک سرور سازگار با Redis (مقادیر به صورت JSON ذخیره می‌شوند).
+
+    هر کلاینت async با متدهای get/set(nx)/delete/aclose (مثل redis.asyncio یا
+    fakeredis برای اجرای محلی) قابل استفاده است. حذف LRU بر عهده خود سرور
+    است (maxmemory-policy allkeys-lru).
+    """
+
+    def __init__(self, client, prefix: str = CACHE_KEY_PREFIX):
+        self.client = client
+        self.prefix = prefix
+
+    async def get(self, key: str) -> Optional[Any]:
+        raw = await self.client.get(self.prefix + key)
+        return None if raw is None else json.loads(raw)
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        await self.client.set(
+            self.prefix + key,
+            json.dumps(value, default=str),
+            px=int(ttl * 1000) if ttl else None,
+        )
+
+    async def add(self, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+        """SET NX: ذخیره فقط اگر key وجود نداشته باشد، به صورت اتمی روی سرور."""
+        return bool(
+            await self.client.set(
+                self.prefix + key,
+                json.dumps(value, default=str),
+                px=int(ttl * 1000) if ttl else None,
+                nx=True,
+            )
+        )
+
+    async def delete(self, key: str):
+        await self.client.delete(self.prefix + key)
+
+    async def close(self):
+        await self.client.aclose()
+
+    def stats(self) -> dict:
+        return {"backend": "redis"}
+
+
+class ReadThroughCache:
+    """کش read-through با گروه‌بندی کلیدها در فضای نام (namespace).
+
+    هر فضای نام (مثلاً همه صفحه‌های لیست پست‌ها) یک نسخه تصادفی دارد که جزئی
+    از کلید ورودی‌هاست؛ invalidate فقط نسخه را عوض می‌کند و همه ورودی‌های قبلی
+    دیگر خوانده نمی‌شوند تا با TTL یا LRU حذف شوند. اگر خود نسخه از کش حذف شود،
+    نسخه جدیدی ساخته می‌شود؛ بنابراین داده قدیمی هرگز دوباره دیده نمی‌شود.
+    درخواست‌های هم‌زمان برای یک کلید فقط یک بار loader را اجرا می‌کنند.
+    """
+
+    def __init__(self, backend, ttl: float = CACHE_TTL):
+        self.backend = backend
+        self.ttl = ttl
+        self._inflight: dict = {}  # key -> asyncio.Future
+        # شمارنده‌ها
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.errors = 0
+
+    async def _version(self, namespace: str) -> str:
+        gen_key = f"gen:{namespace}"
+        version = await self.backend.get(gen_key)
+        if version is None:
+            # درخواست‌های هم‌زمان (حتی در پردازه‌های دیگر) روی یک نسخه توافق می‌کنند
+            version = uuid.uuid4().hex
+            if not await self.backend.add(gen_key, version):
+                version = await self.backend.get(gen_key) or version
+        return version
+
+    async def get_or_load(
+        self,
+        namespace: str,
+        parts: tuple,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: Optional[float] = None,
+    ) -> Any:
+        """مقدار کش شده را برمی‌گرداند یا با loader بارگذاری و ذخیره می‌کند.
+
+        نتیجه None (مثلاً پست پیدا نشد) ذخیره نمی‌شود. خطای ذخیره‌ساز کش
+        درخواست را خراب نمی‌کند و فقط باعث خواندن مستقیم از پایگاه داده می‌شود.
+        """
+        try:
+            version = await self._version(namespace)
+            key = ":".join([namespace, version, *map(str, parts)])
+            value = await self.backend.get(key)
+        except Exception as e:
+            self.errors += 1
+            print(f"خطا در خواندن از کش: {e}")
+            return await loader()
+        if value is not None:
+            self.hits += 1
+            return value
+
+        pending = self._inflight.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+        self.misses += 1
+        future = asyncio.ensure_future(loader())
+        self._inflight[key] = future
+        try:
+            value = await asyncio.shield(future)
+        finally:
+            self._inflight.pop(key, None)
+        if value is not None:
+            try:
+                await self.backend.set(key, value, self.ttl if ttl is None else ttl)
+            except Exception as e:
+                self.errors += 1
+                print(f"خطا در نوشتن در کش: {e}")
+        return value
+
+    async def get_or_load_many(
+        self,
+        prefix: str,
+        ids: List[Any],
+        loader: Callable[[List[Any]], Awaitable[dict]],
+        ttl: Optional[float] = None,
+    ) -> dict:
+        """مقادیر فضاهای نام f"{prefix}{id}" را برای چند شناسه برمی‌گرداند.
+
+        ورودی‌ها همان ورودی‌های get_or_load(f"{prefix}{id}", ()) هستند؛ شناسه‌های
+        ناموجود با یک فراخوانی loader (که dict شناسه -> مقدار برمی‌گرداند)
+        بارگذاری و ذخیره می‌شوند.
+        """
+        keys = {}
+        found = {}
+        try:
+            for item_id in ids:
+                namespace = f"{prefix}{item_id}"
+                keys[item_id] = f"{namespace}:{await self._version(namespace)}"
+                value = await self.backend.get(keys[item_id])
+                if value is not None:
+                    found[item_id] = value
+        except Exception as e:
+            self.errors += 1
+            print(f"خطا در خواندن از کش: {e}")
+            return await loader(list(ids))
+        self.hits += len(found)
+        missing = [item_id for item_id in ids if item_id not in found]
+        if not missing:
+            return found
+
+        self.misses += len(missing)
+        loaded = await loader(missing)
+        for item_id, value in loaded.items():
+            if value is None or item_id not in keys:
+                continue
+            found[item_id] = value
+            try:
+                await self.backend.set(
+                    keys[item_id], value, self.ttl if ttl is None else ttl
+                )
+            except Exception as e:
+                self.errors += 1
+                print(f"خطا در نوشتن در کش: {e}")
+        return found
+
+    async def validator(self, *namespaces: str) -> Optional[str]:
+        """نشانه‌ای که با نامعتبرسازی هر یک از فضاهای نام عوض می‌شود (برای ETag).
+
+        نشانه حداقل هر ttl ثانیه هم عوض می‌شود؛ تغییراتی که بدون invalidate رخ
+        می‌دهند (مثل سکه نویسنده یا پردازه دیگری با کش جداگانه) همان‌قدر دیر
+        دیده می‌شوند که در خود کش. خطای ذخیره‌ساز None برمی‌گرداند.
+        """
+        try:
+            versions = [await self._version(namespace) for namespace in namespaces]
+        except Exception as e:
+            self.errors += 1
+            print(f"خطا در خواندن از کش: {e}")
+            return None
+        period = int(time.time() // self.ttl) if self.ttl > 0 else 0
+        return ":".join([*versions, str(period)])
+
+    async def invalidate(self, *namespaces: str):
+        """همه ورودی‌های فضاهای نام داده شده را نامعتبر می‌کند."""
+        for namespace in namespaces:
+            self.invalidations += 1
+            try:
+                await self.backend.set(f"gen:{namespace}", uuid.uuid4().hex)
+            except Exception as e:
+                # بدون دسترسی به کش، ورودی‌ها حداکثر تا TTL قدیمی می‌مانند
+                self.errors += 1
+                print(f"خطا در نامعتبرسازی کش: {e}")
+
+    async def close(self):
+        await self.backend.close()
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "errors": self.errors,
+            "ttl_seconds": self.ttl,
+            **self.backend.stats(),
+        }
+
+
+def create_backend(
+    redis_url: str = CACHE_REDIS_URL, max_entries: int = CACHE_MAX_ENTRIES
+):
+    """ذخیره‌ساز کش را بر اساس تنظیمات می‌سازد؛ Redis یک وابستگی اختیاری است."""
+    if not redis_url:
+        return MemoryCache(max_entries)
+    try:
+        from redis import asyncio as redis_asyncio
+    except ImportError:
+        raise RuntimeError(
+            "برای استفاده از CACHE_REDIS_URL بسته redis باید نصب باشد"
+        ) from None
+    return RedisCache(redis_asyncio.from_url(redis_url))
+
+
+# نمونه مشترک برای کل برنامه
+read_cache = ReadThroughCache(create_backend())
@@ -0,0 +1,193 @@
+# compression.py
+
+import os
+import zlib
+from functools import partial
+from typing import Optional
+
+from dotenv import load_dotenv
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# این فایل پاسخ‌های متنی بزرگ (JSON لیست پست‌ها، محصولات، کاربران) را با brotli
+# یا gzip فشرده می‌کند. brotli یک وابستگی اختیاری است (poetry install -E brotli
+# یا بسته brotlicffi)؛ بدون آن فقط gzip استفاده می‌شود. پاسخ‌های کوچکتر از
+# COMPRESSION_MIN_SIZE، پاسخ‌های دارای Range (206، Content-Range یا
+# Accept-Ranges مثل فایل‌های دانلودی که offset آنها به بایت‌های اصلی اشاره
+# می‌کند)، پاسخ‌هایی که Content-Encoding دارند و جریان رویدادهای SSE فشرده
+# نمی‌شوند.
+#
+# middleware مستقیماً روی پیام‌های ASGI کار می‌کند و به کلاس‌های داخلی
+# starlette.middleware.gzip وابسته نیست.
+
+# بارگذاری متغیرهای محیطی از فایل .env
+load_dotenv()
+
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1000"))  # بایت
+# سطح ۵ تقریباً همان حجم سطح ۶ را با حدود ۴۰٪ زمان کمتر می‌دهد
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "5"))
+# کیفیت ۴ برای پاسخ‌های پویا نسبت فشرده‌سازی بهتری از gzip با سرعت مشابه دارد
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))
+
+COMPRESSIBLE_TYPES = ("application/json", "text/plain", "text/html", "text/csv")
+
+try:
+    import brotli
+except ImportError:
+    try:
+        import brotlicffi as brotli
+    except ImportError:  # وابستگی اختیاری
+        brotli = None
+
+
+def _is_ranged(status: int, headers: Headers) -> bool:
+    """پاسخ بخشی از فایل است یا درخواست Range را می‌پذیرد.
+
+    فشرده کردن چنین پاسخی بایت‌های Content-Range را با بدنه ناسازگار می‌کند.
+    """
+    accept_ranges = headers.get("accept-ranges", "none").strip().lower()
+    return status == 206 or "content-range" in headers or accept_ranges != "none"
+
+
+def _is_compressible(status: int, headers: Headers) -> bool:
+    """فقط پاسخ‌های کامل بدون Range با نوع محتوای COMPRESSIBLE_TYPES فشرده می‌شوند."""
+    return (
+        headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES)
+        and "content-encoding" not in headers
+        and not _is_ranged(status, headers)
+    )
+
+
+class _GZip:
+    encoding = "gzip"
+
+    def __init__(self, level: int):
+        # wbits=31: قالب gzip (سرآیند و CRC) به جای zlib خام
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def process(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class _Brotli:
+    encoding = "br"
+
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def process(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+def _accepts(accept_encoding: str, coding: str) -> bool:
+    for item in accept_encoding.split(","):
+        name, _, params = item.partition(";")
+        if name.strip().lower() == coding:
+            return params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
+
+
+class _Responder:
+    """پیام‌های یک پاسخ را می‌گیرد و در صورت امکان بدنه را فشرده ارسال می‌کند.
+
+    شروع پاسخ تا رسیدن اولین بخش بدنه نگه داشته می‌شود تا بتوان بر اساس
+    اندازه آن (بدنه یک‌تکه کوچک) یا سرآیندها تصمیم گرفت.
+    """
+
+    def __init__(self, send: Send, minimum_size: int, make_compressor):
+        self.send = send
+        self.minimum_size = minimum_size
+        self.make_compressor = make_compressor
+        self.start: Optional[Message] = None
+        self.compressor = None
+        self.passthrough = False
+
+    async def __call__(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            self.start = message
+            self.passthrough = not _is_compressible(
+                message["status"], Headers(raw=message["headers"])
+            )
+            if self.passthrough:
+                await self.send(message)
+            return
+        if self.passthrough:
+            await self.send(message)
+            return
+        if message["type"] != "http.response.body":
+            # پیام افزونه‌ها (مثل http.response.pathsend) بدنه‌ای برای فشرده‌سازی ندارد
+            if self.compressor is None:
+                self.passthrough = True
+                await self.send(self.start)
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.compressor is None:
+            if not more_body and len(body) < self.minimum_size:
+                self.passthrough = True
+                await self.send(self.start)
+                await self.send(message)
+                return
+            self.compressor = self.make_compressor()
+            headers = MutableHeaders(raw=self.start["headers"])
+            headers["Content-Encoding"] = self.compressor.encoding
+            headers.add_vary_header("Accept-Encoding")
+            if more_body:
+                # طول بدنه فشرده از پیش معلوم نیست؛ ارسال chunked
+                del headers["Content-Length"]
+                await self.send(self.start)
+            else:
+                body = self.compressor.process(body) + self.compressor.finish()
+                headers["Content-Length"] = str(len(body))
+                await self.send(self.start)
+                await self.send({"type": "http.response.body", "body": body})
+                return
+
+        data = self.compressor.process(body)
+        if not more_body:
+            data += self.compressor.finish()
+        await self.send({
+            "type": "http.response.body",
+            "body": data,
+            "more_body": more_body,
+        })
+
+
+class CompressionMiddleware:
+    """فشرده‌سازی پاسخ بر اساس Accept-Encoding؛ brotli بر gzip ترجیح دارد."""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = COMPRESSION_MIN_SIZE,
+        gzip_level: int = GZIP_LEVEL,
+        brotli_quality: int = BROTLI_QUALITY,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accept_encoding = Headers(scope=scope).get("accept-encoding", "")
+        if brotli is not None and _accepts(accept_encoding, "br"):
+            make_compressor = partial(_Brotli, self.brotli_quality)
+        elif _accepts(accept_encoding, "gzip"):
+            make_compressor = partial(_GZip, self.gzip_level)
+        else:
+            await self.app(scope, receive, send)
+            return
+        responder = _Responder(send, self.minimum_size, make_compressor)
+        await self.app(scope, receive, responder)
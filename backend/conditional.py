@@ -0,0 +1,85 @@
+# conditional.py
+
+import hashlib
+import json
+import os
+from typing import Optional
+
+from dotenv import load_dotenv
+from fastapi import Request, Response
+
+# این فایل درخواست‌های شرطی (If-None-Match / 304) را برای خواندن‌های پرتکرار
+# پشتیبانی می‌کند. ETag هر پاسخ از نسخه داده‌های آن ساخته می‌شود (نسخه فضای نام
+# read_cache یا شمارنده تغییرات لیدربورد که مسیرهای نوشتن عوض می‌کنند)، پس برای
+# پاسخ 304 نه پایگاه داده خوانده می‌شود و نه بدنه پاسخ ساخته می‌شود.
+#
+# پاسخ درخواست‌های بدون توکن برای همه یکسان است و مرورگر و CDN می‌توانند آن را
+# تا HTTP_CACHE_MAX_AGE ثانیه کش کنند. پاسخ کاربران وارد شده پرچم‌های شخصی
+# (liked_by_me، owned_by_me، ...) دارد؛ فقط مرورگر خود کاربر آن را نگه می‌دارد و
+# هر بار با ETag اعتبارسنجی می‌کند.
+
+# بارگذاری متغیرهای محیطی از فایل .env
+load_dotenv()
+
+HTTP_CACHE_MAX_AGE = int(os.getenv("HTTP_CACHE_MAX_AGE", "5"))  # ثانیه
+
+
+def make_etag(*parts) -> str:
+    """یک ETag ضعیف از اجزای داده شده (نسخه داده، آدرس درخواست، کاربر) می‌سازد."""
+    raw = json.dumps(parts, default=str, separators=(",", ":"))
+    return f'W/"{hashlib.blake2b(raw.encode(), digest_size=12).hexdigest()}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """مقایسه ضعیف If-None-Match با ETag (طبق RFC 9110 برای GET)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(
+        tag.strip().removeprefix("W/") == opaque for tag in if_none_match.split(",")
+    )
+
+
+def cache_control(private: bool, max_age: int = HTTP_CACHE_MAX_AGE) -> str:
+    if private:
+        return "private, no-cache"
+    return f"public, max-age={max_age}, stale-while-revalidate={max_age}"
+
+
+class ConditionalStats:
+    """شمارنده درخواست‌های شرطی؛ not_modified پاسخ‌های 304 بدون بدنه است."""
+
+    def __init__(self):
+        self.requests = 0
+        self.not_modified = 0
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "not_modified": self.not_modified,
+            "max_age_seconds": HTTP_CACHE_MAX_AGE,
+        }
+
+
+conditional_stats = ConditionalStats()
+
+
+def not_modified(
+    request: Request, response: Response, etag: Optional[str], private: bool
+) -> Optional[Response]:
+    """هدرهای کش را روی response می‌گذارد و اگر ETag کلاینت هنوز معتبر باشد
+    پاسخ 304 را برمی‌گرداند (در غیر این صورت None).
+
+    etag خالی (مثلاً خطای کش) یعنی فقط Cache-Control تنظیم و بدنه کامل ساخته شود.
+    """
+    headers = {"Cache-Control": cache_control(private), "Vary": "Authorization"}
+    if etag is not None:
+        headers["ETag"] = etag
+        conditional_stats.requests += 1
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            conditional_stats.not_modified += 1
+            return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
@@ -0,0 +1,186 @@
+# db.py
+
+import os
+from contextvars import ContextVar
+from typing import Optional
+
+import httpx
+from dotenv import load_dotenv
+from postgrest import AsyncPostgrestClient
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from storage3 import AsyncStorageClient
+
+# این فایل لایه دسترسی غیرهمزمان (async) به Supabase را فراهم میکند.
+# به جای کلاینت همزمان supabase که برای هر .execute() یک نخ (thread) را مسدود میکند،
+# از کلاینتهای async مربوط به PostgREST و Storage با یک استخر اتصال مشترک استفاده میشود.
+
+# بارگذاری متغیرهای محیطی از فایل .env
+load_dotenv()
+
+SUPABASE_URL = os.environ.get("SUPABASE_URL", "")
+SUPABASE_KEY = os.environ.get("SUPABASE_KEY", "")
+
+# تنظیمات استخر اتصال
+DB_POOL_SIZE = int(os.getenv("SUPABASE_POOL_SIZE", "100"))  # حداکثر اتصال همزمان
+# تعداد اتصالهای بیکاری که برای استفاده مجدد باز نگه داشته میشوند
+DB_KEEPALIVE_CONNECTIONS = int(os.getenv("SUPABASE_KEEPALIVE_CONNECTIONS", "20"))
+DB_KEEPALIVE_EXPIRY = float(os.getenv("SUPABASE_KEEPALIVE_EXPIRY", "30"))  # ثانیه
+DB_HTTP2 = os.getenv("SUPABASE_HTTP2", "true").lower() in ("1", "true", "yes")
+DB_TIMEOUT = float(os.getenv("SUPABASE_TIMEOUT", "10"))  # ثانیه
+# true یعنی تعداد کوئری‌های هر درخواست در هدر X-DB-Queries پاسخ هم بیاید
+DB_QUERY_HEADER = os.getenv("DB_QUERY_HEADER", "false").lower() in ("1", "true", "yes")
+
+# شمارنده کوئری‌های PostgREST درخواست جاری (QueryCountMiddleware آن را می‌سازد)
+_request_queries: ContextVar[Optional[list]] = ContextVar(
+    "request_queries", default=None
+)
+
+
+async def _count_query(request: httpx.Request):
+    counter = _request_queries.get()
+    if counter is not None:
+        counter[0] += 1
+
+
+class Database:
+    """کلاینتهای async برای PostgREST و Storage با استخر اتصال قابل تنظیم.
+
+    این کلاینتها در lifespan برنامه ساخته و بسته میشوند (connect/close).
+    """
+
+    def __init__(
+        self,
+        url: str = SUPABASE_URL,
+        key: str = SUPABASE_KEY,
+        pool_size: int = DB_POOL_SIZE,
+        keepalive_connections: int = DB_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry: float = DB_KEEPALIVE_EXPIRY,
+        http2: bool = DB_HTTP2,
+        timeout: float = DB_TIMEOUT,
+    ):
+        self.url = url.rstrip("/")
+        self.key = key
+        self.limits = httpx.Limits(
+            max_connections=pool_size,
+            max_keepalive_connections=keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.http2 = http2
+        self.timeout = timeout
+        self._rest: Optional[AsyncPostgrestClient] = None
+        self._storage: Optional[AsyncStorageClient] = None
+
+    def _http_client(self) -> httpx.AsyncClient:
+        # هر زیرکلاینت base_url خودش را روی کلاینت http تنظیم میکند،
+        # بنابراین PostgREST و Storage هر کدام استخر جداگانه دارند.
+        return httpx.AsyncClient(
+            http2=self.http2,
+            limits=self.limits,
+            timeout=self.timeout,
+            follow_redirects=True,
+        )
+
+    async def connect(self):
+        headers = {"apiKey": self.key, "Authorization": f"Bearer {self.key}"}
+        self._rest = AsyncPostgrestClient(
+            f"{self.url}/rest/v1", headers=headers, http_client=self._http_client()
+        )
+        self._rest.session.event_hooks["request"].append(_count_query)
+        self._storage = AsyncStorageClient(
+            f"{self.url}/storage/v1", headers, http_client=self._http_client()
+        )
+
+    async def close(self):
+        if self._rest is not None:
+            await self._rest.aclose()
+            self._rest = None
+        if self._storage is not None:
+            await self._storage.session.aclose()
+            self._storage = None
+
+    @property
+    def rest(self) -> AsyncPostgrestClient:
+        if self._rest is None:
+            raise RuntimeError("اتصال به پایگاه داده برقرار نشده است")
+        return self._rest
+
+    @property
+    def storage(self) -> AsyncStorageClient:
+        if self._storage is None:
+            raise RuntimeError("اتصال به استوریج برقرار نشده است")
+        return self._storage
+
+    def table(self, name: str):
+        return self.rest.from_(name)
+
+    def rpc(self, func: str, params: Optional[dict] = None):
+        return self.rest.rpc(func, params or {})
+
+
+class QueryStats:
+    """تعداد کوئری‌های PostgREST هر مسیر، برای یافتن رفت و برگشت‌های اضافه."""
+
+    def __init__(self):
+        self.routes: dict = {}  # "METHOD /path" -> [درخواست‌ها، کوئری‌ها، بیشینه]
+
+    def record(self, route: str, queries: int):
+        entry = self.routes.setdefault(route, [0, 0, 0])
+        entry[0] += 1
+        entry[1] += queries
+        entry[2] = max(entry[2], queries)
+
+    def stats(self) -> dict:
+        return {
+            route: {
+                "requests": requests,
+                "queries": queries,
+                "avg_queries": round(queries / requests, 2),
+                "max_queries": most,
+            }
+            for route, (requests, queries, most) in sorted(self.routes.items())
+        }
+
+
+class QueryCountMiddleware:
+    """کوئری‌های پایگاه داده هر درخواست را می‌شمارد و در query_stats ثبت می‌کند.
+
+    با header، تعداد کوئری‌هایی که تا شروع پاسخ اجرا شده‌اند در همان هدر
+    پاسخ هم فرستاده می‌شود.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        stats: Optional[QueryStats] = None,
+        header: Optional[str] = "X-DB-Queries" if DB_QUERY_HEADER else None,
+    ):
+        self.app = app
+        self.stats = stats if stats is not None else query_stats
+        self.header = header
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        counter = [0]
+        token = _request_queries.set(counter)
+
+        async def send_with_count(message: Message):
+            if message["type"] == "http.response.start" and self.header:
+                MutableHeaders(scope=message).append(self.header, str(counter[0]))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_count)
+        finally:
+            _request_queries.reset(token)
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "(unmatched)"
+            self.stats.record(f"{scope['method']} {path}", counter[0])
+
+
+# نمونه‌های مشترک برای کل برنامه
+db = Database()
+query_stats = QueryStats()
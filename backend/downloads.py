@@ -0,0 +1,151 @@
+# downloads.py
+
+import os
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Mapping, Optional, Tuple
+from urllib.parse import quote, unquote, urlparse
+
+import httpx
+from dotenv import load_dotenv
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+
+# این فایل دانلود محصولات خریداری شده را پشتیبانی می‌کند:
+# - SignedUrlCache لینک‌های امضاشده کوتاه‌مدت Storage را صادر می‌کند و تا نیمه
+#   عمرشان دوباره همان لینک را برمی‌گرداند؛ لینک ثابت یعنی مرورگر و CDN می‌توانند
+#   پاسخ آن را کش کنند.
+# - proxy_download فایل را از Storage جریانی عبور می‌دهد و هدرهای Range و
+#   If-None-Match/If-Modified-Since را به Storage می‌فرستد، بنابراین پاسخ‌های
+#   206 و 304 و هدرهای ETag/Last-Modified/Accept-Ranges به کلاینت می‌رسند.
+
+# بارگذاری متغیرهای محیطی از فایل .env
+load_dotenv()
+
+DOWNLOAD_URL_TTL = int(os.getenv("DOWNLOAD_URL_TTL", "600"))  # ثانیه
+# مدت کش فهرست خریدهای هر کاربر (با هر خرید نامعتبر می‌شود)
+PURCHASE_INDEX_TTL = float(os.getenv("PURCHASE_INDEX_TTL", "300"))  # ثانیه
+SIGNED_URL_CACHE_SIZE = 10000
+
+# هدرهای درخواست کلاینت که برای ادامه دانلود و اعتبارسنجی کش به Storage می‌رسند
+PROXY_REQUEST_HEADERS = ("range", "if-range", "if-none-match", "if-modified-since")
+PROXY_RESPONSE_HEADERS = (
+    "accept-ranges",
+    "content-encoding",
+    "content-length",
+    "content-range",
+    "content-type",
+    "etag",
+    "last-modified",
+)
+# فایل‌های باکت بازنویسی نمی‌شوند (x-upsert false)، پس پاسخ هر مسیر ثابت است
+PROXY_CACHE_CONTROL = "private, max-age=31536000, immutable"
+
+
+def storage_path(file_url: str, bucket: str) -> Optional[str]:
+    """مسیر شیء را از URL عمومی (یا امضاشده) باکت استخراج می‌کند.
+
+    اگر URL متعلق به این باکت نباشد (مثلاً لینک خارجی) None برمی‌گرداند.
+    """
+    path = urlparse(file_url).path
+    for kind in ("public", "sign", "authenticated"):
+        marker = f"/object/{kind}/{bucket}/"
+        if marker in path:
+            return unquote(path.split(marker, 1)[1]) or None
+    return None
+
+
+class SignedUrlCache:
+    """لینک‌های امضاشده را برای هر مسیر نگه می‌دارد و تا نیمه عمرشان دوباره می‌دهد.
+
+    sign(path, ttl) لینک تازه می‌سازد. خروجی get لینک و زمان انقضای آن (unix
+    time) است؛ لینکی که کمتر از نیمی از ttl از عمرش مانده باشد جایگزین می‌شود.
+    """
+
+    def __init__(
+        self,
+        sign: Callable[[str, int], Awaitable[str]],
+        ttl: int = DOWNLOAD_URL_TTL,
+        max_entries: int = SIGNED_URL_CACHE_SIZE,
+    ):
+        self._sign = sign
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._urls: OrderedDict = OrderedDict()  # path -> (url, expires_at)
+        # شمارنده‌ها
+        self.issued = 0
+        self.reused = 0
+
+    async def get(self, path: str) -> Tuple[str, float]:
+        entry = self._urls.get(path)
+        if entry is not None and entry[1] - time.time() > self.ttl / 2:
+            self._urls.move_to_end(path)
+            self.reused += 1
+            return entry
+        url = await self._sign(path, self.ttl)
+        entry = (url, time.time() + self.ttl)
+        self._urls[path] = entry
+        self._urls.move_to_end(path)
+        while len(self._urls) > self.max_entries:
+            self._urls.popitem(last=False)
+        self.issued += 1
+        return entry
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._urls),
+            "issued": self.issued,
+            "reused": self.reused,
+            "ttl_seconds": self.ttl,
+        }
+
+
+async def proxy_download(
+    client: httpx.AsyncClient,
+    bucket: str,
+    path: str,
+    request_headers: Mapping[str, str],
+    filename: str,
+) -> StreamingResponse:
+    """فایل را از Storage جریانی به کلاینت می‌فرستد (با پشتیبانی Range و 304).
+
+    client همان کلاینت http استوریج (با base_url و هدرهای احراز هویت) است.
+    """
+    headers = {
+        name: request_headers[name]
+        for name in PROXY_REQUEST_HEADERS
+        if name in request_headers
+    }
+    request = client.build_request(
+        "GET", f"object/authenticated/{bucket}/{quote(path)}", headers=headers
+    )
+    try:
+        upstream = await client.send(request, stream=True)
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=502, detail=f"خطا در دریافت فایل: {e}")
+
+    if upstream.status_code not in (200, 206, 304, 416):
+        await upstream.aclose()
+        if upstream.status_code in (400, 404):
+            raise HTTPException(status_code=404, detail="فایل یافت نشد")
+        raise HTTPException(
+            status_code=502,
+            detail=f"خطا در دریافت فایل (کد {upstream.status_code})",
+        )
+
+    response_headers = {
+        name: upstream.headers[name]
+        for name in PROXY_RESPONSE_HEADERS
+        if name in upstream.headers
+    }
+    response_headers["cache-control"] = PROXY_CACHE_CONTROL
+    response_headers["content-disposition"] = (
+        f"attachment; filename*=UTF-8''{quote(filename)}"
+    )
+    return StreamingResponse(
+        upstream.aiter_raw(),
+        status_code=upstream.status_code,
+        headers=response_headers,
+        background=BackgroundTask(upstream.aclose),
+    )
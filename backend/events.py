@@ -0,0 +1,242 @@
+# events.py
+
+import asyncio
+import json
+import os
+from typing import AsyncIterator, Callable, Iterable, Optional, Set
+
+from cache import CACHE_REDIS_URL
+from dotenv import load_dotenv
+
+# این فایل تغییرات زنده (پست و کامنت جدید، لایک، بازدید و سکه) را از هندلرهای
+# نوشتن به کلاینت‌های متصل می‌رساند. هندلرها با publish یک رویداد منتشر می‌کنند و
+# هر کلاینت با یک اتصال SSE (text/event-stream) رویدادهای موضوع‌های دلخواهش را
+# دریافت می‌کند؛ بنابراین لازم نیست کلاینت‌ها برای دیدن تغییرات مدام درخواست
+# بفرستند.
+#
+# انتقال رویداد بین پردازه‌ها قابل تعویض است: به صورت پیش‌فرض درون‌پردازه‌ای و در
+# صورت تنظیم EVENTS_REDIS_URL (یا CACHE_REDIS_URL) از طریق pub/sub یک سرور
+# سازگار با Redis، تا رویداد هر worker به مشترکان همه workerها برسد.
+
+# بارگذاری متغیرهای محیطی از فایل .env
+load_dotenv()
+
+EVENTS_REDIS_URL = os.getenv("EVENTS_REDIS_URL", CACHE_REDIS_URL)
+EVENTS_CHANNEL = os.getenv("EVENTS_CHANNEL", "levelup:events")
+# سقف رویدادهای در صف هر مشترک؛ مشترک کندتر از این قطع می‌شود تا دوباره وصل شود
+EVENTS_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", "256"))
+EVENTS_MAX_SUBSCRIBERS = int(os.getenv("EVENTS_MAX_SUBSCRIBERS", "2000"))
+# فاصله پیام‌های خالی برای زنده نگه داشتن اتصال از پشت پراکسی‌ها (ثانیه)
+EVENTS_KEEPALIVE = float(os.getenv("EVENTS_KEEPALIVE", "15"))
+
+# فاصله تلاش مجدد اتصال مرورگر (EventSource) پس از قطع شدن، بر حسب میلی‌ثانیه
+SSE_RETRY_MS = 3000
+
+
+def sse_frame(event: str, data: dict) -> str:
+    """یک رویداد را به قالب text/event-stream تبدیل می‌کند."""
+    payload = json.dumps(data, default=str, ensure_ascii=False, separators=(",", ":"))
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
+class MemoryPubSub:
+    """انتقال درون‌پردازه‌ای: هر رویداد مستقیم به مشترکان همین پردازه می‌رسد."""
+
+    def __init__(self):
+        self._deliver: Optional[Callable[[str, str], None]] = None
+
+    async def start(self, deliver: Callable[[str, str], None]):
+        self._deliver = deliver
+
+    async def publish(self, topic: str, frame: str):
+        if self._deliver is not None:
+            self._deliver(topic, frame)
+
+    async def close(self):
+        self._deliver = None
+
+    def stats(self) -> dict:
+        return {"backend": "memory"}
+
+
+class RedisPubSub:
+    """انتقال از طریق کانال pub/sub یک سرور سازگار با Redis.
+
+    رویداد منتشر شده در هر پردازه (از جمله خود فرستنده) از کانال دریافت و به
+    مشترکان محلی تحویل داده می‌شود. اگر اتصال شنونده قطع شود، پس از یک ثانیه
+    دوباره برقرار می‌شود؛ رویدادهای این فاصله از دست می‌روند.
+    """
+
+    def __init__(self, client, channel: str = EVENTS_CHANNEL):
+        self.client = client
+        self.channel = channel
+        self._task: Optional[asyncio.Task] = None
+        self.errors = 0
+
+    async def start(self, deliver: Callable[[str, str], None]):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._listen(deliver))
+
+    async def _listen(self, deliver: Callable[[str, str], None]):
+        while True:
+            try:
+                async with self.client.pubsub() as pubsub:
+                    await pubsub.subscribe(self.channel)
+                    async for message in pubsub.listen():
+                        if message.get("type") == "message":
+                            topic, frame = json.loads(message["data"])
+                            deliver(topic, frame)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.errors += 1
+                print(f"خطا در دریافت رویدادها از Redis: {e}")
+                await asyncio.sleep(1)
+
+    async def publish(self, topic: str, frame: str):
+        await self.client.publish(self.channel, json.dumps([topic, frame]))
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.client.aclose()
+
+    def stats(self) -> dict:
+        return {"backend": "redis", "listener_errors": self.errors}
+
+
+class Subscription:
+    """صف رویدادهای یک کلاینت متصل؛ None در صف یعنی اتصال باید بسته شود."""
+
+    def __init__(self, topics: Set[str], queue_size: int):
+        self.topics = topics
+        self.queue: asyncio.Queue = asyncio.Queue(queue_size)
+
+
+class EventBus:
+    """انتشار رویدادها و پخش آنها به همه مشترکان (fan-out).
+
+    publish هرگز درخواست نوشتن را خراب نمی‌کند: خطای انتقال فقط شمرده می‌شود.
+    مشترکی که صفش پر شود قطع می‌شود؛ EventSource مرورگر خودکار دوباره وصل
+    می‌شود و کلاینت داده فعلی را دوباره می‌خواند.
+    """
+
+    def __init__(
+        self,
+        backend,
+        queue_size: int = EVENTS_QUEUE_SIZE,
+        max_subscribers: int = EVENTS_MAX_SUBSCRIBERS,
+        keepalive: float = EVENTS_KEEPALIVE,
+    ):
+        self.backend = backend
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self.keepalive = keepalive
+        self._subscribers: Set[Subscription] = set()
+        # شمارنده‌ها
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.errors = 0
+
+    async def start(self):
+        await self.backend.start(self._deliver)
+
+    async def close(self):
+        # اتصال‌های باز بسته می‌شوند تا خاموشی سرور منتظر آنها نماند
+        for subscription in list(self._subscribers):
+            self._disconnect(subscription)
+        await self.backend.close()
+
+    async def publish(self, topic: str, event: str, data: dict):
+        """رویداد event با داده data را در موضوع topic منتشر می‌کند."""
+        self.published += 1
+        try:
+            await self.backend.publish(topic, sse_frame(event, data))
+        except Exception as e:
+            self.errors += 1
+            print(f"خطا در انتشار رویداد {event}: {e}")
+
+    def _disconnect(self, subscription: Subscription):
+        self._subscribers.discard(subscription)
+        queue = subscription.queue
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(None)
+
+    def _deliver(self, topic: str, frame: str):
+        for subscription in list(self._subscribers):
+            if topic not in subscription.topics:
+                continue
+            try:
+                subscription.queue.put_nowait(frame)
+                self.delivered += 1
+            except asyncio.QueueFull:
+                self.dropped += 1
+                self._disconnect(subscription)
+
+    def subscribe(self, topics: Iterable[str]) -> Optional[Subscription]:
+        """اشتراک جدید برای topics، یا None اگر ظرفیت max_subscribers پر باشد.
+
+        بررسی ظرفیت و ثبت بدون await پشت سر هم انجام می‌شوند، پس اتصال‌های
+        هم‌زمان نمی‌توانند از سقف عبور کنند.
+        """
+        if len(self._subscribers) >= self.max_subscribers:
+            return None
+        subscription = Subscription(set(topics), self.queue_size)
+        self._subscribers.add(subscription)
+        return subscription
+
+    async def stream(self, subscription: Subscription) -> AsyncIterator[str]:
+        """بدنه پاسخ SSE: رویدادهای اشتراک تا زمان قطع اتصال کلاینت.
+
+        اشتراک با قطع اتصال (لغو generator) حذف می‌شود. اشتراکی که بدنه‌اش
+        هرگز خوانده نشود با پر شدن صفش در _deliver حذف می‌شود.
+        """
+        try:
+            yield f"retry: {SSE_RETRY_MS}\n\n"
+            while True:
+                try:
+                    frame = await asyncio.wait_for(
+                        subscription.queue.get(), self.keepalive
+                    )
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if frame is None:
+                    return
+                yield frame
+        finally:
+            self._subscribers.discard(subscription)
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": len(self._subscribers),
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped_subscribers": self.dropped,
+            "errors": self.errors,
+            **self.backend.stats(),
+        }
+
+
+def create_pubsub(redis_url: str = EVENTS_REDIS_URL):
+    """انتقال رویدادها را بر اساس تنظیمات می‌سازد؛ Redis یک وابستگی اختیاری است."""
+    if not redis_url:
+        return MemoryPubSub()
+    try:
+        from redis import asyncio as redis_asyncio
+    except ImportError:
+        raise RuntimeError(
+            "برای انتقال رویدادها با Redis بسته redis باید نصب باشد"
+        ) from None
+    return RedisPubSub(redis_asyncio.from_url(redis_url))
+
+
+# نمونه مشترک برای کل برنامه
+event_bus = EventBus(create_pubsub())
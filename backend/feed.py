@@ -0,0 +1,276 @@
+# feed.py
+
+import asyncio
+import base64
+import json
+import math
+import os
+import time
+from bisect import bisect_left, bisect_right, insort
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+from badges import BADGE_TIERS, badge_for
+from dotenv import load_dotenv
+from fastapi import HTTPException
+
+# این فایل فید رتبه‌بندی شده پست‌ها را پیاده‌سازی می‌کند. امتیاز هر پست «داغی»
+# آن است: مجموع رویدادهای پست (خود انتشار با وزن ۱، هر لایک و هر بازدید با
+# وزن خودش) که هر کدام با نیمه‌عمر FEED_HALF_LIFE_HOURS کهنه می‌شوند. بنابراین
+# هم تازگی پست و هم سرعت لایک و بازدیدهای اخیر در امتیاز اثر دارند و نشان
+# نویسنده امتیاز را ضریب می‌زند.
+#
+# چون همه امتیازها با یک نرخ کهنه می‌شوند، ترتیب پست‌ها با گذشت زمان عوض
+# نمی‌شود؛ پس امتیاز به شکل لگاریتمی و نسبت به یک مبدأ ثابت نگه داشته می‌شود
+# (log Σ w·e^(t/τ)) و فقط با رسیدن لایک یا بازدید جدید به‌روز می‌شود. لیست مرتب
+# امتیازها در حافظه است و هر صفحه فید با یک bisect خوانده می‌شود. برای هماهنگی
+# با پایگاه داده کل لیست هر FEED_REBUILD_INTERVAL ثانیه یک بار از روی
+# زمان‌های ثبت شده در post_reactions دوباره ساخته می‌شود.
+
+# بارگذاری متغیرهای محیطی از فایل .env
+load_dotenv()
+
+FEED_HALF_LIFE_HOURS = float(os.getenv("FEED_HALF_LIFE_HOURS", "12"))
+FEED_LIKE_WEIGHT = float(os.getenv("FEED_LIKE_WEIGHT", "3"))
+FEED_VIEW_WEIGHT = float(os.getenv("FEED_VIEW_WEIGHT", "0.5"))
+# ضریب امتیاز به ازای هر سطح نشان نویسنده (۰.۱ یعنی ۱۰٪ بیشتر برای هر سطح)
+FEED_BADGE_WEIGHT = float(os.getenv("FEED_BADGE_WEIGHT", "0.1"))
+# تعداد پست‌های اخیر که رتبه‌بندی می‌شوند؛ پست‌های قدیمی‌تر عملاً امتیازی ندارند
+FEED_CANDIDATES = int(os.getenv("FEED_CANDIDATES", "2000"))
+FEED_REBUILD_INTERVAL = float(os.getenv("FEED_REBUILD_INTERVAL", "300"))  # ثانیه
+
+# ثابت زمانی کهنه شدن (ثانیه) به طوری که وزن هر رویداد پس از نیمه‌عمر نصف شود
+FEED_TAU = FEED_HALF_LIFE_HOURS * 3600 / math.log(2)
+
+_BADGE_LEVELS = {name: level for level, (name, _) in enumerate(BADGE_TIERS)}
+
+
+def badge_level(coins: Optional[int]) -> int:
+    return _BADGE_LEVELS[badge_for(coins or 0)]
+
+
+class FeedRanking:
+    """لیست مرتب (-score, -post_id) به همراه نگاشت post_id -> (heat, floor, level).
+
+    heat لگاریتم مجموع وزن رویدادهای پست در مبدأ زمانی ثابت است و floor سهم
+    خود انتشار پست (حداقل heat). score = heat + level·log(1 + badge_weight).
+    در امتیاز برابر، پست جدیدتر (شناسه بزرگتر) جلوتر است.
+    """
+
+    def __init__(
+        self,
+        tau: float = FEED_TAU,
+        badge_weight: float = FEED_BADGE_WEIGHT,
+        capacity: int = FEED_CANDIDATES,
+    ):
+        self.tau = tau
+        self.badge_boost = math.log1p(badge_weight)
+        self.capacity = capacity
+        self._keys: List[tuple] = []  # (-score, -post_id) به ترتیب صعودی
+        self._posts: dict = {}  # post_id -> (heat, floor, level)
+
+    def __len__(self) -> int:
+        return len(self._posts)
+
+    def _score(self, heat: float, level: int) -> float:
+        return heat + level * self.badge_boost
+
+    def _set(self, post_id: int, heat: float, floor: float, level: int):
+        old = self._posts.get(post_id)
+        if old is not None:
+            key = (-self._score(old[0], old[2]), -post_id)
+            self._keys.pop(bisect_left(self._keys, key))
+        self._posts[post_id] = (heat, floor, level)
+        insort(self._keys, (-self._score(heat, level), -post_id))
+
+    def _trim(self):
+        # کم‌امتیازترین پست‌ها از انتهای لیست حذف می‌شوند
+        while len(self._keys) > self.capacity:
+            _, neg_id = self._keys.pop()
+            del self._posts[-neg_id]
+
+    def load(self, rows):
+        """کل رتبه‌بندی را از ردیف‌های id/heat/created/author_coins جایگزین می‌کند."""
+        posts = {}
+        for row in rows:
+            floor = row["created"] / self.tau
+            posts[row["id"]] = (
+                max(row["heat"], floor),
+                floor,
+                badge_level(row.get("author_coins")),
+            )
+        self._posts = posts
+        self._keys = sorted(
+            (-self._score(heat, level), -pid) for pid, (heat, _, level) in posts.items()
+        )
+        self._trim()
+
+    def add(self, post_id: int, created: float, author_coins: Optional[int]):
+        """پست جدید را با زمان انتشارش (unix time) اضافه می‌کند."""
+        floor = created / self.tau
+        if post_id not in self._posts:
+            self._set(post_id, floor, floor, badge_level(author_coins))
+            self._trim()
+
+    def react(
+        self,
+        post_id: int,
+        weight: float,
+        at: Optional[float] = None,
+        author_coins: Optional[int] = None,
+    ):
+        """رویداد با وزن weight (منفی برای پس گرفتن لایک) را در زمان at ثبت می‌کند."""
+        post = self._posts.get(post_id)
+        if post is None or weight == 0:
+            return
+        heat, floor, level = post
+        event = math.log(abs(weight)) + (time.time() if at is None else at) / self.tau
+        if weight > 0:
+            heat = max(heat, event) + math.log1p(math.exp(-abs(heat - event)))
+        elif event < heat:
+            heat = max(heat + math.log1p(-math.exp(event - heat)), floor)
+        else:
+            heat = floor
+        if author_coins is not None:
+            level = badge_level(author_coins)
+        self._set(post_id, heat, floor, level)
+
+    def remove(self, post_id: int):
+        post = self._posts.pop(post_id, None)
+        if post is not None:
+            key = (-self._score(post[0], post[2]), -post_id)
+            self._keys.pop(bisect_left(self._keys, key))
+
+    def page(
+        self, limit: int, after: Optional[Tuple[float, int]] = None
+    ) -> Tuple[List[int], Optional[Tuple[float, int]]]:
+        """شناسه پست‌های یک صفحه و (score, id) آخرین پست برای صفحه بعد (یا None).
+
+        after همان مقدار برگردانده شده برای صفحه قبل است.
+        """
+        start = 0
+        if after is not None:
+            start = bisect_right(self._keys, (-after[0], -after[1]))
+        window = self._keys[start : start + limit]
+        ids = [-neg_id for _, neg_id in window]
+        if start + limit < len(self._keys) and window:
+            neg_score, neg_id = window[-1]
+            return ids, (-neg_score, -neg_id)
+        return ids, None
+
+
+class FeedEngine:
+    """رتبه‌بندی مشترک فید به همراه بارگذاری اولیه و بازسازی دوره‌ای.
+
+    loader امتیاز پست‌های اخیر را از پایگاه داده برمی‌گرداند (ردیف‌های id،
+    created، heat و author_coins). رویدادهایی که در حین بازسازی می‌رسند پس از
+    آن دوباره اعمال می‌شوند تا تصویر قدیمی‌تر پایگاه داده آنها را گم نکند.
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[], Awaitable[List[dict]]],
+        rebuild_interval: float = FEED_REBUILD_INTERVAL,
+    ):
+        self._loader = loader
+        self.rebuild_interval = rebuild_interval
+        self.ranking = FeedRanking()
+        self._loaded = False
+        self._lock = asyncio.Lock()
+        self._changes: Optional[list] = None  # (نام متد، آرگومان‌ها) در حین بازسازی
+        self._task: Optional[asyncio.Task] = None
+        # شمارنده‌ها
+        self.rebuilds = 0
+        self.rebuild_errors = 0
+        self.events = 0
+
+    async def rebuild(self, if_unloaded: bool = False):
+        """رتبه‌بندی را از پایگاه داده از نو می‌سازد (فقط یک بازسازی هم‌زمان)."""
+        async with self._lock:
+            if if_unloaded and self._loaded:
+                return
+            self._changes = []
+            try:
+                rows = await self._loader()
+                ranking = FeedRanking()
+                ranking.load(rows)
+                for method, args in self._changes:
+                    getattr(ranking, method)(*args)
+                self.ranking = ranking
+                self._loaded = True
+                self.rebuilds += 1
+            finally:
+                self._changes = None
+
+    async def ready(self) -> FeedRanking:
+        """رتبه‌بندی را برمی‌گرداند و اگر هنوز بارگذاری نشده، منتظر بارگذاری می‌ماند."""
+        if not self._loaded:
+            await self.rebuild(if_unloaded=True)
+        return self.ranking
+
+    def _apply(self, method: str, *args):
+        self.events += 1
+        getattr(self.ranking, method)(*args)
+        if self._changes is not None:
+            self._changes.append((method, args))
+
+    def add(self, post_id: int, created: float, author_coins: Optional[int]):
+        self._apply("add", post_id, created, author_coins)
+
+    def like(self, post_id: int, liked: bool, author_coins: Optional[int] = None):
+        weight = FEED_LIKE_WEIGHT if liked else -FEED_LIKE_WEIGHT
+        self._apply("react", post_id, weight, time.time(), author_coins)
+
+    def view(self, post_id: int, count: int = 1):
+        self._apply("react", post_id, FEED_VIEW_WEIGHT * count, time.time())
+
+    def remove(self, post_id: int):
+        self._apply("remove", post_id)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.rebuild_interval)
+            try:
+                await self.rebuild()
+            except Exception as e:
+                self.rebuild_errors += 1
+                print(f"خطا در بازسازی فید: {e}")
+
+    def start(self):
+        if self.rebuild_interval > 0 and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "posts": len(self.ranking),
+            "loaded": self._loaded,
+            "events": self.events,
+            "rebuilds": self.rebuilds,
+            "rebuild_errors": self.rebuild_errors,
+            "rebuild_interval_seconds": self.rebuild_interval,
+            "half_life_hours": FEED_HALF_LIFE_HOURS,
+        }
+
+
+def encode_position(position: Tuple[float, int]) -> str:
+    """نشانگر صفحه بعد فید را از (score, id) آخرین پست صفحه فعلی می‌سازد."""
+    raw = json.dumps(list(position), separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_position(cursor: str) -> Tuple[float, int]:
+    """نشانگر را به (score, id) تبدیل می‌کند؛ نشانگر نامعتبر خطای 400 می‌دهد."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        score, post_id = json.loads(base64.urlsafe_b64decode(padded))
+        return float(score), int(post_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="نشانگر صفحه نامعتبر است")
@@ -0,0 +1,204 @@
+# idempotency.py
+
+import asyncio
+import os
+from typing import Any, Awaitable, Callable, Optional
+
+from cache import CACHE_REDIS_URL, create_backend
+from dotenv import load_dotenv
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+# این فایل پشتیبانی از هدر Idempotency-Key را برای درخواست‌هایی که سکه جابه‌جا
+# می‌کنند فراهم می‌کند. نتیجه هر کلید برای مدتی نگه داشته می‌شود و تکرار همان
+# درخواست (مثلاً تلاش مجدد کلاینت پس از timeout) بدون دسترسی دوباره به پایگاه
+# داده همان پاسخ را می‌گیرد. کلید همچنین به توابع پایگاه داده (post_coins و
+# purchase_product) داده می‌شود و آنجا یکتا ثبت می‌شود، تا حتی وقتی نتیجه
+# ذخیره نشده (خطای 5xx، timeout یا کش درون‌پردازه‌ای روی چند worker) سکه دو بار
+# جابه‌جا نشود.
+
+# بارگذاری متغیرهای محیطی از فایل .env
+load_dotenv()
+
+IDEMPOTENCY_TTL = float(os.getenv("IDEMPOTENCY_TTL", "86400"))  # ثانیه
+IDEMPOTENCY_MAX_KEYS = int(os.getenv("IDEMPOTENCY_MAX_KEYS", "10000"))  # کش حافظه
+# عمر رزرو یک کلید در حین اجرا؛ اگر پردازه وسط اجرا متوقف شود، پس از این مدت
+# تلاش مجدد دوباره اجرا می‌شود
+IDEMPOTENCY_PENDING_TTL = float(os.getenv("IDEMPOTENCY_PENDING_TTL", "60"))  # ثانیه
+
+# هدر پاسخ‌هایی که از نتیجه ذخیره شده برگردانده شده‌اند
+REPLAY_HEADER = "Idempotent-Replayed"
+
+
+class IdempotencyStore:
+    """نتیجه درخواست‌ها را بر اساس (دامنه، کلید) برای مدت ttl نگه می‌دارد.
+
+    ذخیره‌ساز همان ذخیره‌سازهای cache.py است: LRU محدود در حافظه یا Redis
+    (در صورت تنظیم CACHE_REDIS_URL) تا تکرار روی پردازه دیگر هم شناخته شود.
+    پاسخ‌های موفق و خطاهای 4xx ذخیره می‌شوند؛ خطای 5xx ذخیره نمی‌شود تا
+    تلاش مجدد دوباره اجرا شود (پایگاه داده با همان کلید تغییر را تکرار
+    نمی‌کند). درخواست‌های هم‌زمان با یک کلید در همین پردازه منتظر نتیجه اولی
+    می‌مانند. خطای ذخیره‌ساز درخواست را خراب نمی‌کند و فقط تکرار آن روی
+    پردازه‌های دیگر شناخته نمی‌شود.
+    """
+
+    def __init__(
+        self,
+        backend,
+        ttl: float = IDEMPOTENCY_TTL,
+        pending_ttl: float = IDEMPOTENCY_PENDING_TTL,
+    ):
+        self.backend = backend
+        self.ttl = ttl
+        self.pending_ttl = pending_ttl
+        self._inflight: dict = {}  # key -> asyncio.Future
+        # شمارنده‌ها
+        self.executions = 0
+        self.replays = 0
+        self.conflicts = 0
+        self.errors = 0
+
+    @staticmethod
+    def _replay(entry: dict):
+        if entry["status"] >= 400:
+            raise HTTPException(
+                status_code=entry["status"],
+                detail=entry["body"],
+                headers={REPLAY_HEADER: "true"},
+            )
+        return JSONResponse(
+            status_code=entry["status"],
+            content=entry["body"],
+            headers={REPLAY_HEADER: "true"},
+        )
+
+    def _check(self, entry: dict, fingerprint: str):
+        if entry["fingerprint"] != fingerprint:
+            self.conflicts += 1
+            raise HTTPException(
+                status_code=422,
+                detail="این Idempotency-Key قبلاً برای درخواست دیگری استفاده شده است",
+            )
+        if entry["status"] is None:
+            # رزرو درخواست اول در پردازه دیگری که هنوز تمام نشده است
+            self.conflicts += 1
+            raise HTTPException(
+                status_code=409,
+                detail="درخواست دیگری با این کلید در حال اجراست؛ کمی بعد تلاش کنید",
+            )
+        self.replays += 1
+        return self._replay(entry)
+
+    @staticmethod
+    def key(scope: str, idempotency_key: Optional[str]) -> Optional[str]:
+        """کلید کامل (با scope)؛ همان مقداری که در پایگاه داده هم یکتا ثبت می‌شود."""
+        return f"{scope}:{idempotency_key}" if idempotency_key else None
+
+    async def _reserve(self, key: str, fingerprint: str) -> Optional[dict]:
+        """کلید را به صورت اتمی رزرو می‌کند؛ اگر از قبل وجود داشت ورودی آن را برمی‌گرداند.
+
+        خطای ذخیره‌ساز مثل رزرو موفق رفتار می‌کند: تکرار روی پردازه دیگر دیگر
+        اینجا شناخته نمی‌شود، ولی کلید یکتای پایگاه داده اعمال دوباره را رد می‌کند.
+        """
+        reservation = {"fingerprint": fingerprint, "status": None}
+        try:
+            if await self.backend.add(key, reservation, self.pending_ttl):
+                return None
+            return await self.backend.get(key)
+        except Exception as e:
+            self.errors += 1
+            print(f"خطا در رزرو Idempotency-Key: {e}")
+            return None
+
+    async def run(
+        self,
+        idempotency_key: Optional[str],
+        scope: str,
+        fingerprint: str,
+        handler: Callable[[], Awaitable[Any]],
+        status_code: int = 200,
+    ):
+        """handler را یک بار برای هر کلید اجرا می‌کند و نتیجه را برای تکرارها برمی‌گرداند.
+
+        scope کلید را به کاربر و مسیر محدود می‌کند و fingerprint پارامترهای
+        درخواست است؛ استفاده از یک کلید با پارامترهای دیگر خطای 422 می‌دهد.
+        کلید پیش از اجرا به صورت اتمی رزرو می‌شود (SET NX در Redis)؛ تکراری که
+        هم‌زمان با اجرای اول در پردازه دیگری برسد خطای 409 می‌گیرد. بدون کلید،
+        handler مستقیماً اجرا می‌شود.
+        """
+        if not idempotency_key:
+            return await handler()
+
+        key = f"idem:{self.key(scope, idempotency_key)}"
+        pending = self._inflight.get(key)
+        if pending is not None:
+            return self._check(await asyncio.shield(pending), fingerprint)
+        entry = await self._reserve(key, fingerprint)
+        if entry is not None:
+            return self._check(entry, fingerprint)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        entry = None
+        try:
+            self.executions += 1
+            try:
+                result = await handler()
+            except HTTPException as e:
+                if e.status_code < 500:
+                    entry = {
+                        "fingerprint": fingerprint,
+                        "status": e.status_code,
+                        "body": e.detail,
+                    }
+                raise
+            entry = {
+                "fingerprint": fingerprint,
+                "status": status_code,
+                "body": jsonable_encoder(result),
+            }
+            return result
+        finally:
+            self._inflight.pop(key, None)
+            try:
+                if entry is not None:
+                    await self.backend.set(key, entry, self.ttl)
+                else:
+                    # تلاش مجدد دوباره اجرا می‌شود؛ اگر تغییر در پایگاه داده ثبت
+                    # شده باشد، کلید یکتای دفتر کل آن را تکرار نمی‌کند
+                    await self.backend.delete(key)
+            except Exception as e:
+                self.errors += 1
+                print(f"خطا در ذخیره نتیجه Idempotency-Key: {e}")
+            if entry is not None:
+                future.set_result(entry)
+            else:
+                # درخواست‌های منتظر نتیجه‌ای برای تکرار ندارند و خودشان خطا می‌گیرند
+                future.set_exception(
+                    HTTPException(
+                        status_code=409,
+                        detail="درخواست اصلی با این کلید ناموفق بود؛ دوباره تلاش کنید",
+                    )
+                )
+                future.exception()  # جلوگیری از هشدار exception never retrieved
+
+    async def close(self):
+        await self.backend.close()
+
+    def stats(self) -> dict:
+        return {
+            "executions": self.executions,
+            "replays": self.replays,
+            "conflicts": self.conflicts,
+            "errors": self.errors,
+            "in_flight": len(self._inflight),
+            "ttl_seconds": self.ttl,
+            **self.backend.stats(),
+        }
+
+
+# نمونه مشترک برای کل برنامه
+idempotency_store = IdempotencyStore(
+    create_backend(CACHE_REDIS_URL, max_entries=IDEMPOTENCY_MAX_KEYS)
+)
@@ -0,0 +1,225 @@
+# leaderboard.py
+
+import asyncio
+import os
+import uuid
+from bisect import bisect_left, insort
+from typing import Awaitable, Callable, Iterable, List, Optional
+
+from dotenv import load_dotenv
+
+# این فایل موتور لیدربورد را پیاده‌سازی می‌کند: یک لیست مرتب از امتیاز کاربران
+# در حافظه که با هر تغییر سکه به‌روز می‌شود، تا top-N و رتبه هر کاربر بدون
+# مرتب‌سازی جدول users در هر درخواست به دست بیاید. برای هماهنگی با تغییراتی
+# که از پردازه‌های دیگر یا مستقیماً در پایگاه داده انجام شده، کل لیست هر
+# LEADERBOARD_REBUILD_INTERVAL ثانیه یک بار از نو ساخته می‌شود.
+
+# بارگذاری متغیرهای محیطی از فایل .env
+load_dotenv()
+
+LEADERBOARD_REBUILD_INTERVAL = float(
+    os.getenv("LEADERBOARD_REBUILD_INTERVAL", "300")
+)  # ثانیه
+
+
+class Leaderboard:
+    """لیست مرتب (-coins, user_id) به همراه نگاشت user_id -> (coins, name).
+
+    رتبه‌بندی رقابتی است: کاربرانی که سکه برابر دارند رتبه یکسان می‌گیرند و
+    رتبه بعدی به اندازه تعدادشان جلو می‌رود (۱، ۲، ۲، ۴). ترتیب نمایش کاربران
+    هم‌امتیاز بر اساس user_id ثابت است. جستجوی رتبه O(log n) است.
+    """
+
+    def __init__(self):
+        self._keys: List[tuple] = []  # (-coins, user_id) به ترتیب صعودی
+        self._users: dict = {}  # user_id -> (coins, name)
+
+    def __len__(self) -> int:
+        return len(self._users)
+
+    def load(self, rows: Iterable[dict]):
+        """کل لیدربورد را از ردیف‌های user_id/name/coins جایگزین می‌کند."""
+        users = {r["user_id"]: (r.get("coins") or 0, r.get("name")) for r in rows}
+        self._users = users
+        self._keys = sorted((-coins, uid) for uid, (coins, _) in users.items())
+
+    def update(self, user_id: str, coins: int, name: Optional[str] = None):
+        """سکه (و در صورت وجود نام) یک کاربر را ثبت می‌کند."""
+        old = self._users.get(user_id)
+        if old is not None:
+            if name is None:
+                name = old[1]
+            if old[0] == coins:
+                self._users[user_id] = (coins, name)
+                return
+            self._keys.pop(bisect_left(self._keys, (-old[0], user_id)))
+        self._users[user_id] = (coins, name)
+        insort(self._keys, (-coins, user_id))
+
+    def remove(self, user_id: str):
+        old = self._users.pop(user_id, None)
+        if old is not None:
+            self._keys.pop(bisect_left(self._keys, (-old[0], user_id)))
+
+    def _rank_of_score(self, coins: int) -> int:
+        # تعداد کاربرانی که سکه بیشتری دارند + ۱
+        return bisect_left(self._keys, (-coins,)) + 1
+
+    def _entry(self, user_id: str, rank: int) -> dict:
+        coins, name = self._users[user_id]
+        return {
+            "user_id": user_id,
+            "name": name or "Unknown",
+            "coins": coins,
+            "rank": rank,
+        }
+
+    def top(self, limit: int, offset: int = 0) -> List[dict]:
+        """کاربران رتبه offset+1 تا offset+limit را به ترتیب برمی‌گرداند."""
+        entries = []
+        rank = prev = None
+        for index, (neg_coins, user_id) in enumerate(
+            self._keys[offset : offset + limit], start=offset
+        ):
+            if neg_coins != prev:
+                # اولین ورودی ممکن است با ورودی‌های پیش از offset هم‌امتیاز باشد
+                if prev is None:
+                    rank = self._rank_of_score(-neg_coins)
+                else:
+                    rank = index + 1
+                prev = neg_coins
+            entries.append(self._entry(user_id, rank))
+        return entries
+
+    def neighbors(self, user_id: str, count: int) -> Optional[dict]:
+        """رتبه کاربر به همراه حداکثر count کاربر بالاتر و پایین‌تر از او."""
+        user = self._users.get(user_id)
+        if user is None:
+            return None
+        index = bisect_left(self._keys, (-user[0], user_id))
+        start = max(index - count, 0)
+        window = self.top(index - start + 1 + count, offset=start)
+        position = index - start
+        return {
+            **window[position],
+            "total_users": len(self._keys),
+            "above": window[:position],
+            "below": window[position + 1 :],
+        }
+
+    def rank(self, user_id: str) -> Optional[dict]:
+        """ورودی لیدربورد یک کاربر (با رتبه‌اش) یا None اگر کاربر وجود نداشته باشد."""
+        user = self._users.get(user_id)
+        if user is None:
+            return None
+        return self._entry(user_id, self._rank_of_score(user[0]))
+
+
+class LeaderboardEngine:
+    """لیدربورد مشترک برنامه به همراه بارگذاری اولیه و بازسازی دوره‌ای.
+
+    loader همه کاربران (user_id، name، coins) را از پایگاه داده برمی‌گرداند.
+    تغییراتی که در حین بازسازی ثبت می‌شوند پس از آن دوباره اعمال می‌شوند تا
+    تصویر قدیمی‌تر پایگاه داده آنها را بازنویسی نکند.
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[], Awaitable[List[dict]]],
+        rebuild_interval: float = LEADERBOARD_REBUILD_INTERVAL,
+    ):
+        self._loader = loader
+        self.rebuild_interval = rebuild_interval
+        self.board = Leaderboard()
+        self._loaded = False
+        self._lock = asyncio.Lock()
+        self._changes: Optional[dict] = None  # تغییرات در حین بازسازی
+        self._task: Optional[asyncio.Task] = None
+        # نسخه لیدربورد برای ETag؛ شناسه نمونه نسخه‌های پردازه‌های مختلف را جدا می‌کند
+        self._instance = uuid.uuid4().hex[:8]
+        self._revision = 0
+        # شمارنده‌ها
+        self.rebuilds = 0
+        self.rebuild_errors = 0
+        self.updates = 0
+
+    async def rebuild(self, if_unloaded: bool = False):
+        """لیدربورد را از پایگاه داده از نو می‌سازد (فقط یک بازسازی هم‌زمان)."""
+        async with self._lock:
+            if if_unloaded and self._loaded:
+                return
+            self._changes = {}
+            try:
+                rows = await self._loader()
+                board = Leaderboard()
+                board.load(rows)
+                for user_id, change in self._changes.items():
+                    if change is None:
+                        board.remove(user_id)
+                    else:
+                        board.update(user_id, *change)
+                self.board = board
+                self._loaded = True
+                self._revision += 1
+                self.rebuilds += 1
+            finally:
+                self._changes = None
+
+    async def ready(self) -> Leaderboard:
+        """لیدربورد را برمی‌گرداند و اگر هنوز بارگذاری نشده، منتظر بارگذاری می‌ماند."""
+        if not self._loaded:
+            await self.rebuild(if_unloaded=True)
+        return self.board
+
+    @property
+    def version(self) -> str:
+        """با هر تغییر سکه، حذف کاربر یا بازسازی عوض می‌شود."""
+        return f"{self._instance}:{self._revision}"
+
+    def update(self, user_id: str, coins: Optional[int], name: Optional[str] = None):
+        """سکه جدید یک کاربر را ثبت می‌کند (مقدار None نادیده گرفته می‌شود)."""
+        if coins is None:
+            return
+        self.updates += 1
+        self._revision += 1
+        self.board.update(user_id, coins, name)
+        if self._changes is not None:
+            self._changes[user_id] = (coins, name)
+
+    def remove(self, user_id: str):
+        self._revision += 1
+        self.board.remove(user_id)
+        if self._changes is not None:
+            self._changes[user_id] = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.rebuild_interval)
+            try:
+                await self.rebuild()
+            except Exception as e:
+                self.rebuild_errors += 1
+                print(f"خطا در بازسازی لیدربورد: {e}")
+
+    def start(self):
+        if self.rebuild_interval > 0 and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "users": len(self.board),
+            "loaded": self._loaded,
+            "updates": self.updates,
+            "rebuilds": self.rebuilds,
+            "rebuild_errors": self.rebuild_errors,
+            "rebuild_interval_seconds": self.rebuild_interval,
+        }
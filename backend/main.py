@@ -1,47 +1,142 @@
 # main.py
 
+import asyncio
 import mimetypes
 import os
-import uuid
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
 from typing import List, Optional
 
 # وارد کردن کتابخانههای مورد نیاز
 # وارد کردن ماژول‌ها و تنظیمات
 # ماژول احراز هویت برای گرفتن اطلاعات کاربر فعلی
-from auth import get_current_user
+from auth import get_current_user, get_optional_user, jwks_cache, token_cache
+from cache import read_cache  # کش read-through لیست پستها و کامنتها
+from compression import CompressionMiddleware  # فشردهسازی brotli/gzip پاسخها
+from conditional import conditional_stats, make_etag, not_modified  # ETag و 304
+from db import QueryCountMiddleware, db, query_stats  # لایه دسترسی async به Supabase
+from downloads import (  # لینکهای امضاشده و پراکسی دانلود
+    PURCHASE_INDEX_TTL,
+    SignedUrlCache,
+    proxy_download,
+    storage_path,
+)
 from dotenv import load_dotenv  # برای خواندن متغیرهای محیطی از فایل .env
+from events import event_bus  # ارسال زنده تغییرات به کلاینتها (SSE)
+from feed import (  # فید رتبهبندی شده پستها
+    FEED_CANDIDATES,
+    FEED_LIKE_WEIGHT,
+    FEED_TAU,
+    FEED_VIEW_WEIGHT,
+    FeedEngine,
+    decode_position,
+    encode_position,
+)
 from fastapi import (
     Depends,
     FastAPI,
     File,
     Form,
+    Header,
     HTTPException,
+    Query,
+    Request,
+    Response,
     UploadFile,
     status,
 )
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import (
     CORSMiddleware,
 )
+import httpx
+from idempotency import idempotency_store  # پشتیبانی از هدر Idempotency-Key
+from leaderboard import LeaderboardEngine  # رتبهبندی کاربران در حافظه
+from pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, keyset_page, split_page
+from postgrest import CountMethod, ReturnMethod
+from postgrest.exceptions import APIError
+from projection import (  # ستونهای خوانده شده و پارامتر fields=
+    COMMENT_COLUMNS,
+    PAGE_KEY_COLUMNS,
+    POST_COLUMNS,
+    PRODUCT_COLUMNS,
+    FieldsQuery,
+    parse_fields,
+    select_columns,
+    wants,
+)
 from pydantic import BaseModel
+from responses import FastJSONResponse, trusted_response  # سریالسازی سریع JSON
 from schemas import (
     AdminUser,
     Comment,
     CommentCreate,
+    CommentPage,
+    DownloadLink,
+    EventTopic,
     LeaderboardEntry,
     PostCreate,
+    PostPage,
     Posts,
     Product,
     ProductCreate,
+    ProductStats,
     Purchase,
+    SearchKind,
+    SearchPage,
     User,
+    UserCoins,
+    UserRank,
+    ViewAck,
+)
+from uploads import (  # آپلود جریانی و تکه به تکه فایلها
+    MULTIPART_OVERHEAD,
+    UPLOAD_MAX_BYTES,
+    BodySizeLimitMiddleware,
+    UploadTooLarge,
+    content_path,
+    file_sha256,
+    upload_resumable,
+    upload_stats,
 )
-from supabase import Client, create_client
+from view_buffer import ViewBuffer  # بافر write-behind بازدیدها
+
+# بارگذاری متغیرهای محیطی از فایل .env
+load_dotenv()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """اتصال‌های مشترک را هنگام شروع برنامه باز و هنگام خاموشی می‌بندد."""
+    await db.connect()
+    await event_bus.start()
+    post_views.start()
+    comment_views.start()
+    leaderboard.start()
+    feed.start()
+    try:
+        yield
+    finally:
+        await leaderboard.close()
+        await feed.close()
+        # بازدیدهای باقیمانده پیش از بستن اتصالها ثبت میشوند
+        await post_views.close()
+        await comment_views.close()
+        await event_bus.close()
+        await read_cache.close()
+        await idempotency_store.close()
+        await db.close()
+
 
 # نمونهسازی از FastAPI
 app = FastAPI(
     title="مدیریت پستها",
     description="یک API پایه برای مدیریت پستهای ایجاد شده توسط کاربران.",
     version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse,
 )
 
 # پیکربندی CORS برای اجازه دادن به درخواستها از دامنههای مشخص
@@ -58,14 +153,18 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# راهاندازی کلاینت Supabase
-# بارگذاری متغیرهای محیطی از فایل .env
-load_dotenv()
+# درخواستهای آپلود بزرگتر از سقف حجم، پیش از دریافت کامل بدنه رد میشوند
+app.add_middleware(
+    BodySizeLimitMiddleware,
+    paths=["/shop/upload"],
+    max_bytes=UPLOAD_MAX_BYTES + MULTIPART_OVERHEAD,
+)
+
+# پاسخهای بزرگتر از COMPRESSION_MIN_SIZE با brotli یا gzip فشرده میشوند
+app.add_middleware(CompressionMiddleware)
 
-# راهاندازی کلاینت Supabase
-url: str = os.environ.get("SUPABASE_URL", "")
-key: str = os.environ.get("SUPABASE_KEY", "")
-supabase: Client = create_client(url, key)
+# شمارش کوئریهای پایگاه داده هر درخواست (بخش db_queries در /admin/metrics)
+app.add_middleware(QueryCountMiddleware)
 
 # Note: ADMIN_EMAILS may be changed in the environment; fetch at runtime in _is_admin
 
@@ -74,45 +173,293 @@ class AddCoinsRequest(BaseModel):
     amount: int
 
 
-# یک تابع کمکی برای مدیریت افزایش/کاهش سکه کاربر
-def _update_user_coins(user_id: str, amount: int):
-    """سکه کاربر را بر اساس مقدار داده شده افزایش یا کاهش میدهد.
+# هدر اختیاری برای تکرار امن درخواستهایی که سکه جابهجا میکنند
+IdempotencyKey = Header(
+    None,
+    alias="Idempotency-Key",
+    max_length=255,
+    description="کلید یکتای درخواست؛ تکرار آن همان پاسخ قبلی را برمیگرداند",
+)
+
 
-    اگر به‌روزرسانی با خطا مواجه شود، یک HTTPException پرتاب می‌شود.
+# پیام خطاهای شناخته شده توابع پایگاه داده (errcode P0001) و متن قابل نمایش آنها
+RPC_ERROR_DETAILS = {
+    "insufficient_coins": "موجودی سکه کافی نیست",
+    "own_product": "نمی‌توانید محصول خودتان را بخرید",
+    "already_purchased": "شما قبلا این محصول را خریدهاید",
+}
+
+
+async def _rpc(func: str, params: dict, not_found_detail: str, error_detail: str):
+    """یک تابع پایگاه داده را اجرا و خطاهای شناخته شده آن را به HTTPException تبدیل میکند.
+
+    P0002 به 404 و پیامهای RPC_ERROR_DETAILS به 400 تبدیل میشوند.
     """
     try:
-        rpc_res = supabase.rpc(
-            "update_coins", {"user_id_in": user_id, "amount": amount}
-        ).execute()
-        # بررسی اینکه آیا rpc خطا برگردانده
-        if getattr(rpc_res, "error", None):
-            raise Exception(
-                getattr(rpc_res, "error").get("message", "RPC update_coins error")
-            )
+        result = await db.rpc(func, params).execute()
+    except APIError as e:
+        if e.code == "P0002":
+            raise HTTPException(status_code=404, detail=not_found_detail)
+        if e.message in RPC_ERROR_DETAILS:
+            raise HTTPException(status_code=400, detail=RPC_ERROR_DETAILS[e.message])
+        print(f"خطا در فراخوانی {func}: {e}")
+        raise HTTPException(status_code=500, detail=f"{error_detail}: {e.message}")
+    return result.data
+
 
-        # خواندن موجودی نهایی
-        result = (
-            supabase.table("users")
-            .select("coins")
-            .eq("user_id", user_id)
-            .single()
+# یک تابع کمکی برای مدیریت افزایش/کاهش سکه کاربر
+async def _update_user_coins(
+    user_id: str, amount: int, reason: str, idempotency_key: Optional[str] = None
+) -> int:
+    """سکه کاربر را افزایش یا کاهش داده و موجودی جدید را برمیگرداند.
+
+    تغییر با تابع post_coins در دفتر کل سکهها ثبت میشود؛ موجودی در همان تراکنش
+    بهروز میشود و هرگز منفی نمیشود (خطای 400)، پس نیازی به جبران نیست.
+    idempotency_key در دفتر کل یکتاست: تکرار آن موجودی فعلی را بدون تغییر
+    دوباره برمیگرداند (013_idempotent_coins.sql).
+    """
+    coins = await _rpc(
+        "post_coins",
+        {
+            "user_id_in": user_id,
+            "amount_in": amount,
+            "reason_in": reason,
+            "idempotency_key_in": idempotency_key,
+        },
+        "کاربر یافت نشد",
+        "خطا در به‌روزرسانی سکه",
+    )
+    leaderboard.update(user_id, coins)
+    # صفحههای کش شده سکه و نشان نویسنده و فروشنده را در خود دارند
+    await read_cache.invalidate("posts", "products")
+    await _publish_coins(user_id, coins)
+    return coins
+
+
+async def _publish_coins(user_id: str, coins: Optional[int]):
+    if user_id and coins is not None:
+        await event_bus.publish(
+            "coins", "coins.updated", {"user_id": user_id, "coins": coins}
+        )
+
+
+async def _reaction_rpc(func: str, params: dict, not_found_detail: str) -> dict:
+    """یک تابع واکنش (لایک) پایگاه داده را با یک فراخوانی RPC اجرا میکند.
+
+    توابع پایگاه داده جدول واکنشها، شمارندهها و سکه نویسنده را در یک تراکنش
+    تغییر داده و ردیف بهروز شده را به همراه liked_by_me/viewed_by_me برمیگردانند.
+    اگر واکنش چیزی را تغییر داده باشد، کش پست یا کامنتهای مربوط نامعتبر و
+    شمارندههای جدید برای کلاینتهای متصل ارسال میشوند.
+    """
+    row = await _rpc(func, params, not_found_detail, "خطا در ثبت واکنش")
+    if row.get("changed"):
+        # لایک سکه نویسنده را تغییر میدهد
+        leaderboard.update(row["user_id"], row.get("author_coins"))
+        counts = {
+            "id": row["id"],
+            "like_count": row.get("like_count"),
+            "view_count": row.get("view_count"),
+        }
+        if "comment_id_in" in params:
+            await read_cache.invalidate(f"comments:{row['post_id']}")
+            await event_bus.publish(
+                "comments", "comment.updated", {**counts, "post_id": row["post_id"]}
+            )
+        else:
+            feed.like(row["id"], params["liked_in"], row.get("author_coins"))
+            await read_cache.invalidate("posts", f"post:{row['id']}")
+            await event_bus.publish("posts", "post.updated", counts)
+        await _publish_coins(row["user_id"], row.get("author_coins"))
+    return row
+
+
+async def _attach_viewer_flags(
+    rows: List[dict], table: str, id_field: str, user: Optional[dict]
+) -> List[dict]:
+    """liked_by_me و viewed_by_me را برای کاربر فعلی با یک کوئری تعیین میکند."""
+    mine = set()
+    if user and rows:
+        result = await (
+            db.table(table)
+            .select(f"{id_field}, kind")
+            .eq("user_id", user.get("sub"))
+            .in_(id_field, [row["id"] for row in rows])
             .execute()
         )
-        coins = None
-        if result and getattr(result, "data", None):
-            coins = result.data.get("coins")
-
-        if coins is not None and coins < 0:
-            # rollback
-            supabase.rpc(
-                "update_coins", {"user_id_in": user_id, "amount": -amount}
-            ).execute()
-            raise HTTPException(status_code=400, detail="موجودی سکه کافی نیست")
-    except HTTPException:
-        raise
-    except Exception as e:
-        print(f"خطا در به‌روزرسانی سکه برای کاربر {user_id}: {e}")
-        raise HTTPException(status_code=500, detail=f"خطا در به‌روزرسانی سکه: {str(e)}")
+        mine = {(r[id_field], r["kind"]) for r in result.data or []}
+    for row in rows:
+        row["liked_by_me"] = (row["id"], "like") in mine
+        row["viewed_by_me"] = (row["id"], "view") in mine
+    return rows
+
+
+async def _fetch_coins(user_ids) -> dict:
+    """سکههای چند کاربر را با یک کوئری in_() برمیگرداند (user_id -> coins)."""
+    ids = sorted({uid for uid in user_ids if uid})
+    if not ids:
+        return {}
+    result = await (
+        db.table("users").select("user_id, coins").in_("user_id", ids).execute()
+    )
+    return {r["user_id"]: r.get("coins") or 0 for r in result.data or []}
+
+
+async def _attach_author_coins(
+    rows: List[dict], user_field: str = "user_id", coins_field: str = "author_coins"
+) -> List[dict]:
+    """سکههای نویسنده هر ردیف را برای نمایش نشان به آن اضافه میکند."""
+    coins = await _fetch_coins(row.get(user_field) for row in rows)
+    for row in rows:
+        row[coins_field] = coins.get(row.get(user_field), 0)
+    return rows
+
+
+async def _conditional(
+    request: Request, response: Response, user: Optional[dict], *namespaces: str
+) -> Optional[Response]:
+    """درخواست شرطی یک پاسخ ساخته شده از فضاهای نام read_cache را بررسی میکند.
+
+    ETag از نسخه فضاهای نام، آدرس درخواست و کاربر ساخته میشود؛ اگر کلاینت
+    همین ETag را داشته باشد پاسخ 304 برگردانده میشود (در غیر این صورت None).
+    """
+    version = await read_cache.validator(*namespaces)
+    etag = None
+    if version is not None:
+        etag = make_etag(
+            version, request.url.path, request.url.query, user and user.get("sub")
+        )
+    return not_modified(request, response, etag, private=user is not None)
+
+
+# بارگذارندههای بخش مشترک پاسخها (بدون پرچمهای کاربر) برای read_cache
+
+
+def _author_columns(fields: Optional[tuple]) -> tuple:
+    """ستونهای لازم برای صفحهبندی و (در صورت نیاز) سکه نویسنده."""
+    if wants(fields, "author_coins", "author_badge"):
+        return (*PAGE_KEY_COLUMNS, "user_id")
+    return PAGE_KEY_COLUMNS
+
+
+async def _load_post_page(
+    limit: int, before: Optional[str], fields: Optional[tuple] = None
+) -> dict:
+    columns = select_columns(POST_COLUMNS, fields, _author_columns(fields))
+    result = await keyset_page(
+        db.table("posts").select(columns), limit, before
+    ).execute()
+    items, next_cursor = split_page(result.data, limit)
+    if wants(fields, "author_coins", "author_badge"):
+        await _attach_author_coins(items)
+    return {"items": items, "next_cursor": next_cursor}
+
+
+async def _load_post(post_id: int) -> Optional[dict]:
+    result = await (
+        db.table("posts")
+        .select(select_columns(POST_COLUMNS, None))
+        .eq("id", post_id)
+        .maybe_single()
+        .execute()
+    )
+    if result is None or not result.data:
+        return None
+    return (await _attach_author_coins([result.data]))[0]
+
+
+async def _flush_post_views(views: List[tuple]):
+    """بازدیدهای بافر شده پستها را با یک RPC ثبت و کش پستهای تغییر کرده را باطل میکند."""
+    result = await db.rpc(
+        "record_post_views",
+        {"views": [{"id": post_id, "user_id": user_id} for post_id, user_id in views]},
+    ).execute()
+    changed = result.data or []
+    if changed:
+        await read_cache.invalidate("posts", *(f"post:{row['id']}" for row in changed))
+    for row in changed:
+        # بازدیدهای جدید در امتیاز فید هم اثر دارند
+        feed.view(row["id"], row["added"])
+        await event_bus.publish(
+            "posts", "post.updated", {"id": row["id"], "view_count": row["view_count"]}
+        )
+
+
+async def _flush_comment_views(views: List[tuple]):
+    """بازدیدهای بافر شده کامنتها را با یک RPC ثبت میکند."""
+    result = await db.rpc(
+        "record_comment_views",
+        {"views": [{"id": cid, "user_id": user_id} for cid, user_id in views]},
+    ).execute()
+    changed = result.data or []
+    await read_cache.invalidate(*{f"comments:{row['post_id']}" for row in changed})
+    for row in changed:
+        await event_bus.publish("comments", "comment.updated", row)
+
+
+post_views = ViewBuffer("posts", _flush_post_views)
+comment_views = ViewBuffer("comments", _flush_comment_views)
+
+
+LEADERBOARD_LOAD_BATCH = 1000  # سقف پیشفرض ردیفهای هر پاسخ PostgREST
+
+
+async def _load_leaderboard_users() -> List[dict]:
+    """همه کاربران را صفحه به صفحه (به ترتیب user_id) برای ساخت لیدربورد میخواند."""
+    rows: List[dict] = []
+    last_id = None
+    while True:
+        query = db.table("users").select("user_id, name, coins").order("user_id")
+        if last_id is not None:
+            query = query.gt("user_id", last_id)
+        result = await query.limit(LEADERBOARD_LOAD_BATCH).execute()
+        rows.extend(result.data or [])
+        if len(result.data or []) < LEADERBOARD_LOAD_BATCH:
+            return rows
+        last_id = rows[-1]["user_id"]
+
+
+leaderboard = LeaderboardEngine(_load_leaderboard_users)
+
+
+async def _load_feed_scores() -> List[dict]:
+    """امتیاز داغی پستهای اخیر را برای ساخت فید رتبهبندی شده میخواند."""
+    result = await db.rpc(
+        "feed_scores",
+        {
+            "limit_in": FEED_CANDIDATES,
+            "tau_in": FEED_TAU,
+            "like_weight_in": FEED_LIKE_WEIGHT,
+            "view_weight_in": FEED_VIEW_WEIGHT,
+        },
+    ).execute()
+    return result.data or []
+
+
+feed = FeedEngine(_load_feed_scores)
+
+
+async def _load_posts_by_ids(post_ids: List[int]) -> dict:
+    result = await (
+        db.table("posts")
+        .select(select_columns(POST_COLUMNS, None))
+        .in_("id", post_ids)
+        .execute()
+    )
+    rows = await _attach_author_coins(result.data or [])
+    return {row["id"]: row for row in rows}
+
+
+async def _load_comment_page(
+    post_id: int, limit: int, before: Optional[str], fields: Optional[tuple] = None
+) -> dict:
+    columns = select_columns(COMMENT_COLUMNS, fields, _author_columns(fields))
+    result = await keyset_page(
+        db.table("comments").select(columns).eq("post_id", post_id), limit, before
+    ).execute()
+    items, next_cursor = split_page(result.data, limit)
+    if wants(fields, "author_coins", "author_badge"):
+        await _attach_author_coins(items)
+    return {"items": items, "next_cursor": next_cursor}
 
 
 def _is_admin(user: dict) -> bool:  # noqa: C901
@@ -156,7 +503,7 @@ def _is_admin(user: dict) -> bool:  # noqa: C901
 
 
 @app.get("/admin/check", tags=["ادمین"], summary="بررسی ادمین (debug)")
-def admin_check(user: dict = Depends(get_current_user)):  # noqa: C901
+async def admin_check(user: dict = Depends(get_current_user)):  # noqa: C901
     """بازمی‌گرداند: payload توکن فعلی، ایمیل‌های استخراج شده و لیست ADMIN_EMAILS برای دیباگ."""  # noqa: E501
     # Extract emails using the same logic as _is_admin
     user_emails = set()
@@ -211,7 +558,7 @@ def admin_check(user: dict = Depends(get_current_user)):  # noqa: C901
 
 
 @app.get("/", tags=["عمومی"], summary="نقطه شروع API")
-def read_root():
+async def read_root():
     """یک پیام خوشآمدگویی ساده برای تایید اجرای API."""
     return {"message": "به Post API خوش آمدید! برای مستندات به /docs مراجعه کنید."}
 
@@ -219,15 +566,77 @@ def read_root():
 # --- بخش مدیریت پستها ---
 
 
+@app.get("/posts", response_model=PostPage, tags=["پستها"], summary="دریافت پستها")
+async def get_all_posts(
+    request: Request,
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    before: Optional[str] = None,
+    fields: Optional[str] = FieldsQuery,
+    user: Optional[dict] = Depends(get_optional_user),
+):
+    """
+    پستها را از جدیدترین به قدیمیترین و صفحه به صفحه بازیابی میکند.
+    - **limit**: تعداد پستهای هر صفحه.
+    - **before**: مقدار next_cursor صفحه قبل برای دریافت صفحه بعد.
+    - **fields**: فقط این فیلدهای هر پست برگردانده (و خوانده) میشوند.
+    با هدر If-None-Match و ETag پاسخ قبلی، اگر چیزی تغییر نکرده باشد 304 برمیگردد.
+    """
+    projected = parse_fields(Posts, fields)
+    if not_changed := await _conditional(request, response, user, "posts"):
+        return not_changed
+    page = await read_cache.get_or_load(
+        "posts",
+        (limit, before or "", *(projected or ())),
+        lambda: _load_post_page(limit, before, projected),
+    )
+    # ردیفهای کش مشترکاند؛ پرچمهای کاربر روی یک کپی اضافه میشوند
+    items = [dict(row) for row in page["items"]]
+    if wants(projected, "liked_by_me", "viewed_by_me"):
+        await _attach_viewer_flags(items, "post_reactions", "post_id", user)
+    return trusted_response(
+        PostPage,
+        {"items": items, "next_cursor": page["next_cursor"]},
+        response,
+        fields=projected,
+    )
+
+
 @app.get(
-    "/posts", response_model=List[Posts], tags=["پستها"], summary="دریافت تمام پستها"
+    "/feed",
+    response_model=PostPage,
+    tags=["پستها"],
+    summary="فید رتبهبندی شده پستها",
 )
-def get_all_posts():
-    """لیستی از تمام پستهای موجود در پایگاه داده را بازیابی میکند."""
-    result = (
-        supabase.table("posts").select("*").order("created_at", desc=True).execute()
+async def get_ranked_feed(
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    before: Optional[str] = None,
+    fields: Optional[str] = FieldsQuery,
+    user: Optional[dict] = Depends(get_optional_user),
+):
+    """
+    پستها را به ترتیب امتیاز فید برمیگرداند: تازگی پست، سرعت لایکها و
+    بازدیدهای اخیر و سطح نشان نویسنده.
+    - **limit**: تعداد پستهای هر صفحه.
+    - **before**: مقدار next_cursor صفحه قبل برای دریافت صفحه بعد.
+    - **fields**: فقط این فیلدهای هر پست برگردانده میشوند.
+    رتبهبندی در حافظه نگه داشته میشود و ردیف پستها از کش خوانده میشوند.
+    """
+    projected = parse_fields(Posts, fields)
+    ranking = await feed.ready()
+    post_ids, last = ranking.page(limit, decode_position(before) if before else None)
+    rows = await read_cache.get_or_load_many("post:", post_ids, _load_posts_by_ids)
+    # ردیفهای کش مشترکاند؛ پرچمهای کاربر روی یک کپی اضافه میشوند
+    items = [dict(rows[pid]) for pid in post_ids if pid in rows]
+    if wants(projected, "liked_by_me", "viewed_by_me"):
+        await _attach_viewer_flags(items, "post_reactions", "post_id", user)
+    return trusted_response(
+        PostPage,
+        {"items": items, "next_cursor": encode_position(last) if last else None},
+        response,
+        fields=projected,
     )
-    return result.data
 
 
 @app.post(
@@ -237,25 +646,28 @@ def get_all_posts():
     tags=["پستها"],
     summary="ایجاد یک پست جدید",
 )
-def create_post(post_create: PostCreate, user: dict = Depends(get_current_user)):
+async def create_post(post_create: PostCreate, user: dict = Depends(get_current_user)):
     """
     یک پست جدید ایجاد میکند.
     - **title**: عنوان پست (حداقل ۳ کاراکتر).
     - **contains**: محتوای پست (حداقل ۳ کاراکتر).
     """
-    result = (
-        supabase.table("posts")
-        .insert({
-            "title": post_create.title,
-            "contains": post_create.contains,
-            "creator": user.get("name"),
-            "user_id": user.get("sub"),
-            "likes": [],
-            "views": [],
-        })
-        .execute()
+    # درج پست و خواندن سکه نویسنده با یک فراخوانی
+    row = await _rpc(
+        "insert_post",
+        {
+            "user_id_in": user.get("sub"),
+            "creator_in": user.get("name"),
+            "title_in": post_create.title,
+            "contains_in": post_create.contains,
+        },
+        "کاربر یافت نشد",
+        "خطا در ایجاد پست",
     )
-    return result.data[0]
+    await read_cache.invalidate("posts", "search")
+    feed.add(row["id"], time.time(), row.get("author_coins"))
+    await event_bus.publish("posts", "post.created", row)
+    return row
 
 
 @app.get(
@@ -264,15 +676,26 @@ def create_post(post_create: PostCreate, user: dict = Depends(get_current_user))
     tags=["پستها"],
     summary="دریافت یک پست با شناسه",
 )
-def get_post_by_id(post_id: int):
-    """یک پست را با شناسه منحصر به فرد آن بازیابی میکند."""
-    result = supabase.table("posts").select("*").eq("id", post_id).single().execute()
-    if not result.data:
+async def get_post_by_id(
+    post_id: int,
+    request: Request,
+    response: Response,
+    user: Optional[dict] = Depends(get_optional_user),
+):
+    """یک پست را با شناسه منحصر به فرد آن بازیابی میکند (با پشتیبانی از ETag/304)."""
+    if not_changed := await _conditional(request, response, user, f"post:{post_id}"):
+        return not_changed
+    cached = await read_cache.get_or_load(
+        f"post:{post_id}", (), lambda: _load_post(post_id)
+    )
+    if not cached:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"پستی با شناسه {post_id} یافت نشد",
         )
-    return result.data
+    post = dict(cached)
+    await _attach_viewer_flags([post], "post_reactions", "post_id", user)
+    return post
 
 
 @app.post(
@@ -281,37 +704,13 @@ def get_post_by_id(post_id: int):
     tags=["پستها"],
     summary="لایک کردن یک پست",
 )
-def like_post(post_id: int, user: dict = Depends(get_current_user)):
+async def like_post(post_id: int, user: dict = Depends(get_current_user)):
     """یک پست مشخص را لایک میکند."""
-    user_id = user.get("sub")
-
-    # ابتدا پست را پیدا میکنیم
-    post_res = (
-        supabase.table("posts")
-        .select("likes, user_id")
-        .eq("id", post_id)
-        .single()
-        .execute()
+    return await _reaction_rpc(
+        "set_post_like",
+        {"post_id_in": post_id, "user_id_in": user.get("sub"), "liked_in": True},
+        "پست یافت نشد",
     )
-    if not post_res.data:
-        raise HTTPException(status_code=404, detail="پست یافت نشد")
-
-    post = post_res.data
-    likes = post.get("likes", [])
-
-    # اگر کاربر قبلا لایک نکرده باشد
-    if user_id not in likes:
-        likes.append(user_id)
-        # به نویسنده پست یک سکه اضافه میکنیم
-        _update_user_coins(post["user_id"], 1)
-        # لیست لایکها را بهروز میکنیم
-        updated_post = (
-            supabase.table("posts").update({"likes": likes}).eq("id", post_id).execute()
-        )
-        return updated_post.data[0]
-
-    # اگر قبلا لایک کرده، خود پست را برمیگردانیم
-    return get_post_by_id(post_id)
 
 
 @app.delete(
@@ -320,58 +719,30 @@ def like_post(post_id: int, user: dict = Depends(get_current_user)):
     tags=["پستها"],
     summary="برداشتن لایک یک پست",
 )
-def delete_like_post(post_id: int, user: dict = Depends(get_current_user)):
+async def delete_like_post(post_id: int, user: dict = Depends(get_current_user)):
     """لایک یک پست مشخص را برمیدارد."""
-    user_id = user.get("sub")
-
-    post_res = (
-        supabase.table("posts")
-        .select("likes, user_id")
-        .eq("id", post_id)
-        .single()
-        .execute()
+    return await _reaction_rpc(
+        "set_post_like",
+        {"post_id_in": post_id, "user_id_in": user.get("sub"), "liked_in": False},
+        "پست یافت نشد",
     )
-    if not post_res.data:
-        raise HTTPException(status_code=404, detail="پست یافت نشد")
-
-    post = post_res.data
-    likes = post.get("likes", [])
-
-    if user_id in likes:
-        likes.remove(user_id)
-        # از نویسنده پست یک سکه کم میکنیم
-        _update_user_coins(post["user_id"], -1)
-        updated_post = (
-            supabase.table("posts").update({"likes": likes}).eq("id", post_id).execute()
-        )
-        return updated_post.data[0]
-
-    return get_post_by_id(post_id)
 
 
 @app.post(
     "/posts/{post_id}/view",
-    response_model=Posts,
+    response_model=ViewAck,
+    status_code=status.HTTP_202_ACCEPTED,
     tags=["پستها"],
     summary="مشاهده یک پست",
 )
-def view_post(post_id: int, user: dict = Depends(get_current_user)):
-    """یک بازدید برای پست ثبت میکند."""
-    user_id = user.get("sub")
-
-    post_res = (
-        supabase.table("posts").select("views").eq("id", post_id).single().execute()
-    )
-    if not post_res.data:
-        raise HTTPException(status_code=404, detail="پست یافت نشد")
-
-    views = post_res.data.get("views", [])
-
-    if user_id not in views:
-        views.append(user_id)
-        supabase.table("posts").update({"views": views}).eq("id", post_id).execute()
-
-    return get_post_by_id(post_id)
+async def view_post(post_id: int, user: dict = Depends(get_current_user)):
+    """
+    یک بازدید برای پست در بافر ثبت میکند و فوراً پاسخ میدهد.
+    بازدیدها هر VIEW_FLUSH_INTERVAL ثانیه به صورت دستهای در پایگاه داده ثبت میشوند.
+    وجود پست بررسی نمیشود: برای شناسه ناموجود هم 202 برمیگردد و بازدید هنگام
+    ثبت دستهای (record_post_views) نادیده گرفته میشود.
+    """
+    return {"queued": post_views.add(post_id, user.get("sub"))}
 
 
 @app.delete(
@@ -380,17 +751,26 @@ def view_post(post_id: int, user: dict = Depends(get_current_user)):
     tags=["پستها"],
     summary="حذف یک پست",
 )
-def delete_post(post_id: int, user: dict = Depends(get_current_user)):
+async def delete_post(post_id: int, user: dict = Depends(get_current_user)):
     """یک پست مشخص را در صورتی که کاربر مالک آن باشد حذف میکند."""
-    post_data = (
-        supabase.table("posts").select("user_id").eq("id", post_id).single().execute()
+    # مالکیت در همان دستور حذف بررسی میشود؛ صفر ردیف یعنی پست نیست یا مال کاربر نیست
+    result = await (
+        db.table("posts")
+        .delete(count=CountMethod.exact, returning=ReturnMethod.minimal)
+        .eq("id", post_id)
+        .eq("user_id", user.get("sub"))
+        .execute()
     )
-    if not post_data.data or post_data.data["user_id"] != user.get("sub"):
+    if not result.count:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="شما اجازه حذف این پست را ندارید",
         )
-    supabase.table("posts").delete().eq("id", post_id).execute()
+    feed.remove(post_id)
+    await read_cache.invalidate(
+        "posts", f"post:{post_id}", f"comments:{post_id}", "search"
+    )
+    await event_bus.publish("posts", "post.deleted", {"id": post_id})
     return
 
 
@@ -399,20 +779,43 @@ def delete_post(post_id: int, user: dict = Depends(get_current_user)):
 
 @app.get(
     "/posts/{post_id}/comments",
-    response_model=List[Comment],
+    response_model=CommentPage,
     tags=["کامنتها"],
-    summary="دریافت تمام کامنتهای یک پست",
-)
-def get_comments(post_id: int):
-    """تمام کامنتهای یک پست را به ترتیب زمان ایجاد بازیابی میکند."""
-    result = (
-        supabase.table("comments")
-        .select("*")
-        .eq("post_id", post_id)
-        .order("created_at", desc=True)
-        .execute()
+    summary="دریافت کامنتهای یک پست",
+)
+async def get_comments(
+    post_id: int,
+    request: Request,
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    before: Optional[str] = None,
+    fields: Optional[str] = FieldsQuery,
+    user: Optional[dict] = Depends(get_optional_user),
+):
+    """کامنتهای یک پست را از جدیدترین به قدیمیترین و صفحه به صفحه بازیابی میکند.
+
+    fields فقط این فیلدهای هر کامنت را برمیگرداند (و میخواند). با هدر
+    If-None-Match و ETag پاسخ قبلی، اگر چیزی تغییر نکرده باشد 304 برمیگردد.
+    """
+    projected = parse_fields(Comment, fields)
+    if not_changed := await _conditional(
+        request, response, user, f"comments:{post_id}"
+    ):
+        return not_changed
+    page = await read_cache.get_or_load(
+        f"comments:{post_id}",
+        (limit, before or "", *(projected or ())),
+        lambda: _load_comment_page(post_id, limit, before, projected),
+    )
+    items = [dict(row) for row in page["items"]]
+    if wants(projected, "liked_by_me", "viewed_by_me"):
+        await _attach_viewer_flags(items, "comment_reactions", "comment_id", user)
+    return trusted_response(
+        CommentPage,
+        {"items": items, "next_cursor": page["next_cursor"]},
+        response,
+        fields=projected,
     )
-    return result.data
 
 
 @app.post(
@@ -422,30 +825,27 @@ def get_comments(post_id: int):
     tags=["کامنتها"],
     summary="ایجاد کامنت برای یک پست",
 )
-def create_comment(
+async def create_comment(
     post_id: int, comment_create: CommentCreate, user: dict = Depends(get_current_user)
 ):
-    """یک کامنت برای پست مشخص ایجاد میکند."""
-    # بررسی وجود پست
-    post_exists = (
-        supabase.table("posts").select("id").eq("id", post_id).single().execute()
-    )
-    if not post_exists.data:
-        raise HTTPException(status_code=404, detail=f"پستی با شناسه {post_id} یافت نشد")
+    """یک کامنت برای پست مشخص ایجاد میکند.
 
-    result = (
-        supabase.table("comments")
-        .insert({
-            "post_id": post_id,
-            "content": comment_create.content,
-            "creator": user.get("name"),
-            "user_id": user.get("sub"),
-            "likes": [],
-            "views": [],
-        })
-        .execute()
+    وجود پست با کلید خارجی در همان درج بررسی میشود (پست ناموجود: 404).
+    """
+    row = await _rpc(
+        "insert_comment",
+        {
+            "post_id_in": post_id,
+            "user_id_in": user.get("sub"),
+            "creator_in": user.get("name"),
+            "content_in": comment_create.content,
+        },
+        f"پستی با شناسه {post_id} یافت نشد",
+        "خطا در ایجاد کامنت",
     )
-    return result.data[0]
+    await read_cache.invalidate(f"comments:{post_id}", "search")
+    await event_bus.publish("comments", "comment.created", row)
+    return row
 
 
 @app.post(
@@ -454,38 +854,13 @@ def create_comment(
     tags=["کامنتها"],
     summary="لایک کردن یک کامنت",
 )
-def like_comment(comment_id: int, user: dict = Depends(get_current_user)):
+async def like_comment(comment_id: int, user: dict = Depends(get_current_user)):
     """یک کامنت مشخص را لایک میکند."""
-    user_id = user.get("sub")
-
-    comment_res = (
-        supabase.table("comments")
-        .select("likes, user_id")
-        .eq("id", comment_id)
-        .single()
-        .execute()
-    )
-    if not comment_res.data:
-        raise HTTPException(status_code=404, detail="کامنت یافت نشد")
-
-    comment = comment_res.data
-    likes = comment.get("likes", [])
-
-    if user_id not in likes:
-        likes.append(user_id)
-        _update_user_coins(comment["user_id"], 1)
-        updated_comment = (
-            supabase.table("comments")
-            .update({"likes": likes})
-            .eq("id", comment_id)
-            .execute()
-        )
-        return updated_comment.data[0]
-
-    full_comment = (
-        supabase.table("comments").select("*").eq("id", comment_id).single().execute()
+    return await _reaction_rpc(
+        "set_comment_like",
+        {"comment_id_in": comment_id, "user_id_in": user.get("sub"), "liked_in": True},
+        "کامنت یافت نشد",
     )
-    return full_comment.data
 
 
 @app.delete(
@@ -494,72 +869,33 @@ def like_comment(comment_id: int, user: dict = Depends(get_current_user)):
     tags=["کامنتها"],
     summary="برداشتن لایک یک کامنت",
 )
-def delete_like_comment(comment_id: int, user: dict = Depends(get_current_user)):
+async def delete_like_comment(comment_id: int, user: dict = Depends(get_current_user)):
     """لایک یک کامنت مشخص را برمیدارد."""
-    user_id = user.get("sub")
-
-    comment_res = (
-        supabase.table("comments")
-        .select("likes, user_id")
-        .eq("id", comment_id)
-        .single()
-        .execute()
+    return await _reaction_rpc(
+        "set_comment_like",
+        {
+            "comment_id_in": comment_id,
+            "user_id_in": user.get("sub"),
+            "liked_in": False,
+        },
+        "کامنت یافت نشد",
     )
-    if not comment_res.data:
-        raise HTTPException(status_code=404, detail="کامنت یافت نشد")
-
-    comment = comment_res.data
-    likes = comment.get("likes", [])
-
-    if user_id in likes:
-        likes.remove(user_id)
-        _update_user_coins(comment["user_id"], -1)
-        updated_comment = (
-            supabase.table("comments")
-            .update({"likes": likes})
-            .eq("id", comment_id)
-            .execute()
-        )
-        return updated_comment.data[0]
-
-    full_comment = (
-        supabase.table("comments").select("*").eq("id", comment_id).single().execute()
-    )
-    return full_comment.data
 
 
 @app.post(
     "/posts/{post_id}/comments/{comment_id}/view",
-    response_model=Comment,
+    response_model=ViewAck,
+    status_code=status.HTTP_202_ACCEPTED,
     tags=["کامنتها"],
     summary="مشاهده یک کامنت",
 )
-def view_comment(comment_id: int, user: dict = Depends(get_current_user)):
-    """یک بازدید برای کامنت ثبت میکند."""
-    user_id = user.get("sub")
-
-    comment_res = (
-        supabase.table("comments")
-        .select("views")
-        .eq("id", comment_id)
-        .single()
-        .execute()
-    )
-    if not comment_res.data:
-        raise HTTPException(status_code=404, detail="کامنت یافت نشد")
-
-    views = comment_res.data.get("views", [])
+async def view_comment(comment_id: int, user: dict = Depends(get_current_user)):
+    """یک بازدید برای کامنت در بافر ثبت میکند و فوراً پاسخ میدهد.
 
-    if user_id not in views:
-        views.append(user_id)
-        supabase.table("comments").update({"views": views}).eq(
-            "id", comment_id
-        ).execute()
-
-    full_comment = (
-        supabase.table("comments").select("*").eq("id", comment_id).single().execute()
-    )
-    return full_comment.data
+    مثل بازدید پست، وجود کامنت بررسی نمیشود: برای شناسه ناموجود هم 202
+    برمیگردد و بازدید هنگام ثبت دستهای (record_comment_views) نادیده گرفته میشود.
+    """
+    return {"queued": comment_views.add(comment_id, user.get("sub"))}
 
 
 # --- بخش فروشگاه ---
@@ -571,12 +907,69 @@ def view_comment(comment_id: int, user: dict = Depends(get_current_user)):
     tags=["فروشگاه"],
     summary="دریافت تمام محصولات فروشگاه",
 )
-def get_products():
-    """لیست تمام محصولات موجود در فروشگاه را بازیابی میکند."""
-    result = (
-        supabase.table("products").select("*").order("created_at", desc=True).execute()
+async def get_products(
+    request: Request,
+    response: Response,
+    fields: Optional[str] = FieldsQuery,
+    user: Optional[dict] = Depends(get_optional_user),
+):
+    """
+    لیست تمام محصولات موجود در فروشگاه را بازیابی میکند.
+    با توکن کاربر، owned_by_me (خریداری شده یا محصول خود کاربر) هم برای هر
+    محصول تعیین میشود؛ فهرست خریدهای کاربر از کش خوانده میشود.
+    fields فقط این فیلدهای هر محصول را برمیگرداند (و میخواند).
+    با هدر If-None-Match و ETag پاسخ قبلی، اگر چیزی تغییر نکرده باشد 304 برمیگردد.
+    """
+    projected = parse_fields(Product, fields)
+    namespaces = ["products"]
+    if user:
+        namespaces.append(f"purchases:{user.get('sub')}")
+    if not_changed := await _conditional(request, response, user, *namespaces):
+        return not_changed
+    columns = select_columns(PRODUCT_COLUMNS, projected, ("id", "seller_id"))
+    query = db.table("products").select(columns).order("created_at", desc=True)
+    if user and wants(projected, "owned_by_me"):
+        result, owned = await asyncio.gather(
+            query.execute(), _purchased_ids(user.get("sub"))
+        )
+    else:
+        result, owned = await query.execute(), []
+    products = result.data
+    if wants(projected, "seller_coins", "seller_badge"):
+        await _attach_author_coins(products, "seller_id", "seller_coins")
+    owned = set(owned)
+    for product in products:
+        product["owned_by_me"] = user is not None and (
+            product["id"] in owned or product["seller_id"] == user.get("sub")
+        )
+    return trusted_response(Product, products, response, many=True, fields=projected)
+
+
+async def _find_file_object(sha256: str, size: int) -> Optional[dict]:
+    """شیء ذخیره شده با همین محتوا را از فهرست file_objects برمیگرداند."""
+    result = await (
+        db.table("file_objects")
+        .select("path, file_url, size")
+        .eq("sha256", sha256)
+        .maybe_single()
+        .execute()
     )
-    return result.data
+    row = result.data if result else None
+    if row is None or row["size"] != size:
+        return None
+    return row
+
+
+async def _index_file_object(row: dict):
+    # آپلود انجام شده؛ خطای ثبت در فهرست فقط باعث آپلود دوباره در دفعه بعد میشود
+    try:
+        await (
+            db.table("file_objects")
+            .upsert(row, on_conflict="sha256", ignore_duplicates=True)
+            .execute()
+        )
+    except APIError as e:
+        print(f"خطا در ثبت فایل در file_objects: {e.message}")
 
 
 @app.post(
@@ -587,7 +980,13 @@ def get_products():
 async def upload_file(
     file: UploadFile = File(...), user: dict = Depends(get_current_user)
 ):
-    """فایل را به Supabase Storage آپلود میکند."""
+    """
+    فایل را به Supabase Storage آپلود میکند.
+    فایل تکه به تکه (آپلود resumable) ارسال میشود و کل آن در حافظه نگه داشته
+    نمیشود؛ هش SHA-256 فایل هم در پاسخ برگردانده میشود. فایلها بر اساس هش
+    ذخیره میشوند و اگر همین محتوا قبلا آپلود شده باشد، آپلود انجام نمیشود و
+    file_url موجود (با deduplicated=true) برگردانده میشود.
+    """
     try:
         # بررسی نوع فایل
         allowed_types = [
@@ -605,12 +1004,9 @@ async def upload_file(
                 detail="نوع فایل مجاز نیست. فقط PDF, Word, Text, ZIP و RAR پذیرفته میشود.",  # noqa: E501
             )
 
-        # بررسی حجم فایل (حداکثر 50MB)
-        file_content = await file.read()
-        if len(file_content) > 50 * 1024 * 1024:
-            raise HTTPException(
-                status_code=400, detail="حجم فایل نباید بیشتر از 50 مگابایت باشد."
-            )
+        # بررسی حجم فایل (حداکثر 50MB)؛ فایل هنگام دریافت روی دیسک موقت ذخیره شده است
+        if file.size is None or file.size > UPLOAD_MAX_BYTES:
+            raise UploadTooLarge()
 
         # ایجاد نام منحصر به فرد برای فایل
         # pyright: ignore[reportOptionalMemberAccess, reportOperatorIssue]
@@ -621,27 +1017,59 @@ async def upload_file(
             if "." in file.filename  # pyright: ignore[reportOperatorIssue]
             else ""
         )  # pyright: ignore[reportOperatorIssue]
-        unique_filename = f"{user.get('sub')}/{uuid.uuid4()}.{file_extension}"
 
-        # آپلود به Supabase Storage
+        # هش محتوا (از فایل موقت روی دیسک، خارج از event loop)
+        sha256 = await run_in_threadpool(file_sha256, file.file)
+        response = {
+            "filename": file.filename,
+            "size": file.size,
+            "sha256": sha256,
+            "upload_progress": 100,
+        }
+
+        # محتوای تکراری: بدون آپلود، همان فایل ذخیره شده استفاده میشود
+        existing = await _find_file_object(sha256, file.size)
+        if existing is not None:
+            upload_stats.deduplicated += 1
+            upload_stats.bytes_saved += file.size
+            return {**response, "file_url": existing["file_url"], "deduplicated": True}
+
+        # آپلود تکه به تکه به Supabase Storage در مسیر محتوا-محور
+        path = content_path(sha256, file_extension)
         try:
-            result = supabase.storage.from_("notebooks").upload(
-                unique_filename, file_content, {"content-type": file.content_type}
+            await upload_resumable(
+                db.storage.session,
+                "notebooks",
+                path,
+                file.file,
+                file.size,
+                file.content_type,
             )
-
+        except httpx.HTTPStatusError as e:
+            # 409: همین محتوا هم‌زمان توسط درخواست دیگری آپلود شده است
+            if e.response.status_code != 409:
+                raise HTTPException(
+                    status_code=501, detail=f"خطا در آپلود فایل: {str(e)}"
+                )
         except Exception as e:
             raise HTTPException(status_code=501, detail=f"خطا در آپلود فایل: {str(e)}")
 
-        # دریافت URL عمومی فایل
-        public_url = supabase.storage.from_("notebooks").get_public_url(unique_filename)
-
-        return {
+        # دریافت URL عمومی فایل و ثبت آن در فهرست محتوا
+        public_url = await db.storage.from_("notebooks").get_public_url(path)
+        await _index_file_object({
+            "sha256": sha256,
+            "size": file.size,
+            "path": path,
             "file_url": public_url,
-            "filename": file.filename,
-            "size": len(file_content),
-            "upload_progress": 100,
-        }
+            "content_type": file.content_type,
+            "uploaded_by": user.get("sub"),
+        })
+
+        return {**response, "file_url": public_url, "deduplicated": False}
 
+    except HTTPException:
+        # خطاهای کلاینت (نوع و حجم فایل) و خطای استوریج با همان کد خودشان
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"خطا در آپلود فایل: {str(e)}")
 
@@ -653,12 +1081,12 @@ async def upload_file(
     tags=["فروشگاه"],
     summary="ایجاد محصول جدید",
 )
-def create_product(
+async def create_product(
     product_create: ProductCreate, user: dict = Depends(get_current_user)
 ):
     """محصول جدید برای فروش ایجاد میکند."""
-    result = (
-        supabase.table("products")
+    result = await (
+        db.table("products")
         .insert({
             "seller_id": user.get("sub"),
             "seller_name": user.get("name"),
@@ -669,7 +1097,8 @@ def create_product(
         })
         .execute()
     )
-    return result.data[0]
+    await read_cache.invalidate("products", "search")
+    return {**result.data[0], "owned_by_me": True}
 
 
 @app.post(
@@ -677,101 +1106,104 @@ def create_product(
     tags=["فروشگاه"],
     summary="خرید محصول",
 )
-def buy_product(product_id: int, user: dict = Depends(get_current_user)):
-    """محصول مشخص را خریداری میکند."""
+async def buy_product(
+    product_id: int,
+    user: dict = Depends(get_current_user),
+    idempotency_key: Optional[str] = IdempotencyKey,
+):
+    """
+    محصول مشخص را خریداری میکند.
+    کسر سکه از خریدار، واریز به فروشنده و ثبت خرید در یک تراکنش پایگاه داده
+    (تابع purchase_product) و با یک درخواست انجام میشود.
+    با هدر Idempotency-Key، تلاش مجدد همان پاسخ اول را بدون خرید دوباره میگیرد.
+    """
     user_id = user.get("sub")
-
-    # بررسی وجود محصول
-    product_res = (
-        supabase.table("products").select("*").eq("id", product_id).single().execute()
+    scope = f"{user_id}:buy"
+    return await idempotency_store.run(
+        idempotency_key,
+        scope,
+        str(product_id),
+        lambda: _buy_product(
+            user_id, product_id, idempotency_store.key(scope, idempotency_key)
+        ),
     )
-    if not product_res.data:
-        raise HTTPException(status_code=404, detail="محصول یافت نشد")
-
-    product = product_res.data
 
-    # کاربر نباید بتواند محصول خودش را بخرد
-    if product.get("seller_id") == user_id:
-        raise HTTPException(status_code=400, detail="نمی‌توانید محصول خودتان را بخرید")
-
-    # بررسی اینکه کاربر قبلا این محصول را نخریده باشد
-    existing_purchase = (
-        supabase.table("purchases")
-        .select("id")
-        .eq("buyer_id", user_id)
-        .eq("product_id", product_id)
-        .execute()
-    )
-    if existing_purchase.data:
-        raise HTTPException(status_code=400, detail="شما قبلا این محصول را خریدهاید")
 
-    # بررسی موجودی سکه کاربر
-    user_coins_res = (
-        supabase.table("users")
-        .select("coins")
-        .eq("user_id", user_id)
-        .single()
-        .execute()
+async def _buy_product(
+    user_id: str, product_id: int, idempotency_key: Optional[str] = None
+) -> dict:
+    # خرید تکراری با همان کلید نتیجه خرید اول را میگیرد، نه already_purchased
+    result = await _rpc(
+        "purchase_product",
+        {
+            "buyer_id_in": user_id,
+            "product_id_in": product_id,
+            "idempotency_key_in": idempotency_key,
+        },
+        "محصول یافت نشد",
+        "خطا در فرایند خرید",
     )
-    if not user_coins_res.data or user_coins_res.data["coins"] < product["price"]:
-        raise HTTPException(status_code=400, detail="موجودی سکه کافی نیست")
-
-    # انجام انتقال سکه‌ها با rollback در صورت خطا
-    try:
-        # کسر از خریدار
-        # pyright: ignore[reportArgumentType]
-        _update_user_coins(user_id, -product["price"])  # pyright: ignore[reportArgumentType]
-
-        # اضافه کردن به فروشنده
-        _update_user_coins(product["seller_id"], product["price"])
-
-        # ثبت خرید
-        purchase_result = (
-            supabase.table("purchases")
-            .insert({
-                "buyer_id": user_id,
-                "product_id": product_id,
-            })
-            .execute()
-        )
-
-        return {
-            "message": "خرید با موفقیت انجام شد",
-            "purchase_id": purchase_result.data[0]["id"],
-        }
-    except Exception as e:
-        # تلاش برای rollback در صورت کسر سکه از خریدار اما خطا در ادامه
-        try:
-            # اگر از خریدار کسر شده باشد، سعی کن آن را برگردانی (افزایش مقدار)
-            _update_user_coins(user_id, product["price"])  # pyright: ignore[reportArgumentType] # بازگردانی کسر
-        except Exception:
-            pass
-        raise HTTPException(status_code=500, detail=f"خطا در فرایند خرید: {str(e)}")
+    leaderboard.update(user_id, result.get("buyer_coins"))
+    leaderboard.update(result["seller_id"], result.get("seller_coins"))
+    # شمارنده خرید محصول، فهرست خریدهای کاربر و سکه خریدار و فروشنده (نشان
+    # نویسنده در لیست پستها) تغییر کرده است
+    await read_cache.invalidate("products", "posts", f"purchases:{user_id}")
+    await _publish_coins(user_id, result.get("buyer_coins"))
+    await _publish_coins(result["seller_id"], result.get("seller_coins"))
+    return {
+        "message": "خرید با موفقیت انجام شد",
+        "purchase_id": result["purchase_id"],
+    }
 
 
 @app.get(
     "/shop/products/{product_id}/stats",
+    response_model=ProductStats,
     tags=["فروشگاه"],
     summary="آمار محصول (تعداد خریداران)",
 )
-def product_stats(product_id: int):
-    """تعداد خریدهای یک محصول را برمی‌گرداند."""
-    # بررسی وجود محصول
-    product_res = (
-        supabase.table("products").select("*").eq("id", product_id).single().execute()
+async def product_stats(product_id: int):
+    """تعداد خریدهای یک محصول را برمی‌گرداند (از شمارنده purchase_count)."""
+    result = await (
+        db.table("products")
+        .select("id, purchase_count")
+        .eq("id", product_id)
+        .maybe_single()
+        .execute()
     )
-    if not product_res.data:
+    if not result:
         raise HTTPException(status_code=404, detail="محصول یافت نشد")
+    return {"product_id": product_id, "purchase_count": result.data["purchase_count"]}
 
-    purchases_res = (
-        supabase.table("purchases").select("id").eq("product_id", product_id).execute()
-    )
-    purchase_count = len(purchases_res.data) if purchases_res.data else 0
 
-    return {
-        "product_id": product_id,
-        "purchase_count": purchase_count,
-    }
+MAX_STATS_IDS = 200  # سقف شناسههای یک درخواست آمار دستهای
+
+
+@app.get(
+    "/shop/products/stats",
+    response_model=List[ProductStats],
+    tags=["فروشگاه"],
+    summary="آمار چند محصول با یک درخواست",
+)
+async def bulk_product_stats(
+    ids: List[int] = Query(
+        ..., min_length=1, max_length=MAX_STATS_IDS, description="شناسه محصولات"
+    ),
+):
+    """
+    تعداد خریدهای چند محصول را برمی‌گرداند (مثلا ?ids=1&ids=2).
+    شناسههایی که محصولی ندارند در پاسخ نمیآیند.
+    """
+    result = await (
+        db.table("products")
+        .select("id, purchase_count")
+        .in_("id", list(set(ids)))
+        .execute()
+    )
+    return [
+        {"product_id": row["id"], "purchase_count": row["purchase_count"]}
+        for row in result.data
+    ]
 
 
 @app.get(
@@ -780,14 +1212,14 @@ def product_stats(product_id: int):
     tags=["فروشگاه"],
     summary="دریافت کتابخانه کاربر",
 )
-def get_my_library(user: dict = Depends(get_current_user)):
+async def get_my_library(user: dict = Depends(get_current_user)):
     """لیست محصولات خریداری شده توسط کاربر را بازیابی میکند."""
     user_id = user.get("sub")
 
     # دریافت خریدها همراه با اطلاعات محصول
-    result = (
-        supabase.table("purchases")
-        .select("*, products(*)")
+    result = await (
+        db.table("purchases")
+        .select(f"products({select_columns(PRODUCT_COLUMNS, None)})")
         .eq("buyer_id", user_id)
         .order("created_at", desc=True)
         .execute()
@@ -796,11 +1228,213 @@ def get_my_library(user: dict = Depends(get_current_user)):
     # تبدیل به فرمت مورد نظر
     library_items = []
     for purchase in result.data:
-        library_items.append({"product": purchase["products"]})
+        library_items.append({"product": {**purchase["products"], "owned_by_me": True}})
 
     return library_items
 
 
+async def _sign_download(path: str, ttl: int) -> str:
+    result = await db.storage.from_("notebooks").create_signed_url(path, ttl)
+    return result["signedURL"]
+
+
+signed_urls = SignedUrlCache(_sign_download)
+
+
+async def _load_product(product_id: int) -> Optional[dict]:
+    result = await (
+        db.table("products")
+        .select("id, seller_id, title, file_url")
+        .eq("id", product_id)
+        .maybe_single()
+        .execute()
+    )
+    return result.data if result else None
+
+
+async def _load_purchased_ids(user_id: str) -> List[int]:
+    result = await (
+        db.table("purchases").select("product_id").eq("buyer_id", user_id).execute()
+    )
+    return [row["product_id"] for row in result.data]
+
+
+async def _purchased_ids(user_id: str) -> List[int]:
+    """شناسه محصولات خریداری شده کاربر (کش شده و با هر خرید نامعتبر میشود)."""
+    return await read_cache.get_or_load(
+        f"purchases:{user_id}",
+        (),
+        lambda: _load_purchased_ids(user_id),
+        ttl=PURCHASE_INDEX_TTL,
+    )
+
+
+async def _downloadable_file(product_id: int, user_id: str) -> tuple:
+    """محصول و مسیر فایل آن در استوریج را برمیگرداند اگر کاربر اجازه دانلود داشته باشد.
+
+    مالکیت از فهرست کش شده خریدهای کاربر بررسی میشود (با هر خرید نامعتبر
+    میشود)؛ فروشنده هم میتواند فایل محصول خودش را دانلود کند.
+    """
+    # محصولات پس از ایجاد تغییر نمیکنند، پس ردیف آنها کش میشود
+    product = await read_cache.get_or_load(
+        f"product:{product_id}", (), lambda: _load_product(product_id)
+    )
+    if not product:
+        raise HTTPException(status_code=404, detail="محصول یافت نشد")
+    if product["seller_id"] != user_id:
+        if product_id not in await _purchased_ids(user_id):
+            raise HTTPException(
+                status_code=403, detail="برای دانلود ابتدا باید این محصول را بخرید"
+            )
+    path = storage_path(product["file_url"], "notebooks")
+    if path is None:
+        raise HTTPException(status_code=404, detail="فایل این محصول در استوریج نیست")
+    return product, path
+
+
+@app.get(
+    "/shop/products/{product_id}/download",
+    response_model=DownloadLink,
+    tags=["فروشگاه"],
+    summary="لینک دانلود محصول خریداری شده",
+)
+async def get_download_link(
+    product_id: int, response: Response, user: dict = Depends(get_current_user)
+):
+    """
+    یک لینک امضاشده و کوتاهمدت برای دانلود فایل محصول برمیگرداند.
+    تا نیمه عمر لینک همان لینک قبلی داده میشود تا مرورگر و CDN فایل را کش کنند؛
+    خود استوریج از Range و ETag پشتیبانی میکند.
+    """
+    _, path = await _downloadable_file(product_id, user.get("sub"))
+    try:
+        url, expires_at = await signed_urls.get(path)
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"خطا در ساخت لینک دانلود: {e}")
+
+    expires_in = max(int(expires_at - time.time()), 0)
+    # این پاسخ تا زمانی که لینک جایگزین نشده معتبر است
+    max_age = max(expires_in - signed_urls.ttl // 2, 0)
+    response.headers["Cache-Control"] = f"private, max-age={max_age}"
+    return {
+        "url": url,
+        "expires_at": datetime.fromtimestamp(expires_at, timezone.utc),
+        "expires_in": expires_in,
+    }
+
+
+@app.get(
+    "/shop/products/{product_id}/file",
+    tags=["فروشگاه"],
+    summary="دانلود فایل محصول خریداری شده",
+)
+async def download_product_file(
+    product_id: int, request: Request, user: dict = Depends(get_current_user)
+):
+    """
+    فایل محصول را از استوریج جریانی برمیگرداند.
+    هدرهای Range و If-None-Match/If-Modified-Since پشتیبانی میشوند، بنابراین
+    دانلود قابل ادامه است و کلاینت میتواند با ETag و Last-Modified کش کند.
+    """
+    product, path = await _downloadable_file(product_id, user.get("sub"))
+    name = path.rsplit("/", 1)[-1]
+    extension = name.rsplit(".", 1)[-1] if "." in name else ""
+    filename = f"{product['title']}.{extension}" if extension else product["title"]
+    return await proxy_download(
+        db.storage.session, "notebooks", path, request.headers, filename
+    )
+
+
+# --- بخش جستجو ---
+
+SEARCH_KINDS = ("post", "comment", "product")
+MAX_SEARCH_OFFSET = 1000  # نتایج عمیقتر با عبارت دقیقتر پیدا میشوند
+
+
+async def _load_search_page(
+    query: str, kinds: List[str], limit: int, offset: int
+) -> dict:
+    result = await db.rpc(
+        "search_content",
+        {
+            "query_in": query,
+            "kinds_in": kinds,
+            "limit_in": limit,
+            "offset_in": offset,
+        },
+    ).execute()
+    rows = result.data or []
+    return {
+        "items": rows[:limit],
+        "next_offset": offset + limit if len(rows) > limit else None,
+    }
+
+
+@app.get(
+    "/search",
+    response_model=SearchPage,
+    tags=["جستجو"],
+    summary="جستجو در پستها، کامنتها و محصولات",
+)
+async def search(
+    q: str = Query(..., min_length=1, max_length=200, description="عبارت جستجو"),
+    kind: Optional[List[SearchKind]] = Query(None, description="نوع نتایج"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    offset: int = Query(0, ge=0, le=MAX_SEARCH_OFFSET),
+):
+    """
+    جستجوی متن کامل با رتبهبندی بر اساس ارتباط (عنوان مهمتر از متن است).
+    - **q**: کلمات جستجو؛ همه کلمات باید پیدا شوند و هر کلمه پیشوندی جستجو
+      میشود. ی/ک عربی، نیمفاصله، اعراب و ارقام فارسی یکسانسازی و کلمات
+      انگلیسی ریشهیابی میشوند.
+    - **kind**: محدود کردن به post، comment یا product (قابل تکرار).
+    - **offset**: مقدار next_offset صفحه قبل برای دریافت صفحه بعد.
+    """
+    query = " ".join(q.split())
+    if not query:
+        return {"items": [], "next_offset": None}
+    kinds = sorted(set(kind or SEARCH_KINDS))
+    return await read_cache.get_or_load(
+        "search",
+        (query.lower(), ",".join(kinds), limit, offset),
+        lambda: _load_search_page(query, kinds, limit, offset),
+    )
+
+
+# --- بخش رویدادهای زنده ---
+
+EVENT_TOPICS = ("posts", "comments", "coins")
+
+
+@app.get(
+    "/events",
+    response_class=StreamingResponse,
+    tags=["رویدادها"],
+    summary="دریافت زنده تغییرات (Server-Sent Events)",
+)
+async def stream_events(
+    topic: Optional[List[EventTopic]] = Query(None, description="موضوع رویدادها"),
+):
+    """
+    یک اتصال text/event-stream باز میکند و تغییرات را همزمان با ثبت آنها میفرستد.
+    - **topic**: posts، comments یا coins (قابل تکرار؛ پیشفرض همه).
+    هر رویداد نام (مثلاً post.updated) و داده JSON دارد؛ داده رویدادهای updated
+    فقط شامل شناسه و شمارندههای تغییر کرده است. پس از قطع اتصال، مرورگر
+    (EventSource) خودکار دوباره وصل میشود.
+    """
+    subscription = event_bus.subscribe(topic or EVENT_TOPICS)
+    if subscription is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="ظرفیت اتصال‌های زنده پر است",
+        )
+    return StreamingResponse(
+        event_bus.stream(subscription),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 # --- بخش لیدربورد ---
 
 
@@ -810,69 +1444,122 @@ def get_my_library(user: dict = Depends(get_current_user)):
     tags=["لیدربورد"],
     summary="دریافت لیدربورد",
 )
-def get_leaderboard(limit: int = 10):
-    """لیدربورد کاربران با بیشترین سکه را بازیابی میکند."""
-    # سادگی: از جدول users بالاترین سکه‌ها را گرفته و تبدیل به فرمت مورد نیاز می‌کنیم
-    result = (
-        supabase.table("users")
-        .select("user_id, name, coins")
-        .order("coins", desc=True)
-        .limit(limit)
-        .execute()
-    )
-    data = result.data or []
-    leaderboard = []
-    for idx, u in enumerate(data, start=1):
-        leaderboard.append({
-            "user_id": u.get("user_id"),
-            "name": u.get("name", "Unknown"),
-            "coins": u.get("coins", 0),
-            "rank": idx,
-        })
-    return leaderboard
+async def get_leaderboard(
+    request: Request,
+    response: Response,
+    limit: int = Query(10, ge=1, le=MAX_PAGE_SIZE),
+):
+    """
+    لیدربورد کاربران با بیشترین سکه را بازیابی میکند.
+    کاربران با سکه برابر رتبه یکسان دارند (۱، ۲، ۲، ۴).
+    ETag از نسخه لیدربورد ساخته میشود که با هر تغییر سکه عوض میشود.
+    """
+    board = await leaderboard.ready()
+    etag = make_etag(leaderboard.version, limit)
+    if not_changed := not_modified(request, response, etag, private=False):
+        return not_changed
+    return board.top(limit)
+
+
+async def _user_rank(user_id: str, neighbors: int) -> dict:
+    board = await leaderboard.ready()
+    rank = board.neighbors(user_id, neighbors)
+    if rank is None:
+        raise HTTPException(status_code=404, detail="کاربر یافت نشد")
+    return rank
+
+
+@app.get(
+    "/leaderboard/me",
+    response_model=UserRank,
+    tags=["لیدربورد"],
+    summary="رتبه من در لیدربورد",
+)
+async def get_my_rank(
+    neighbors: int = Query(2, ge=0, le=10),
+    user: dict = Depends(get_current_user),
+):
+    """
+    رتبه کاربر فعلی را به همراه کاربران نزدیک به او برمیگرداند.
+    - **neighbors**: تعداد کاربران بالاتر و پایینتر برای نمایش.
+    """
+    return await _user_rank(user.get("sub"), neighbors)
+
+
+@app.get(
+    "/users/{user_id}/rank",
+    response_model=UserRank,
+    tags=["لیدربورد"],
+    summary="رتبه یک کاربر در لیدربورد",
+)
+async def get_user_rank(user_id: str, neighbors: int = Query(2, ge=0, le=10)):
+    """رتبه یک کاربر مشخص را به همراه کاربران نزدیک به او برمیگرداند."""
+    return await _user_rank(user_id, neighbors)
 
 
 # --- بخش مدیریت کاربر ---
 
 
 @app.get(
-    "/myposts", response_model=List[Posts], tags=["کاربر"], summary="دریافت پستهای من"
+    "/myposts", response_model=PostPage, tags=["کاربر"], summary="دریافت پستهای من"
 )
-def get_my_posts(user: dict = Depends(get_current_user)):
-    """لیست پستهایی که توسط کاربر فعلی ایجاد شده را بازیابی میکند."""
-    result = (
-        supabase.table("posts")
-        .select("*")
-        .eq("user_id", user.get("sub"))
-        .order("created_at", desc=True)
-        .execute()
+async def get_my_posts(
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    before: Optional[str] = None,
+    fields: Optional[str] = FieldsQuery,
+    user: dict = Depends(get_current_user),
+):
+    """پستهایی که توسط کاربر فعلی ایجاد شده را صفحه به صفحه بازیابی میکند.
+
+    fields فقط این فیلدهای هر پست را برمیگرداند (و میخواند).
+    """
+    projected = parse_fields(Posts, fields)
+    columns = select_columns(POST_COLUMNS, projected, _author_columns(projected))
+    result = await keyset_page(
+        db.table("posts").select(columns).eq("user_id", user.get("sub")), limit, before
+    ).execute()
+    items, next_cursor = split_page(result.data, limit)
+    tasks = []
+    if wants(projected, "liked_by_me", "viewed_by_me"):
+        tasks.append(_attach_viewer_flags(items, "post_reactions", "post_id", user))
+    if wants(projected, "author_coins", "author_badge"):
+        tasks.append(_attach_author_coins(items))
+    await asyncio.gather(*tasks)
+    return trusted_response(
+        PostPage,
+        {"items": items, "next_cursor": next_cursor},
+        response,
+        fields=projected,
     )
-    return result.data
 
 
 @app.post("/newuser", response_model=User, tags=["کاربر"], summary="افزودن کاربر جدید")
-def new_user(user: dict = Depends(get_current_user)):
+async def new_user(user: dict = Depends(get_current_user)):
     """
     یک کاربر جدید به پایگاه داده اضافه میکند. اگر کاربر وجود داشته باشد، اطلاعاتش را برمیگرداند.
     """  # noqa: E501
     user_id = user.get("sub")
 
     # بررسی وجود کاربر
-    existing_user = supabase.table("users").select("*").eq("user_id", user_id).execute()
+    existing_user = await (
+        db.table("users").select("user_id, coins").eq("user_id", user_id).execute()
+    )
     if existing_user.data:
         return existing_user.data[0]
 
     # ایجاد کاربر جدید
     new_user_data = {"user_id": user_id, "name": user.get("name"), "coins": 0}
-    result = supabase.table("users").insert(new_user_data).execute()
+    result = await db.table("users").insert(new_user_data).execute()
+    leaderboard.update(user_id, 0, user.get("name"))
     return result.data[0]
 
 
 @app.get("/getcoins", response_model=int, tags=["کاربر"], summary="دریافت سکههای کاربر")
-def get_coins(user: dict = Depends(get_current_user)):
+async def get_coins(user: dict = Depends(get_current_user)):
     """تعداد سکههای کاربر احراز هویت شده را بازیابی میکند."""
-    result = (
-        supabase.table("users")
+    result = await (
+        db.table("users")
         .select("coins")
         .eq("user_id", user.get("sub"))
         .single()
@@ -883,20 +1570,38 @@ def get_coins(user: dict = Depends(get_current_user)):
     return result.data.get("coins", 0)
 
 
+@app.get(
+    "/users/coins",
+    response_model=List[UserCoins],
+    tags=["کاربر"],
+    summary="دریافت سکهها و نشان چند کاربر",
+)
+async def get_users_coins(ids: List[str] = Query(..., max_length=MAX_PAGE_SIZE)):
+    """
+    سکهها و نشان چند کاربر را با یک کوئری بازیابی میکند.
+    - **ids**: شناسه کاربران، جدا شده با کاما (`?ids=a,b`) یا تکراری
+      (`?ids=a&ids=b`). کاربران ناموجود صفر سکه دارند.
+    """
+    ids = [uid.strip() for value in ids for uid in value.split(",") if uid.strip()]
+    if len(ids) > MAX_PAGE_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"حداکثر {MAX_PAGE_SIZE} شناسه در هر درخواست مجاز است",
+        )
+    coins = await _fetch_coins(ids)
+    return [{"user_id": uid, "coins": coins.get(uid, 0)} for uid in dict.fromkeys(ids)]
+
+
 @app.get(
     "/users/{user_id}/coins",
     response_model=int,
     tags=["کاربر"],
     summary="دریافت سکههای یک کاربر خاص",
 )
-def get_user_coins(user_id: str):
+async def get_user_coins(user_id: str):
     """تعداد سکههای یک کاربر خاص را با شناسه او بازیابی میکند."""
-    result = (
-        supabase.table("users")
-        .select("coins")
-        .eq("user_id", user_id)
-        .single()
-        .execute()
+    result = await (
+        db.table("users").select("coins").eq("user_id", user_id).single().execute()
     )
     if not result.data:
         return 0
@@ -912,7 +1617,7 @@ def get_user_coins(user_id: str):
     tags=["ادمین"],
     summary="دریافت لیست کاربران (فقط ادمین)",
 )
-def get_all_users(user: dict = Depends(get_current_user)):
+async def get_all_users(response: Response, user: dict = Depends(get_current_user)):
     """لیست تمام کاربران را برای ادمین بازیابی میکند."""
     if not _is_admin(user):
         raise HTTPException(
@@ -920,8 +1625,38 @@ def get_all_users(user: dict = Depends(get_current_user)):
             detail="فقط ادمینها به این بخش دسترسی دارند",
         )
 
-    result = supabase.table("users").select("*").order("coins", desc=True).execute()
-    return result.data
+    result = await db.table("users").select("*").order("coins", desc=True).execute()
+    return trusted_response(AdminUser, result.data, response, many=True)
+
+
+@app.get(
+    "/admin/metrics",
+    tags=["ادمین"],
+    summary="آمار کش‌ها و بافرهای داخلی (فقط ادمین)",
+)
+async def get_metrics(user: dict = Depends(get_current_user)):
+    """شمارنده‌های داخلی سرور را برای پایش برمی‌گرداند (فقط ادمین)."""
+    if not _is_admin(user):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="فقط ادمینها به این بخش دسترسی دارند",
+        )
+
+    return {
+        "jwks_cache": jwks_cache.stats(),
+        "token_cache": token_cache.stats(),
+        "read_cache": read_cache.stats(),
+        "post_view_buffer": post_views.stats(),
+        "comment_view_buffer": comment_views.stats(),
+        "leaderboard": leaderboard.stats(),
+        "feed": feed.stats(),
+        "idempotency": idempotency_store.stats(),
+        "uploads": upload_stats.stats(),
+        "signed_urls": signed_urls.stats(),
+        "events": event_bus.stats(),
+        "conditional_requests": conditional_stats.stats(),
+        "db_queries": query_stats.stats(),
+    }
 
 
 @app.post(
@@ -929,12 +1664,16 @@ def get_all_users(user: dict = Depends(get_current_user)):
     tags=["ادمین"],
     summary="اضافه کردن سکه به کاربر (فقط ادمین)",
 )
-def add_coins_to_user(
+async def add_coins_to_user(
     target_user_id: str,
     request: AddCoinsRequest,
     user: dict = Depends(get_current_user),
+    idempotency_key: Optional[str] = IdempotencyKey,
 ):
-    """سکه به کاربر مشخص اضافه میکند (فقط ادمین)."""
+    """
+    سکه به کاربر مشخص اضافه میکند (فقط ادمین).
+    با هدر Idempotency-Key، تلاش مجدد سکه را دوباره اضافه نمیکند.
+    """
     if not _is_admin(user):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -945,55 +1684,25 @@ def add_coins_to_user(
     if amount == 0:
         raise HTTPException(status_code=400, detail="مقدار سکه نمی‌تواند صفر باشد")
 
-    # بررسی وجود کاربر
-    target_user = (
-        supabase.table("users")
-        .select("user_id")
-        .eq("user_id", target_user_id)
-        .single()
-        .execute()
-    )
-    if not target_user.data:
-        raise HTTPException(status_code=404, detail="کاربر یافت نشد")
-
-    # Safe, explicit update instead of calling the `update_coins` RPC
-    # which can be ambiguous if Postgres has overloaded functions with
-    # different parameter types. We read the current coins, compute the
-    # new total and update the row directly.
-    try:
-        current_res = (
-            supabase.table("users")
-            .select("coins")
-            .eq("user_id", target_user_id)
-            .single()
-            .execute()
-        )
-        if not current_res.data:
-            raise HTTPException(status_code=404, detail="کاربر یافت نشد")
+    scope = f"{user.get('sub')}:admin_coins"
 
-        current_coins = current_res.data.get("coins", 0) or 0
-        new_coins = current_coins + amount
-
-        # Prevent negative coins
-        if new_coins < 0:
-            raise HTTPException(status_code=400, detail="موجودی سکه کافی نیست")
-
-        update_res = (
-            supabase.table("users")
-            .update({"coins": new_coins})
-            .eq("user_id", target_user_id)
-            .execute()
+    async def adjust():
+        # تغییر سکه و ثبت آن در دفتر کل با یک فراخوانی (کاربر ناموجود: 404)
+        new_coins = await _update_user_coins(
+            target_user_id,
+            amount,
+            "admin",
+            idempotency_store.key(scope, idempotency_key),
         )
-        if getattr(update_res, "error", None):
-            raise Exception(getattr(update_res, "error").get("message", "unknown"))
-
         action_msg = "اضافه شد" if amount > 0 else "کم شد"
         return {
             "message": f"{abs(amount)} سکه به کاربر {target_user_id} {action_msg}",
             "new_coins": new_coins,
         }
-    except HTTPException:
-        raise
-    except Exception as e:
-        print(f"خطا در اضافه کردن سکه به {target_user_id}: {e}")
-        raise HTTPException(status_code=500, detail=f"خطا در اضافه کردن سکه: {str(e)}")
+
+    return await idempotency_store.run(
+        idempotency_key,
+        scope,
+        f"{target_user_id}:{amount}",
+        adjust,
+    )
@@ -0,0 +1,99 @@
+-- 001_atomic_likes.sql
+--
+-- لایک/برداشتن لایک پست و کامنت در یک تراکنش و یک رفت‌وبرگشت:
+-- شناسه کاربر به آرایه likes اضافه/حذف می‌شود و سکه نویسنده به همان اندازه
+-- تغییر می‌کند. اگر وضعیت از قبل همان باشد چیزی تغییر نمی‌کند.
+-- خروجی: ردیف کامل به‌روز شده به همراه like_count و changed.
+
+create or replace function set_post_like(
+    post_id_in bigint,
+    user_id_in text,
+    liked_in boolean
+) returns jsonb
+language plpgsql
+as $$
+declare
+    p posts;
+    delta integer := case when liked_in then 1 else -1 end;
+begin
+    if liked_in then
+        update posts set likes = array_append(coalesce(likes, '{}'), user_id_in)
+        where id = post_id_in and not (user_id_in = any(coalesce(likes, '{}')))
+        returning * into p;
+    else
+        update posts set likes = array_remove(likes, user_id_in)
+        where id = post_id_in and user_id_in = any(coalesce(likes, '{}'))
+        returning * into p;
+    end if;
+
+    if not found then
+        select * into p from posts where id = post_id_in;
+        if not found then
+            raise exception 'post_not_found' using errcode = 'P0002';
+        end if;
+        return to_jsonb(p) || jsonb_build_object(
+            'like_count', coalesce(cardinality(p.likes), 0),
+            'changed', false
+        );
+    end if;
+
+    if exists (
+        select 1 from users where user_id = p.user_id and coins + delta < 0
+    ) then
+        raise exception 'insufficient_coins' using errcode = 'P0001';
+    end if;
+    update users set coins = coins + delta where user_id = p.user_id;
+
+    return to_jsonb(p) || jsonb_build_object(
+        'like_count', coalesce(cardinality(p.likes), 0),
+        'changed', true
+    );
+end;
+$$;
+
+
+create or replace function set_comment_like(
+    comment_id_in bigint,
+    user_id_in text,
+    liked_in boolean
+) returns jsonb
+language plpgsql
+as $$
+declare
+    c comments;
+    delta integer := case when liked_in then 1 else -1 end;
+begin
+    if liked_in then
+        update comments set likes = array_append(coalesce(likes, '{}'), user_id_in)
+        where id = comment_id_in and not (user_id_in = any(coalesce(likes, '{}')))
+        returning * into c;
+    else
+        update comments set likes = array_remove(likes, user_id_in)
+        where id = comment_id_in and user_id_in = any(coalesce(likes, '{}'))
+        returning * into c;
+    end if;
+
+    if not found then
+        select * into c from comments where id = comment_id_in;
+        if not found then
+            raise exception 'comment_not_found' using errcode = 'P0002';
+        end if;
+        return to_jsonb(c) || jsonb_build_object(
+            'like_count', coalesce(cardinality(c.likes), 0),
+            'changed', false
+        );
+    end if;
+
+    if exists (
+        select 1 from users where user_id = c.user_id and coins + delta < 0
+    ) then
+        raise exception 'insufficient_coins' using errcode = 'P0001';
+    end if;
+    update users set coins = coins + delta where user_id = c.user_id;
+
+    return to_jsonb(c) || jsonb_build_object(
+        'like_count', coalesce(cardinality(c.likes), 0),
+        'changed', true
+    );
+end;
+$$;
@@ -0,0 +1,268 @@
+-- 002_reactions.sql
+--
+-- لایک‌ها و بازدیدها به جای آرایه‌های TEXT[] روی posts/comments در جدول‌های
+-- جداگانه نگهداری می‌شوند و تعداد آن‌ها در ستون‌های like_count/view_count
+-- ذخیره می‌شود. داده‌های موجود منتقل شده و سپس آرایه‌ها حذف می‌شوند.
+
+create table if not exists post_reactions (
+    post_id bigint not null references posts (id) on delete cascade,
+    user_id text not null,
+    kind text not null check (kind in ('like', 'view')),
+    created_at timestamptz not null default now(),
+    primary key (post_id, kind, user_id)
+);
+-- برای یافتن واکنش‌های یک کاربر روی مجموعه‌ای از پست‌ها (liked_by_me/viewed_by_me)
+create index if not exists post_reactions_user_idx
+    on post_reactions (user_id, post_id);
+
+create table if not exists comment_reactions (
+    comment_id bigint not null references comments (id) on delete cascade,
+    user_id text not null,
+    kind text not null check (kind in ('like', 'view')),
+    created_at timestamptz not null default now(),
+    primary key (comment_id, kind, user_id)
+);
+create index if not exists comment_reactions_user_idx
+    on comment_reactions (user_id, comment_id);
+
+alter table posts
+    add column if not exists like_count integer not null default 0,
+    add column if not exists view_count integer not null default 0;
+alter table comments
+    add column if not exists like_count integer not null default 0,
+    add column if not exists view_count integer not null default 0;
+
+-- انتقال داده‌های موجود
+insert into post_reactions (post_id, user_id, kind)
+select id, unnest(likes), 'like' from posts
+on conflict do nothing;
+insert into post_reactions (post_id, user_id, kind)
+select id, unnest(views), 'view' from posts
+on conflict do nothing;
+insert into comment_reactions (comment_id, user_id, kind)
+select id, unnest(likes), 'like' from comments
+on conflict do nothing;
+insert into comment_reactions (comment_id, user_id, kind)
+select id, unnest(views), 'view' from comments
+on conflict do nothing;
+
+update posts p set
+    like_count = (
+        select count(*) from post_reactions r
+        where r.post_id = p.id and r.kind = 'like'
+    ),
+    view_count = (
+        select count(*) from post_reactions r
+        where r.post_id = p.id and r.kind = 'view'
+    );
+update comments c set
+    like_count = (
+        select count(*) from comment_reactions r
+        where r.comment_id = c.id and r.kind = 'like'
+    ),
+    view_count = (
+        select count(*) from comment_reactions r
+        where r.comment_id = c.id and r.kind = 'view'
+    );
+
+-- توابع 001 به آرایه‌ها وابسته‌اند؛ پیش از حذف آرایه‌ها حذف می‌شوند
+drop function if exists set_post_like(bigint, text, boolean);
+drop function if exists set_comment_like(bigint, text, boolean);
+
+alter table posts drop column if exists likes, drop column if exists views;
+alter table comments drop column if exists likes, drop column if exists views;
+
+
+-- لایک/برداشتن لایک پست: واکنش و سکه نویسنده در یک تراکنش تغییر می‌کنند.
+-- خروجی: ردیف پست به همراه liked_by_me، viewed_by_me و changed.
+create or replace function set_post_like(
+    post_id_in bigint,
+    user_id_in text,
+    liked_in boolean
+) returns jsonb
+language plpgsql
+as $$
+declare
+    p posts;
+    delta integer := case when liked_in then 1 else -1 end;
+    changed boolean;
+begin
+    begin
+        if liked_in then
+            insert into post_reactions (post_id, user_id, kind)
+            values (post_id_in, user_id_in, 'like')
+            on conflict do nothing;
+        else
+            delete from post_reactions
+            where post_id = post_id_in and user_id = user_id_in and kind = 'like';
+        end if;
+        changed := found;
+    exception when foreign_key_violation then
+        raise exception 'post_not_found' using errcode = 'P0002';
+    end;
+
+    if changed then
+        update posts set like_count = greatest(like_count + delta, 0)
+        where id = post_id_in
+        returning * into p;
+        if exists (
+            select 1 from users where user_id = p.user_id and coins + delta < 0
+        ) then
+            raise exception 'insufficient_coins' using errcode = 'P0001';
+        end if;
+        update users set coins = coins + delta where user_id = p.user_id;
+    else
+        select * into p from posts where id = post_id_in;
+        if not found then
+            raise exception 'post_not_found' using errcode = 'P0002';
+        end if;
+    end if;
+
+    return to_jsonb(p) || jsonb_build_object(
+        'liked_by_me', liked_in,
+        'viewed_by_me', exists (
+            select 1 from post_reactions
+            where post_id = post_id_in and user_id = user_id_in and kind = 'view'
+        ),
+        'changed', changed
+    );
+end;
+$$;
+
+
+create or replace function set_comment_like(
+    comment_id_in bigint,
+    user_id_in text,
+    liked_in boolean
+) returns jsonb
+language plpgsql
+as $$
+declare
+    c comments;
+    delta integer := case when liked_in then 1 else -1 end;
+    changed boolean;
+begin
+    begin
+        if liked_in then
+            insert into comment_reactions (comment_id, user_id, kind)
+            values (comment_id_in, user_id_in, 'like')
+            on conflict do nothing;
+        else
+            delete from comment_reactions
+            where comment_id = comment_id_in
+                and user_id = user_id_in
+                and kind = 'like';
+        end if;
+        changed := found;
+    exception when foreign_key_violation then
+        raise exception 'comment_not_found' using errcode = 'P0002';
+    end;
+
+    if changed then
+        update comments set like_count = greatest(like_count + delta, 0)
+        where id = comment_id_in
+        returning * into c;
+        if exists (
+            select 1 from users where user_id = c.user_id and coins + delta < 0
+        ) then
+            raise exception 'insufficient_coins' using errcode = 'P0001';
+        end if;
+        update users set coins = coins + delta where user_id = c.user_id;
+    else
+        select * into c from comments where id = comment_id_in;
+        if not found then
+            raise exception 'comment_not_found' using errcode = 'P0002';
+        end if;
+    end if;
+
+    return to_jsonb(c) || jsonb_build_object(
+        'liked_by_me', liked_in,
+        'viewed_by_me', exists (
+            select 1 from comment_reactions
+            where comment_id = comment_id_in
+                and user_id = user_id_in
+                and kind = 'view'
+        ),
+        'changed', changed
+    );
+end;
+$$;
+
+
+-- ثبت بازدید (هر کاربر یک بار) و افزایش view_count
+create or replace function record_post_view(
+    post_id_in bigint,
+    user_id_in text
+) returns jsonb
+language plpgsql
+as $$
+declare
+    p posts;
+    inserted boolean;
+begin
+    begin
+        insert into post_reactions (post_id, user_id, kind)
+        values (post_id_in, user_id_in, 'view')
+        on conflict do nothing;
+        inserted := found;
+    exception when foreign_key_violation then
+        raise exception 'post_not_found' using errcode = 'P0002';
+    end;
+
+    if inserted then
+        update posts set view_count = view_count + 1
+        where id = post_id_in
+        returning * into p;
+    else
+        select * into p from posts where id = post_id_in;
+    end if;
+
+    return to_jsonb(p) || jsonb_build_object(
+        'liked_by_me', exists (
+            select 1 from post_reactions
+            where post_id = post_id_in and user_id = user_id_in and kind = 'like'
+        ),
+        'viewed_by_me', true
+    );
+end;
+$$;
+
+
+create or replace function record_comment_view(
+    comment_id_in bigint,
+    user_id_in text
+) returns jsonb
+language plpgsql
+as $$
+declare
+    c comments;
+    inserted boolean;
+begin
+    begin
+        insert into comment_reactions (comment_id, user_id, kind)
+        values (comment_id_in, user_id_in, 'view')
+        on conflict do nothing;
+        inserted := found;
+    exception when foreign_key_violation then
+        raise exception 'comment_not_found' using errcode = 'P0002';
+    end;
+
+    if inserted then
+        update comments set view_count = view_count + 1
+        where id = comment_id_in
+        returning * into c;
+    else
+        select * into c from comments where id = comment_id_in;
+    end if;
+
+    return to_jsonb(c) || jsonb_build_object(
+        'liked_by_me', exists (
+            select 1 from comment_reactions
+            where comment_id = comment_id_in
+                and user_id = user_id_in
+                and kind = 'like'
+        ),
+        'viewed_by_me', true
+    );
+end;
+$$;
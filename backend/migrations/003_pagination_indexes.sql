@@ -0,0 +1,14 @@
+-- 003_pagination_indexes.sql
+--
+-- ایندکس‌های صفحه‌بندی keyset روی (created_at, id) برای GET /posts،
+-- GET /myposts و GET /posts/{id}/comments. با این ایندکس‌ها هر صفحه با یک
+-- index scan محدود خوانده می‌شود و هزینه صفحه‌های عمیق ثابت می‌ماند.
+
+create index if not exists posts_created_at_id_idx
+    on posts (created_at desc, id desc);
+
+create index if not exists posts_user_created_at_id_idx
+    on posts (user_id, created_at desc, id desc);
+
+create index if not exists comments_post_created_at_id_idx
+    on comments (post_id, created_at desc, id desc);
@@ -0,0 +1,209 @@
+-- 004_author_coins.sql
+--
+-- توابع لایک و بازدید، سکه نویسنده (author_coins) را هم برمی‌گردانند تا پاسخ
+-- این درخواست‌ها بدون کوئری اضافه نشان (badge) نویسنده را داشته باشد.
+-- بدنه توابع همان 002_reactions.sql است.
+
+create or replace function set_post_like(
+    post_id_in bigint,
+    user_id_in text,
+    liked_in boolean
+) returns jsonb
+language plpgsql
+as $$
+declare
+    p posts;
+    delta integer := case when liked_in then 1 else -1 end;
+    changed boolean;
+begin
+    begin
+        if liked_in then
+            insert into post_reactions (post_id, user_id, kind)
+            values (post_id_in, user_id_in, 'like')
+            on conflict do nothing;
+        else
+            delete from post_reactions
+            where post_id = post_id_in and user_id = user_id_in and kind = 'like';
+        end if;
+        changed := found;
+    exception when foreign_key_violation then
+        raise exception 'post_not_found' using errcode = 'P0002';
+    end;
+
+    if changed then
+        update posts set like_count = greatest(like_count + delta, 0)
+        where id = post_id_in
+        returning * into p;
+        if exists (
+            select 1 from users where user_id = p.user_id and coins + delta < 0
+        ) then
+            raise exception 'insufficient_coins' using errcode = 'P0001';
+        end if;
+        update users set coins = coins + delta where user_id = p.user_id;
+    else
+        select * into p from posts where id = post_id_in;
+        if not found then
+            raise exception 'post_not_found' using errcode = 'P0002';
+        end if;
+    end if;
+
+    return to_jsonb(p) || jsonb_build_object(
+        'liked_by_me', liked_in,
+        'viewed_by_me', exists (
+            select 1 from post_reactions
+            where post_id = post_id_in and user_id = user_id_in and kind = 'view'
+        ),
+        'changed', changed,
+        'author_coins', coalesce(
+            (select coins from users where user_id = p.user_id), 0
+        )
+    );
+end;
+$$;
+
+
+create or replace function set_comment_like(
+    comment_id_in bigint,
+    user_id_in text,
+    liked_in boolean
+) returns jsonb
+language plpgsql
+as $$
+declare
+    c comments;
+    delta integer := case when liked_in then 1 else -1 end;
+    changed boolean;
+begin
+    begin
+        if liked_in then
+            insert into comment_reactions (comment_id, user_id, kind)
+            values (comment_id_in, user_id_in, 'like')
+            on conflict do nothing;
+        else
+            delete from comment_reactions
+            where comment_id = comment_id_in
+                and user_id = user_id_in
+                and kind = 'like';
+        end if;
+        changed := found;
+    exception when foreign_key_violation then
+        raise exception 'comment_not_found' using errcode = 'P0002';
+    end;
+
+    if changed then
+        update comments set like_count = greatest(like_count + delta, 0)
+        where id = comment_id_in
+        returning * into c;
+        if exists (
+            select 1 from users where user_id = c.user_id and coins + delta < 0
+        ) then
+            raise exception 'insufficient_coins' using errcode = 'P0001';
+        end if;
+        update users set coins = coins + delta where user_id = c.user_id;
+    else
+        select * into c from comments where id = comment_id_in;
+        if not found then
+            raise exception 'comment_not_found' using errcode = 'P0002';
+        end if;
+    end if;
+
+    return to_jsonb(c) || jsonb_build_object(
+        'liked_by_me', liked_in,
+        'viewed_by_me', exists (
+            select 1 from comment_reactions
+            where comment_id = comment_id_in
+                and user_id = user_id_in
+                and kind = 'view'
+        ),
+        'changed', changed,
+        'author_coins', coalesce(
+            (select coins from users where user_id = c.user_id), 0
+        )
+    );
+end;
+$$;
+
+
+-- ثبت بازدید (هر کاربر یک بار) و افزایش view_count
+create or replace function record_post_view(
+    post_id_in bigint,
+    user_id_in text
+) returns jsonb
+language plpgsql
+as $$
+declare
+    p posts;
+    inserted boolean;
+begin
+    begin
+        insert into post_reactions (post_id, user_id, kind)
+        values (post_id_in, user_id_in, 'view')
+        on conflict do nothing;
+        inserted := found;
+    exception when foreign_key_violation then
+        raise exception 'post_not_found' using errcode = 'P0002';
+    end;
+
+    if inserted then
+        update posts set view_count = view_count + 1
+        where id = post_id_in
+        returning * into p;
+    else
+        select * into p from posts where id = post_id_in;
+    end if;
+
+    return to_jsonb(p) || jsonb_build_object(
+        'liked_by_me', exists (
+            select 1 from post_reactions
+            where post_id = post_id_in and user_id = user_id_in and kind = 'like'
+        ),
+        'viewed_by_me', true,
+        'author_coins', coalesce(
+            (select coins from users where user_id = p.user_id), 0
+        )
+    );
+end;
+$$;
+
+
+create or replace function record_comment_view(
+    comment_id_in bigint,
+    user_id_in text
+) returns jsonb
+language plpgsql
+as $$
+declare
+    c comments;
+    inserted boolean;
+begin
+    begin
+        insert into comment_reactions (comment_id, user_id, kind)
+        values (comment_id_in, user_id_in, 'view')
+        on conflict do nothing;
+        inserted := found;
+    exception when foreign_key_violation then
+        raise exception 'comment_not_found' using errcode = 'P0002';
+    end;
+
+    if inserted then
+        update comments set view_count = view_count + 1
+        where id = comment_id_in
+        returning * into c;
+    else
+        select * into c from comments where id = comment_id_in;
+    end if;
+
+    return to_jsonb(c) || jsonb_build_object(
+        'liked_by_me', exists (
+            select 1 from comment_reactions
+            where comment_id = comment_id_in
+                and user_id = user_id_in
+                and kind = 'like'
+        ),
+        'viewed_by_me', true,
+        'author_coins', coalesce(
+            (select coins from users where user_id = c.user_id), 0
+        )
+    );
+end;
+$$;
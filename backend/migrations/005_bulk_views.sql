@@ -0,0 +1,72 @@
+-- 005_bulk_views.sql
+--
+-- ثبت دسته‌ای بازدیدها برای بافر write-behind سرور: بازدیدهای جمع‌شده در حافظه
+-- هر چند ثانیه یک بار با یک فراخوانی ثبت می‌شوند. بازدید تکراری (همان کاربر و
+-- همان پست) و بازدید پست/کامنت حذف شده نادیده گرفته می‌شود.
+--
+-- ورودی: آرایه JSON از {"id": <post/comment id>, "user_id": <user id>}
+-- خروجی: آرایه شناسه پست‌هایی که شمارنده خودشان یا کامنت‌هایشان تغییر کرده است
+-- (برای نامعتبرسازی کش).
+
+create or replace function record_post_views(views jsonb) returns jsonb
+language plpgsql
+as $$
+declare
+    changed jsonb;
+begin
+    with v as (
+        select distinct (e ->> 'id')::bigint as post_id, e ->> 'user_id' as user_id
+        from jsonb_array_elements(views) e
+    ),
+    ins as (
+        insert into post_reactions (post_id, user_id, kind)
+        select v.post_id, v.user_id, 'view'
+        from v join posts p on p.id = v.post_id
+        on conflict do nothing
+        returning post_id
+    ),
+    counts as (
+        select post_id, count(*) as n from ins group by post_id
+    ),
+    upd as (
+        update posts p set view_count = p.view_count + counts.n
+        from counts
+        where p.id = counts.post_id
+        returning p.id
+    )
+    select coalesce(jsonb_agg(id), '[]'::jsonb) into changed from upd;
+    return changed;
+end;
+$$;
+
+
+create or replace function record_comment_views(views jsonb) returns jsonb
+language plpgsql
+as $$
+declare
+    changed jsonb;
+begin
+    with v as (
+        select distinct (e ->> 'id')::bigint as comment_id, e ->> 'user_id' as user_id
+        from jsonb_array_elements(views) e
+    ),
+    ins as (
+        insert into comment_reactions (comment_id, user_id, kind)
+        select v.comment_id, v.user_id, 'view'
+        from v join comments c on c.id = v.comment_id
+        on conflict do nothing
+        returning comment_id
+    ),
+    counts as (
+        select comment_id, count(*) as n from ins group by comment_id
+    ),
+    upd as (
+        update comments c set view_count = c.view_count + counts.n
+        from counts
+        where c.id = counts.comment_id
+        returning c.post_id
+    )
+    select coalesce(jsonb_agg(distinct post_id), '[]'::jsonb) into changed from upd;
+    return changed;
+end;
+$$;
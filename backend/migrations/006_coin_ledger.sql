@@ -0,0 +1,261 @@
+-- 006_coin_ledger.sql
+--
+-- دفتر کل سکه‌ها (append-only): هر تغییر موجودی یک ردیف در coin_ledger است و
+-- users.coins فقط موجودی کش شده همین دفتر است که در همان تراکنش به‌روز می‌شود.
+-- همه تغییرات سکه از post_coins عبور می‌کنند؛ خرید (کسر از خریدار، واریز به
+-- فروشنده و ثبت خرید) با purchase_product در یک تراکنش و یک فراخوانی انجام می‌شود.
+
+create table if not exists coin_ledger (
+    id bigserial primary key,
+    user_id text not null,
+    amount integer not null check (amount <> 0),
+    -- opening، purchase، sale، post_like، comment_like، admin
+    reason text not null,
+    ref_id bigint,  -- شناسه خرید، پست یا کامنت مربوط
+    created_at timestamptz not null default now()
+);
+create index if not exists coin_ledger_user_idx on coin_ledger (user_id, id);
+
+-- ردیف‌های دفتر کل تغییر نمی‌کنند و حذف نمی‌شوند؛ اصلاح با ردیف جدید انجام می‌شود
+create or replace function coin_ledger_append_only() returns trigger
+language plpgsql
+as $$
+begin
+    raise exception 'coin_ledger is append-only';
+end;
+$$;
+
+drop trigger if exists coin_ledger_append_only on coin_ledger;
+create trigger coin_ledger_append_only
+    before update or delete on coin_ledger
+    for each row execute function coin_ledger_append_only();
+
+-- موجودی فعلی کاربران به عنوان ردیف افتتاحیه (فقط در اولین اجرا)
+insert into coin_ledger (user_id, amount, reason)
+select user_id, coins, 'opening' from users
+where coins <> 0 and not exists (select 1 from coin_ledger);
+
+-- کاربرانی که موجودی کش شده آنها با جمع دفتر کل برابر نیست (برای بررسی)
+create or replace view coin_balance_drift as
+select u.user_id, u.coins, coalesce(l.total, 0) as ledger_total
+from users u
+left join (
+    select user_id, sum(amount) as total from coin_ledger group by user_id
+) l on l.user_id = u.user_id
+where u.coins <> coalesce(l.total, 0);
+
+
+-- تغییر موجودی یک کاربر: ثبت در دفتر کل و به‌روزرسانی موجودی کش شده.
+-- قفل ردیف کاربر تغییرات هم‌زمان را پشت سر هم اجرا می‌کند و موجودی منفی نمی‌شود.
+-- خروجی: موجودی جدید
+create or replace function post_coins(
+    user_id_in text,
+    amount_in integer,
+    reason_in text,
+    ref_id_in bigint default null
+) returns integer
+language plpgsql
+as $$
+declare
+    balance integer;
+begin
+    if amount_in = 0 then
+        select coins into balance from users where user_id = user_id_in;
+        if not found then
+            raise exception 'user_not_found' using errcode = 'P0002';
+        end if;
+        return balance;
+    end if;
+
+    update users set coins = coins + amount_in
+    where user_id = user_id_in and coins + amount_in >= 0
+    returning coins into balance;
+    if not found then
+        if exists (select 1 from users where user_id = user_id_in) then
+            raise exception 'insufficient_coins' using errcode = 'P0001';
+        end if;
+        raise exception 'user_not_found' using errcode = 'P0002';
+    end if;
+
+    insert into coin_ledger (user_id, amount, reason, ref_id)
+    values (user_id_in, amount_in, reason_in, ref_id_in);
+    return balance;
+end;
+$$;
+
+
+-- خرید یک محصول در یک تراکنش: قفل خریدار و فروشنده (به ترتیب user_id برای
+-- جلوگیری از deadlock)، بررسی خرید تکراری، ثبت خرید و انتقال سکه.
+create or replace function purchase_product(
+    buyer_id_in text,
+    product_id_in bigint
+) returns jsonb
+language plpgsql
+as $$
+declare
+    prod products;
+    new_purchase_id bigint;
+    buyer_coins integer;
+    seller_coins integer;
+begin
+    select * into prod from products where id = product_id_in;
+    if not found then
+        raise exception 'product_not_found' using errcode = 'P0002';
+    end if;
+    if prod.seller_id = buyer_id_in then
+        raise exception 'own_product' using errcode = 'P0001';
+    end if;
+
+    perform 1 from users
+    where user_id in (buyer_id_in, prod.seller_id)
+    order by user_id
+    for update;
+
+    if exists (
+        select 1 from purchases
+        where buyer_id = buyer_id_in and product_id = product_id_in
+    ) then
+        raise exception 'already_purchased' using errcode = 'P0001';
+    end if;
+
+    insert into purchases (buyer_id, product_id)
+    values (buyer_id_in, product_id_in)
+    returning id into new_purchase_id;
+
+    begin
+        buyer_coins := post_coins(
+            buyer_id_in, -prod.price, 'purchase', new_purchase_id
+        );
+    exception when sqlstate 'P0002' then
+        -- خریداری که در جدول users نیست موجودی ندارد
+        raise exception 'insufficient_coins' using errcode = 'P0001';
+    end;
+    if exists (select 1 from users where user_id = prod.seller_id) then
+        seller_coins := post_coins(
+            prod.seller_id, prod.price, 'sale', new_purchase_id
+        );
+    end if;
+
+    return jsonb_build_object(
+        'purchase_id', new_purchase_id,
+        'buyer_coins', buyer_coins,
+        'seller_id', prod.seller_id,
+        'seller_coins', seller_coins
+    );
+end;
+$$;
+
+
+-- توابع لایک: تغییر سکه نویسنده از طریق دفتر کل (بقیه بدنه همان 004 است)
+create or replace function set_post_like(
+    post_id_in bigint,
+    user_id_in text,
+    liked_in boolean
+) returns jsonb
+language plpgsql
+as $$
+declare
+    p posts;
+    delta integer := case when liked_in then 1 else -1 end;
+    changed boolean;
+begin
+    begin
+        if liked_in then
+            insert into post_reactions (post_id, user_id, kind)
+            values (post_id_in, user_id_in, 'like')
+            on conflict do nothing;
+        else
+            delete from post_reactions
+            where post_id = post_id_in and user_id = user_id_in and kind = 'like';
+        end if;
+        changed := found;
+    exception when foreign_key_violation then
+        raise exception 'post_not_found' using errcode = 'P0002';
+    end;
+
+    if changed then
+        update posts set like_count = greatest(like_count + delta, 0)
+        where id = post_id_in
+        returning * into p;
+        if exists (select 1 from users where user_id = p.user_id) then
+            perform post_coins(p.user_id, delta, 'post_like', post_id_in);
+        end if;
+    else
+        select * into p from posts where id = post_id_in;
+        if not found then
+            raise exception 'post_not_found' using errcode = 'P0002';
+        end if;
+    end if;
+
+    return to_jsonb(p) || jsonb_build_object(
+        'liked_by_me', liked_in,
+        'viewed_by_me', exists (
+            select 1 from post_reactions
+            where post_id = post_id_in and user_id = user_id_in and kind = 'view'
+        ),
+        'changed', changed,
+        'author_coins', coalesce(
+            (select coins from users where user_id = p.user_id), 0
+        )
+    );
+end;
+$$;
+
+
+create or replace function set_comment_like(
+    comment_id_in bigint,
+    user_id_in text,
+    liked_in boolean
+) returns jsonb
+language plpgsql
+as $$
+declare
+    c comments;
+    delta integer := case when liked_in then 1 else -1 end;
+    changed boolean;
+begin
+    begin
+        if liked_in then
+            insert into comment_reactions (comment_id, user_id, kind)
+            values (comment_id_in, user_id_in, 'like')
+            on conflict do nothing;
+        else
+            delete from comment_reactions
+            where comment_id = comment_id_in
+                and user_id = user_id_in
+                and kind = 'like';
+        end if;
+        changed := found;
+    exception when foreign_key_violation then
+        raise exception 'comment_not_found' using errcode = 'P0002';
+    end;
+
+    if changed then
+        update comments set like_count = greatest(like_count + delta, 0)
+        where id = comment_id_in
+        returning * into c;
+        if exists (select 1 from users where user_id = c.user_id) then
+            perform post_coins(c.user_id, delta, 'comment_like', comment_id_in);
+        end if;
+    else
+        select * into c from comments where id = comment_id_in;
+        if not found then
+            raise exception 'comment_not_found' using errcode = 'P0002';
+        end if;
+    end if;
+
+    return to_jsonb(c) || jsonb_build_object(
+        'liked_by_me', liked_in,
+        'viewed_by_me', exists (
+            select 1 from comment_reactions
+            where comment_id = comment_id_in
+                and user_id = user_id_in
+                and kind = 'view'
+        ),
+        'changed', changed,
+        'author_coins', coalesce(
+            (select coins from users where user_id = c.user_id), 0
+        )
+    );
+end;
+$$;
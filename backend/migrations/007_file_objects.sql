@@ -0,0 +1,15 @@
+-- 007_file_objects.sql
+--
+-- فهرست محتوا-محور فایل‌های باکت notebooks: هر محتوای یکتا (بر اساس SHA-256)
+-- فقط یک بار در Storage ذخیره می‌شود. سرور پیش از آپلود هش فایل را در این جدول
+-- جستجو می‌کند و اگر پیدا شد، بدون آپلود دوباره همان file_url را برمی‌گرداند.
+
+create table if not exists file_objects (
+    sha256 text primary key check (sha256 ~ '^[0-9a-f]{64}$'),
+    size bigint not null,
+    path text not null,  -- مسیر شیء در باکت notebooks
+    file_url text not null,
+    content_type text,
+    uploaded_by text,  -- اولین کاربری که این محتوا را آپلود کرد
+    created_at timestamptz not null default now()
+);
@@ -0,0 +1,33 @@
+-- 008_purchase_count.sql
+--
+-- شمارنده تعداد خریدهای هر محصول: products.purchase_count با trigger روی
+-- purchases به‌روز می‌شود تا آمار محصول بدون خواندن ردیف‌های purchases (و برای
+-- چند محصول با یک درخواست) به دست بیاید.
+
+alter table products add column if not exists purchase_count integer not null default 0;
+
+create or replace function purchases_count_trigger() returns trigger
+language plpgsql
+as $$
+begin
+    if tg_op = 'INSERT' then
+        update products set purchase_count = purchase_count + 1
+        where id = new.product_id;
+    elsif tg_op = 'DELETE' then
+        update products set purchase_count = greatest(purchase_count - 1, 0)
+        where id = old.product_id;
+    end if;
+    return null;
+end;
+$$;
+
+drop trigger if exists purchases_count on purchases;
+create trigger purchases_count
+    after insert or delete on purchases
+    for each row execute function purchases_count_trigger();
+
+-- مقدار اولیه از خریدهای موجود
+update products p
+set purchase_count = c.n
+from (select product_id, count(*) as n from purchases group by product_id) c
+where c.product_id = p.id and p.purchase_count <> c.n;
@@ -0,0 +1,115 @@
+-- 009_search.sql
+--
+-- جستجوی متن کامل روی پست‌ها، کامنت‌ها و محصولات با Postgres FTS.
+--
+-- متن پیش از ساخت tsvector با search_normalize یکسان‌سازی می‌شود:
+-- - ی و ک عربی (ي، ى، ك) به ی و ک فارسی، ة و ۀ به ه، أ/إ/ٱ به ا
+-- - اعراب (فتحه، کسره، تنوین، تشدید، ...) و کشیده (ـ) حذف می‌شوند
+-- - نیم‌فاصله (ZWNJ) به فاصله تبدیل می‌شود تا «کتاب‌ها» و «می‌روم» با «کتاب» و
+--   «روم» هم پیدا شوند
+-- - ارقام فارسی و عربی به ارقام لاتین، و حروف لاتین کوچک
+-- پیکربندی english کلمات انگلیسی را ریشه‌یابی (stem) می‌کند و کلمات فارسی را
+-- بدون تغییر نگه می‌دارد. ستون‌های search از نوع generated هستند، پس با هر
+-- insert (create_post، create_comment، create_product) خودکار ساخته می‌شوند.
+
+create or replace function search_normalize(t text) returns text
+language sql
+immutable parallel safe
+as $$
+    select lower(translate(
+        coalesce(t, ''),
+        -- جایگزینی‌ها (به ترتیب با رشته دوم)
+        U&'\064A\0649\0643\0629\06C0\0623\0625\0671\200C'
+        || U&'\06F0\06F1\06F2\06F3\06F4\06F5\06F6\06F7\06F8\06F9'
+        || U&'\0660\0661\0662\0663\0664\0665\0666\0667\0668\0669'
+        -- حذف‌شدنی‌ها (بدون معادل در رشته دوم): کشیده و اعراب
+        || U&'\0640\064B\064C\064D\064E\064F\0650\0651\0652\0670',
+        U&'\06CC\06CC\06A9\0647\0647\0627\0627\0627 '
+        || '0123456789'
+        || '0123456789'
+    ));
+$$;
+
+-- عبارت جستجو به tsquery: هر کلمه به صورت پیشوندی (کلمه:*) و همه کلمات با AND؛
+-- پیشوندی بودن پسوندهای فارسی بدون نیم‌فاصله («کتابها») را هم پوشش می‌دهد.
+create or replace function search_query(q text) returns tsquery
+language sql
+immutable parallel safe
+as $$
+    select to_tsquery('english', coalesce(string_agg(quote_literal(w) || ':*', ' & '), ''))
+    from regexp_split_to_table(
+        search_normalize(q),
+        E'[\\s&|!():*<>''"\\\\,.;?؟،؛«»\\-]+'
+    ) as w
+    where w <> '';
+$$;
+
+alter table posts add column if not exists search tsvector generated always as (
+    setweight(to_tsvector('english', search_normalize(title)), 'A')
+    || setweight(to_tsvector('english', search_normalize(contains)), 'B')
+    || setweight(to_tsvector('english', search_normalize(creator)), 'C')
+) stored;
+
+alter table comments add column if not exists search tsvector generated always as (
+    setweight(to_tsvector('english', search_normalize(content)), 'B')
+    || setweight(to_tsvector('english', search_normalize(creator)), 'C')
+) stored;
+
+alter table products add column if not exists search tsvector generated always as (
+    setweight(to_tsvector('english', search_normalize(title)), 'A')
+    || setweight(to_tsvector('english', search_normalize(description)), 'B')
+    || setweight(to_tsvector('english', search_normalize(seller_name)), 'C')
+) stored;
+
+create index if not exists posts_search_idx on posts using gin (search);
+create index if not exists comments_search_idx on comments using gin (search);
+create index if not exists products_search_idx on products using gin (search);
+
+-- نتایج رتبه‌بندی شده (ts_rank_cd) از جدول‌های kinds_in ('post'، 'comment'،
+-- 'product') به صورت آرایه JSON؛ یک ردیف بیشتر از limit_in برگردانده می‌شود تا
+-- وجود صفحه بعد مشخص شود. snippet بخشی از متن اصلی اطراف کلمات پیدا شده است.
+create or replace function search_content(
+    query_in text, kinds_in text[], limit_in integer, offset_in integer
+) returns jsonb
+language sql
+stable
+as $$
+    with q as (
+        select search_query(query_in) as tsq
+    ),
+    hits as (
+        select 'post' as kind, p.id, p.id as post_id, p.title, p.contains as body,
+            p.creator, p.created_at, ts_rank_cd(p.search, q.tsq) as rank
+        from posts p, q
+        where 'post' = any(kinds_in) and p.search @@ q.tsq
+        union all
+        select 'comment', c.id, c.post_id, null, c.content, c.creator, c.created_at,
+            ts_rank_cd(c.search, q.tsq)
+        from comments c, q
+        where 'comment' = any(kinds_in) and c.search @@ q.tsq
+        union all
+        select 'product', pr.id, null, pr.title, pr.description, pr.seller_name,
+            pr.created_at, ts_rank_cd(pr.search, q.tsq)
+        from products pr, q
+        where 'product' = any(kinds_in) and pr.search @@ q.tsq
+    ),
+    page as (
+        select * from hits
+        order by rank desc, created_at desc, kind, id
+        limit limit_in + 1 offset offset_in
+    )
+    select coalesce(jsonb_agg(jsonb_build_object(
+        'kind', page.kind,
+        'id', page.id,
+        'post_id', page.post_id,
+        'title', page.title,
+        'snippet', ts_headline(
+            'english', page.body, q.tsq,
+            'StartSel="", StopSel="", MaxWords=30, MinWords=10, MaxFragments=1'
+        ),
+        'creator', page.creator,
+        'created_at', page.created_at,
+        'rank', page.rank
+    ) order by page.rank desc, page.created_at desc, page.kind, page.id), '[]'::jsonb)
+    from page, q;
+$$;
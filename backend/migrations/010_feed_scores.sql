@@ -0,0 +1,51 @@
+-- 010_feed_scores.sql
+--
+-- امتیاز «داغی» پست‌های اخیر برای بازسازی فید رتبه‌بندی شده سرور (feed.py).
+-- داغی هر پست log Σ w·e^(t/τ) است: خود انتشار با وزن ۱ و هر لایک و بازدید با
+-- وزن like_weight_in/view_weight_in در زمان ثبت آن (post_reactions.created_at).
+-- محاسبه به صورت log-sum-exp نسبت به بیشترین توان انجام می‌شود تا سرریز نکند.
+--
+-- خروجی: آرایه JSON از {"id", "created" (unix time), "heat", "author_coins"}
+-- برای limit_in پست آخر.
+
+create or replace function feed_scores(
+    limit_in integer, tau_in float8, like_weight_in float8, view_weight_in float8
+) returns jsonb
+language sql
+stable
+as $$
+    with p as (
+        select id, user_id, extract(epoch from created_at) as created
+        from posts
+        order by created_at desc, id desc
+        limit limit_in
+    ),
+    events as (
+        select p.id, p.created / tau_in as x, 1::float8 as w
+        from p
+        union all
+        select p.id, extract(epoch from r.created_at) / tau_in,
+            case r.kind when 'like' then like_weight_in else view_weight_in end
+        from post_reactions r
+        join p on p.id = r.post_id
+    ),
+    peak as (
+        select id, max(x) as m from events where w > 0 group by id
+    ),
+    heat as (
+        select e.id, k.m + ln(sum(e.w * exp(e.x - k.m))) as heat
+        from events e
+        join peak k on k.id = e.id
+        where e.w > 0
+        group by e.id, k.m
+    )
+    select coalesce(jsonb_agg(jsonb_build_object(
+        'id', p.id,
+        'created', p.created,
+        'heat', h.heat,
+        'author_coins', u.coins
+    )), '[]'::jsonb)
+    from p
+    join heat h on h.id = p.id
+    left join users u on u.user_id = p.user_id;
+$$;
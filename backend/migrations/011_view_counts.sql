@@ -0,0 +1,75 @@
+-- 011_view_counts.sql
+--
+-- توابع ثبت دسته‌ای بازدید (005_bulk_views.sql) حالا شمارنده جدید ردیف‌های تغییر
+-- کرده را هم برمی‌گردانند تا سرور بتواند آنها را بدون کوئری دیگر برای کلاینت‌ها
+-- ارسال کند (events.py) و تعداد دقیق بازدیدهای جدید را به فید بدهد.
+--
+-- خروجی record_post_views: آرایه JSON از {"id", "view_count", "added"}
+-- خروجی record_comment_views: آرایه JSON از {"id", "post_id", "view_count"}
+
+create or replace function record_post_views(views jsonb) returns jsonb
+language plpgsql
+as $$
+declare
+    changed jsonb;
+begin
+    with v as (
+        select distinct (e ->> 'id')::bigint as post_id, e ->> 'user_id' as user_id
+        from jsonb_array_elements(views) e
+    ),
+    ins as (
+        insert into post_reactions (post_id, user_id, kind)
+        select v.post_id, v.user_id, 'view'
+        from v join posts p on p.id = v.post_id
+        on conflict do nothing
+        returning post_id
+    ),
+    counts as (
+        select post_id, count(*) as n from ins group by post_id
+    ),
+    upd as (
+        update posts p set view_count = p.view_count + counts.n
+        from counts
+        where p.id = counts.post_id
+        returning p.id, p.view_count, counts.n
+    )
+    select coalesce(jsonb_agg(jsonb_build_object(
+        'id', id, 'view_count', view_count, 'added', n
+    )), '[]'::jsonb) into changed from upd;
+    return changed;
+end;
+$$;
+
+
+create or replace function record_comment_views(views jsonb) returns jsonb
+language plpgsql
+as $$
+declare
+    changed jsonb;
+begin
+    with v as (
+        select distinct (e ->> 'id')::bigint as comment_id, e ->> 'user_id' as user_id
+        from jsonb_array_elements(views) e
+    ),
+    ins as (
+        insert into comment_reactions (comment_id, user_id, kind)
+        select v.comment_id, v.user_id, 'view'
+        from v join comments c on c.id = v.comment_id
+        on conflict do nothing
+        returning comment_id
+    ),
+    counts as (
+        select comment_id, count(*) as n from ins group by comment_id
+    ),
+    upd as (
+        update comments c set view_count = c.view_count + counts.n
+        from counts
+        where c.id = counts.comment_id
+        returning c.id, c.post_id, c.view_count
+    )
+    select coalesce(jsonb_agg(jsonb_build_object(
+        'id', id, 'post_id', post_id, 'view_count', view_count
+    )), '[]'::jsonb) into changed from upd;
+    return changed;
+end;
+$$;
@@ -0,0 +1,174 @@
+-- 012_single_round_trip.sql
+--
+-- ساخت پست و کامنت با یک فراخوانی: ردیف جدید به همراه سکه نویسنده
+-- (author_coins) برگردانده می‌شود و وجود پست کامنت با کلید خارجی
+-- comments.post_id بررسی می‌شود (بدون کوئری جداگانه پیش از درج).
+-- توابع لایک (006_coin_ledger.sql) هم موجودی جدید نویسنده را از post_coins
+-- می‌گیرند و ستون search (tsvector، 009_search.sql) را برنمی‌گردانند.
+--
+-- خروجی insert_post/insert_comment: ردیف جدید (بدون search) و author_coins
+
+create or replace function insert_post(
+    user_id_in text,
+    creator_in text,
+    title_in text,
+    contains_in text
+) returns jsonb
+language plpgsql
+as $$
+declare
+    p posts;
+begin
+    insert into posts (user_id, creator, title, contains)
+    values (user_id_in, creator_in, title_in, contains_in)
+    returning * into p;
+
+    return to_jsonb(p) - 'search' || jsonb_build_object(
+        'author_coins', coalesce(
+            (select coins from users where user_id = user_id_in), 0
+        )
+    );
+end;
+$$;
+
+
+create or replace function insert_comment(
+    post_id_in bigint,
+    user_id_in text,
+    creator_in text,
+    content_in text
+) returns jsonb
+language plpgsql
+as $$
+declare
+    c comments;
+begin
+    begin
+        insert into comments (post_id, user_id, creator, content)
+        values (post_id_in, user_id_in, creator_in, content_in)
+        returning * into c;
+    exception when foreign_key_violation then
+        raise exception 'post_not_found' using errcode = 'P0002';
+    end;
+
+    return to_jsonb(c) - 'search' || jsonb_build_object(
+        'author_coins', coalesce(
+            (select coins from users where user_id = user_id_in), 0
+        )
+    );
+end;
+$$;
+
+
+create or replace function set_post_like(
+    post_id_in bigint,
+    user_id_in text,
+    liked_in boolean
+) returns jsonb
+language plpgsql
+as $$
+declare
+    p posts;
+    delta integer := case when liked_in then 1 else -1 end;
+    changed boolean;
+    coins_out integer;
+begin
+    begin
+        if liked_in then
+            insert into post_reactions (post_id, user_id, kind)
+            values (post_id_in, user_id_in, 'like')
+            on conflict do nothing;
+        else
+            delete from post_reactions
+            where post_id = post_id_in and user_id = user_id_in and kind = 'like';
+        end if;
+        changed := found;
+    exception when foreign_key_violation then
+        raise exception 'post_not_found' using errcode = 'P0002';
+    end;
+
+    if changed then
+        update posts set like_count = greatest(like_count + delta, 0)
+        where id = post_id_in
+        returning * into p;
+        if exists (select 1 from users where user_id = p.user_id) then
+            coins_out := post_coins(p.user_id, delta, 'post_like', post_id_in);
+        end if;
+    else
+        select * into p from posts where id = post_id_in;
+        if not found then
+            raise exception 'post_not_found' using errcode = 'P0002';
+        end if;
+        select coins into coins_out from users where user_id = p.user_id;
+    end if;
+
+    return to_jsonb(p) - 'search' || jsonb_build_object(
+        'liked_by_me', liked_in,
+        'viewed_by_me', exists (
+            select 1 from post_reactions
+            where post_id = post_id_in and user_id = user_id_in and kind = 'view'
+        ),
+        'changed', changed,
+        'author_coins', coalesce(coins_out, 0)
+    );
+end;
+$$;
+
+
+create or replace function set_comment_like(
+    comment_id_in bigint,
+    user_id_in text,
+    liked_in boolean
+) returns jsonb
+language plpgsql
+as $$
+declare
+    c comments;
+    delta integer := case when liked_in then 1 else -1 end;
+    changed boolean;
+    coins_out integer;
+begin
+    begin
+        if liked_in then
+            insert into comment_reactions (comment_id, user_id, kind)
+            values (comment_id_in, user_id_in, 'like')
+            on conflict do nothing;
+        else
+            delete from comment_reactions
+            where comment_id = comment_id_in
+                and user_id = user_id_in
+                and kind = 'like';
+        end if;
+        changed := found;
+    exception when foreign_key_violation then
+        raise exception 'comment_not_found' using errcode = 'P0002';
+    end;
+
+    if changed then
+        update comments set like_count = greatest(like_count + delta, 0)
+        where id = comment_id_in
+        returning * into c;
+        if exists (select 1 from users where user_id = c.user_id) then
+            coins_out := post_coins(c.user_id, delta, 'comment_like', comment_id_in);
+        end if;
+    else
+        select * into c from comments where id = comment_id_in;
+        if not found then
+            raise exception 'comment_not_found' using errcode = 'P0002';
+        end if;
+        select coins into coins_out from users where user_id = c.user_id;
+    end if;
+
+    return to_jsonb(c) - 'search' || jsonb_build_object(
+        'liked_by_me', liked_in,
+        'viewed_by_me', exists (
+            select 1 from comment_reactions
+            where comment_id = comment_id_in
+                and user_id = user_id_in
+                and kind = 'view'
+        ),
+        'changed', changed,
+        'author_coins', coalesce(coins_out, 0)
+    );
+end;
+$$;
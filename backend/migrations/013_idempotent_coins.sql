@@ -0,0 +1,150 @@
+-- 013_idempotent_coins.sql
+--
+-- Idempotency-Key درخواست‌هایی که سکه جابه‌جا می‌کنند (idempotency.py) در
+-- پایگاه داده هم یکتا ثبت می‌شود: در coin_ledger برای تغییر مستقیم موجودی
+-- (post_coins) و در purchases برای خرید (purchase_product). تلاش مجددی که
+-- نتیجه اولی را در کش پیدا نکند (خطای 5xx یا timeout پس از commit، یا
+-- worker دیگر) به جای اعمال دوباره، نتیجه فعلی را می‌گیرد.
+
+alter table coin_ledger add column if not exists idempotency_key text;
+create unique index if not exists coin_ledger_idempotency_key_idx
+    on coin_ledger (idempotency_key) where idempotency_key is not null;
+
+alter table purchases add column if not exists idempotency_key text;
+create unique index if not exists purchases_idempotency_key_idx
+    on purchases (idempotency_key) where idempotency_key is not null;
+
+
+-- امضای جدید جایگزین نسخه 006 می‌شود (نه overload کنار آن)
+drop function if exists post_coins(text, integer, text, bigint);
+
+-- مثل 006؛ با idempotency_key_in تکراری موجودی فعلی بدون تغییر برگردانده می‌شود
+create or replace function post_coins(
+    user_id_in text,
+    amount_in integer,
+    reason_in text,
+    ref_id_in bigint default null,
+    idempotency_key_in text default null
+) returns integer
+language plpgsql
+as $$
+declare
+    balance integer;
+begin
+    if amount_in = 0 or (
+        idempotency_key_in is not null
+        and exists (
+            select 1 from coin_ledger where idempotency_key = idempotency_key_in
+        )
+    ) then
+        select coins into balance from users where user_id = user_id_in;
+        if not found then
+            raise exception 'user_not_found' using errcode = 'P0002';
+        end if;
+        return balance;
+    end if;
+
+    begin
+        update users set coins = coins + amount_in
+        where user_id = user_id_in and coins + amount_in >= 0
+        returning coins into balance;
+        if not found then
+            if exists (select 1 from users where user_id = user_id_in) then
+                raise exception 'insufficient_coins' using errcode = 'P0001';
+            end if;
+            raise exception 'user_not_found' using errcode = 'P0002';
+        end if;
+
+        insert into coin_ledger (user_id, amount, reason, ref_id, idempotency_key)
+        values (user_id_in, amount_in, reason_in, ref_id_in, idempotency_key_in);
+    exception when unique_violation then
+        -- فراخوانی هم‌زمان با همین کلید زودتر ثبت شده است؛ تغییر این یکی لغو شد
+        select coins into balance from users where user_id = user_id_in;
+    end;
+    return balance;
+end;
+$$;
+
+
+drop function if exists purchase_product(text, bigint);
+
+-- مثل 006؛ خرید تکراری با همان idempotency_key_in نتیجه خرید اول را برمی‌گرداند
+-- (replayed = true) و خطای already_purchased نمی‌دهد
+create or replace function purchase_product(
+    buyer_id_in text,
+    product_id_in bigint,
+    idempotency_key_in text default null
+) returns jsonb
+language plpgsql
+as $$
+declare
+    prod products;
+    new_purchase_id bigint;
+    buyer_coins integer;
+    seller_coins integer;
+begin
+    select * into prod from products where id = product_id_in;
+    if not found then
+        raise exception 'product_not_found' using errcode = 'P0002';
+    end if;
+    if prod.seller_id = buyer_id_in then
+        raise exception 'own_product' using errcode = 'P0001';
+    end if;
+
+    perform 1 from users
+    where user_id in (buyer_id_in, prod.seller_id)
+    order by user_id
+    for update;
+
+    if idempotency_key_in is not null then
+        select id into new_purchase_id from purchases
+        where idempotency_key = idempotency_key_in
+            and buyer_id = buyer_id_in
+            and product_id = product_id_in;
+        if found then
+            return jsonb_build_object(
+                'purchase_id', new_purchase_id,
+                'buyer_coins', (select coins from users where user_id = buyer_id_in),
+                'seller_id', prod.seller_id,
+                'seller_coins', (
+                    select coins from users where user_id = prod.seller_id
+                ),
+                'replayed', true
+            );
+        end if;
+    end if;
+
+    if exists (
+        select 1 from purchases
+        where buyer_id = buyer_id_in and product_id = product_id_in
+    ) then
+        raise exception 'already_purchased' using errcode = 'P0001';
+    end if;
+
+    insert into purchases (buyer_id, product_id, idempotency_key)
+    values (buyer_id_in, product_id_in, idempotency_key_in)
+    returning id into new_purchase_id;
+
+    begin
+        buyer_coins := post_coins(
+            buyer_id_in, -prod.price, 'purchase', new_purchase_id
+        );
+    exception when sqlstate 'P0002' then
+        -- خریداری که در جدول users نیست موجودی ندارد
+        raise exception 'insufficient_coins' using errcode = 'P0001';
+    end;
+    if exists (select 1 from users where user_id = prod.seller_id) then
+        seller_coins := post_coins(
+            prod.seller_id, prod.price, 'sale', new_purchase_id
+        );
+    end if;
+
+    return jsonb_build_object(
+        'purchase_id', new_purchase_id,
+        'buyer_coins', buyer_coins,
+        'seller_id', prod.seller_id,
+        'seller_coins', seller_coins,
+        'replayed', false
+    );
+end;
+$$;
@@ -0,0 +1,57 @@
+# pagination.py
+
+import base64
+import json
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException
+
+# این فایل صفحهبندی مبتنی بر کلید (keyset) را برای لیستهای مرتب شده بر اساس
+# (created_at, id) به صورت نزولی پیادهسازی میکند. برخلاف offset، هزینه هر صفحه
+# به عمق آن بستگی ندارد و ایندکس (created_at desc, id desc) کافی است.
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+def encode_cursor(row: dict) -> str:
+    """نشانگر صفحه بعد را از آخرین ردیف صفحه فعلی میسازد."""
+    raw = json.dumps([row["created_at"], row["id"]], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    """نشانگر را به (created_at, id) تبدیل میکند؛ نشانگر نامعتبر خطای 400 میدهد.
+
+    created_at از کلاینت میآید و داخل فیلتر PostgREST قرار میگیرد، پس فقط یک
+    زمان معتبر پذیرفته و دوباره با isoformat نوشته میشود.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(created_at).isoformat(), int(row_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="نشانگر صفحه نامعتبر است")
+
+
+def keyset_page(query, limit: int, before: Optional[str]):
+    """ترتیب، شرط keyset و محدودیت را روی یک کوئری PostgREST اعمال میکند.
+
+    یک ردیف بیشتر از limit خوانده میشود تا وجود صفحه بعد مشخص شود.
+    """
+    if before:
+        created_at, row_id = decode_cursor(before)
+        query = query.or_(
+            f'created_at.lt."{created_at}",'
+            f'and(created_at.eq."{created_at}",id.lt.{row_id})'
+        )
+    return query.order("created_at", desc=True).order("id", desc=True).limit(limit + 1)
+
+
+def split_page(rows: List[dict], limit: int) -> Tuple[List[dict], Optional[str]]:
+    """ردیفهای صفحه و نشانگر صفحه بعد (یا None) را برمیگرداند."""
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, encode_cursor(rows[-1])
+    return rows, None
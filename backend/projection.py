@@ -0,0 +1,88 @@
+# projection.py
+
+from typing import Iterable, Optional, Tuple
+
+from fastapi import HTTPException, Query
+
+# این فایل ستون‌هایی را که هر پاسخ از جدول‌ها می‌خواند و پارامتر fields= را
+# تعریف می‌کند. به جای select("*") فقط ستون‌های لازم خوانده می‌شوند (select("*")
+# ستون‌های داخلی مثل search با tsvector کامل متن را هم برمی‌گرداند). با fields=
+# کلاینت فقط فیلدهای مورد نیازش را می‌گیرد و ستون‌ها، پرچم‌های کاربر و سکه
+# نویسنده‌ای که خواسته نشده‌اند اصلاً خوانده نمی‌شوند.
+
+POST_COLUMNS = (
+    "id",
+    "created_at",
+    "creator",
+    "user_id",
+    "title",
+    "contains",
+    "like_count",
+    "view_count",
+)
+COMMENT_COLUMNS = (
+    "id",
+    "post_id",
+    "user_id",
+    "creator",
+    "content",
+    "created_at",
+    "like_count",
+    "view_count",
+)
+PRODUCT_COLUMNS = (
+    "id",
+    "created_at",
+    "seller_id",
+    "seller_name",
+    "title",
+    "description",
+    "price",
+    "file_url",
+    "purchase_count",
+)
+
+# ستون‌های لازم برای ساختن نشانگر صفحه (pagination.encode_cursor)
+PAGE_KEY_COLUMNS = ("id", "created_at")
+
+FieldsQuery = Query(
+    None,
+    description="فیلدهای مورد نیاز هر ردیف، جدا شده با کاما (مثلاً id,title,like_count)",
+    max_length=500,
+)
+
+
+def parse_fields(model: type, fields: Optional[str]) -> Optional[Tuple[str, ...]]:
+    """مقدار پارامتر fields را به فیلدهای model تبدیل می‌کند (None یعنی همه).
+
+    فیلد ناشناخته خطای 400 می‌دهد.
+    """
+    if fields is None:
+        return None
+    names = {name.strip() for name in fields.split(",") if name.strip()}
+    allowed = [*model.model_fields, *model.model_computed_fields]
+    unknown = sorted(names.difference(allowed))
+    if unknown or not names:
+        raise HTTPException(
+            status_code=400,
+            detail=f"فیلد نامعتبر: {', '.join(unknown) or fields}",
+        )
+    # ترتیب ثابت (ترتیب مدل) تا کلید کش و ETag به ترتیب پارامتر وابسته نباشد
+    return tuple(name for name in allowed if name in names)
+
+
+def wants(fields: Optional[Tuple[str, ...]], *names: str) -> bool:
+    """آیا هر یک از names در پاسخ لازم است (fields برابر None یعنی همه فیلدها)."""
+    return fields is None or any(name in fields for name in names)
+
+
+def select_columns(
+    columns: Tuple[str, ...],
+    fields: Optional[Tuple[str, ...]],
+    required: Iterable[str] = PAGE_KEY_COLUMNS,
+) -> str:
+    """رشته ستون‌های select برای فیلدهای خواسته شده به همراه ستون‌های required."""
+    if fields is None:
+        return ", ".join(columns)
+    needed = set(fields) | set(required)
+    return ", ".join(column for column in columns if column in needed)
@@ -0,0 +1,151 @@
+# responses.py
+
+import json
+import os
+from types import SimpleNamespace
+from typing import Any, Optional, Tuple, Union, get_args, get_origin
+
+from dotenv import load_dotenv
+from fastapi import Response
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+# این فایل سریال‌سازی سریع‌تر پاسخ‌های JSON را فراهم می‌کند:
+# - FastJSONResponse پاسخ‌ها را با orjson (در صورت نصب بودن) می‌سازد که چند برابر
+#   سریع‌تر از json استاندارد است؛ بدون orjson همان JSONResponse استفاده می‌شود.
+# - TrustedSerializer ردیف‌های پایگاه داده را بدون اعتبارسنجی دوباره با Pydantic
+#   به شکل خروجی یک مدل درمی‌آورد: فقط فیلدهای مدل (با مقدار پیش‌فرض برای
+#   فیلدهای ناموجود) و فیلدهای محاسبه‌شده (مثل نشان نویسنده). با
+#   RESPONSE_VALIDATION=false لیست‌های بزرگ و همیشه پاسخ‌های دارای پارامتر
+#   fields= (projection.py) از این مسیر برگردانده می‌شوند.
+
+# بارگذاری متغیرهای محیطی از فایل .env
+load_dotenv()
+
+# false یعنی ردیف‌های پایگاه داده در پاسخ لیست‌ها دوباره اعتبارسنجی نشوند
+RESPONSE_VALIDATION = os.getenv("RESPONSE_VALIDATION", "true").lower() != "false"
+
+try:
+    import orjson
+except ImportError:  # وابستگی اختیاری
+    orjson = None
+
+
+class FastJSONResponse(JSONResponse):
+    """پاسخ JSON با orjson؛ بدون orjson مثل JSONResponse رفتار می‌کند.
+
+    برخلاف JSONResponse، حروف غیر ASCII (متن فارسی) escape نمی‌شوند و حجم پاسخ
+    کمتر است.
+    """
+
+    def render(self, content: Any) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+        return json.dumps(
+            content, ensure_ascii=False, separators=(",", ":"), default=str
+        ).encode("utf-8")
+
+
+def _nested_model(annotation) -> tuple:
+    """(مدل تو در تو، آیا لیست است) برای نوع یک فیلد؛ برای نوع ساده (None, False)."""
+    if get_origin(annotation) is Union:
+        args = [arg for arg in get_args(annotation) if arg is not type(None)]
+        if len(args) != 1:
+            return None, False
+        annotation = args[0]
+    many = get_origin(annotation) is list
+    if many:
+        annotation = get_args(annotation)[0]
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return annotation, many
+    return None, False
+
+
+class TrustedSerializer:
+    """ردیف‌ها (dict) را بدون اعتبارسنجی به شکل JSON خروجی model درمی‌آورد.
+
+    ورودی باید از منبع مورد اعتماد (پایگاه داده یا کش) و با نوع‌های درست باشد؛
+    مقادیر تبدیل نمی‌شوند (مثلاً تاریخ همان رشته ISO پایگاه داده می‌ماند).
+    fields فقط این فیلدها (و فیلدهای محاسبه‌شده) را نگه می‌دارد؛ برای مدل‌های
+    دربرگیرنده مثل PostPage روی ردیف‌های تو در تو (items) اعمال می‌شود.
+    """
+
+    def __init__(self, model: type, fields: Optional[Tuple[str, ...]] = None):
+        self.model = model
+        self.defaults = {}
+        self.nested = {}
+        for name, field in model.model_fields.items():
+            if not field.is_required():
+                self.defaults[name] = field.get_default(call_default_factory=True)
+            sub, many = _nested_model(field.annotation)
+            if sub is not None:
+                self.nested[name] = (TrustedSerializer(sub, fields), many)
+        # مدل دربرگیرنده همه فیلدهای خودش را نگه می‌دارد
+        own = None if self.nested else fields
+        self.fields = tuple(
+            name for name in model.model_fields if own is None or name in own
+        )
+        self.computed = {
+            name: info.wrapped_property.fget
+            for name, info in model.model_computed_fields.items()
+            if own is None or name in own
+        }
+
+    def one(self, row: dict) -> dict:
+        out = {
+            name: row[name] if name in row else self.defaults.get(name)
+            for name in self.fields
+        }
+        for name, (serializer, many) in self.nested.items():
+            value = out[name]
+            if value is not None:
+                out[name] = serializer.many(value) if many else serializer.one(value)
+        if self.computed:
+            instance = SimpleNamespace(**{**self.defaults, **row})
+            for name, getter in self.computed.items():
+                out[name] = getter(instance)
+        return out
+
+    def many(self, rows) -> list:
+        return [self.one(row) for row in rows]
+
+
+_serializers: dict = {}
+
+
+def trusted_serializer(
+    model: type, fields: Optional[Tuple[str, ...]] = None
+) -> TrustedSerializer:
+    if fields is not None:
+        # ترکیب‌های fields نامحدودند و نگه داشته نمی‌شوند
+        return TrustedSerializer(model, fields)
+    serializer = _serializers.get(model)
+    if serializer is None:
+        serializer = _serializers[model] = TrustedSerializer(model)
+    return serializer
+
+
+def trusted_response(
+    model: type,
+    content: Any,
+    response: Optional[Response] = None,
+    many: bool = False,
+    validate: Optional[bool] = None,
+    fields: Optional[Tuple[str, ...]] = None,
+) -> Any:
+    """پاسخ یک endpoint با response_model=model (یا List[model] اگر many).
+
+    با اعتبارسنجی فعال (پیش‌فرض RESPONSE_VALIDATION) و بدون fields خود content
+    برگردانده می‌شود تا FastAPI آن را با response_model بررسی کند؛ در غیر این
+    صورت پاسخ مستقیم با TrustedSerializer ساخته می‌شود و هدرهای response (مثل
+    ETag) روی آن کپی می‌شوند.
+    """
+    if fields is None and (RESPONSE_VALIDATION if validate is None else validate):
+        return content
+    serializer = trusted_serializer(model, fields)
+    body = serializer.many(content) if many else serializer.one(content)
+    result = FastJSONResponse(body)
+    if response is not None:
+        for name, value in response.headers.items():
+            result.headers[name] = value
+    return result
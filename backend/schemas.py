@@ -1,9 +1,10 @@
 # schemas.py
 
 from datetime import datetime
-from typing import List, Optional
+from typing import List, Literal, Optional
 
-from pydantic import BaseModel, Field
+from badges import badge_for
+from pydantic import BaseModel, Field, computed_field
 
 # این فایل مدلهای دادهای را تعریف میکند که برای اعتبارسنجی ورودی و خروجی API استفاده میشوند.  # noqa: E501
 # Pydantic به صورت خودکار دادهها را اعتبارسنجی و تبدیل میکند.
@@ -16,6 +17,18 @@ class User(BaseModel):
     coins: int = 0  # تعداد سکههای کاربر، مقدار پیشفرض صفر است
 
 
+class UserCoins(BaseModel):
+    """سکهها و نشان یک کاربر (برای نمایش نشان در لیستها)."""
+
+    user_id: str
+    coins: int = 0
+
+    @computed_field
+    @property
+    def badge(self) -> str:
+        return badge_for(self.coins)
+
+
 class Comment(BaseModel):
     """مدل داده برای یک کامنت."""
 
@@ -25,10 +38,33 @@ class Comment(BaseModel):
     creator: str  # نام کاربری که کامنت را ایجاد کرده
     content: str  # محتوای کامنت
     created_at: datetime  # زمان ایجاد کامنت
-    # لیستی از شناسههای کاربرانی که این کامنت را لایک کردهاند
-    likes: List[str] = []
-    # لیستی از شناسههای کاربرانی که این کامنت را مشاهده کردهاند
-    views: List[str] = []
+    like_count: int = 0  # تعداد لایکهای کامنت
+    view_count: int = 0  # تعداد بازدیدهای کامنت
+    liked_by_me: bool = False  # آیا کاربر فعلی این کامنت را لایک کرده است
+    viewed_by_me: bool = False  # آیا کاربر فعلی این کامنت را دیده است
+    author_coins: int = 0  # سکههای نویسنده کامنت
+
+    @computed_field
+    @property
+    def author_badge(self) -> str:
+        return badge_for(self.author_coins)
+
+
+class CommentPage(BaseModel):
+    """یک صفحه از کامنتها به همراه نشانگر صفحه بعد."""
+
+    items: List[Comment]
+    next_cursor: Optional[str] = None  # برای صفحه بعد در پارامتر before ارسال شود
+
+
+class ViewAck(BaseModel):
+    """تأیید ثبت بازدید در بافر (ثبت در پایگاه داده چند ثانیه بعد انجام میشود).
+
+    وجود پست یا کامنت در این مرحله بررسی نمیشود؛ بازدید شناسه ناموجود هنگام
+    ثبت دستهای دور ریخته میشود.
+    """
+
+    queued: bool  # False یعنی بازدید تکراری بوده یا بافر پر است
 
 
 class CommentCreate(BaseModel):
@@ -46,10 +82,23 @@ class Posts(BaseModel):
     user_id: str  # شناسه کاربری که پست را ایجاد کرده
     title: str  # عنوان پست
     contains: str  # محتوای اصلی پست
-    # لیستی از شناسههای کاربرانی که این پست را لایک کردهاند
-    likes: List[str] = []
-    # لیستی از شناسههای کاربرانی که این پست را مشاهده کردهاند
-    views: List[str] = []
+    like_count: int = 0  # تعداد لایکهای پست
+    view_count: int = 0  # تعداد بازدیدهای پست
+    liked_by_me: bool = False  # آیا کاربر فعلی این پست را لایک کرده است
+    viewed_by_me: bool = False  # آیا کاربر فعلی این پست را دیده است
+    author_coins: int = 0  # سکههای نویسنده پست
+
+    @computed_field
+    @property
+    def author_badge(self) -> str:
+        return badge_for(self.author_coins)
+
+
+class PostPage(BaseModel):
+    """یک صفحه از پستها به همراه نشانگر صفحه بعد."""
+
+    items: List[Posts]
+    next_cursor: Optional[str] = None  # برای صفحه بعد در پارامتر before ارسال شود
 
 
 class PostCreate(BaseModel):
@@ -72,6 +121,21 @@ class Product(BaseModel):
     description: str
     price: int
     file_url: str
+    purchase_count: int = 0  # تعداد خریدها
+    owned_by_me: bool = False  # خریداری شده یا محصول خود کاربر فعلی
+    seller_coins: int = 0  # سکههای فروشنده
+
+    @computed_field
+    @property
+    def seller_badge(self) -> str:
+        return badge_for(self.seller_coins)
+
+
+class ProductStats(BaseModel):
+    """آمار خرید یک محصول."""
+
+    product_id: int
+    purchase_count: int
 
 
 class ProductCreate(BaseModel):
@@ -89,6 +153,44 @@ class Purchase(BaseModel):
     product: Product  # اطلاعات کامل محصول خریداری شده
 
 
+class DownloadLink(BaseModel):
+    """لینک امضاشده و کوتاهمدت دانلود فایل یک محصول خریداری شده."""
+
+    url: str
+    expires_at: datetime
+    expires_in: int  # ثانیه تا انقضای لینک
+
+
+SearchKind = Literal["post", "comment", "product"]
+
+
+class SearchResult(BaseModel):
+    """یک نتیجه جستجو (پست، کامنت یا محصول)."""
+
+    kind: SearchKind
+    id: int
+    post_id: Optional[int] = None  # پست مربوط به نتیجه (برای پست و کامنت)
+    title: Optional[str] = None
+    snippet: str  # بخشی از متن اطراف کلمات پیدا شده
+    creator: Optional[str] = None  # نویسنده یا فروشنده
+    created_at: datetime
+    rank: float  # امتیاز ارتباط؛ نتایج به ترتیب نزولی آن هستند
+
+
+class SearchPage(BaseModel):
+    """یک صفحه از نتایج جستجو به همراه offset صفحه بعد."""
+
+    items: List[SearchResult]
+    next_offset: Optional[int] = None  # برای صفحه بعد در پارامتر offset ارسال شود
+
+
+# موضوع‌های رویدادهای زنده (GET /events):
+# - posts: post.created، post.updated (لایک و بازدید) و post.deleted
+# - comments: comment.created و comment.updated
+# - coins: coins.updated (موجودی جدید سکه یک کاربر)
+EventTopic = Literal["posts", "comments", "coins"]
+
+
 class LeaderboardEntry(BaseModel):
     """مدل داده برای یک ورودی لیدربورد."""
 
@@ -98,6 +200,14 @@ class LeaderboardEntry(BaseModel):
     rank: int
 
 
+class UserRank(LeaderboardEntry):
+    """رتبه یک کاربر به همراه کاربران همسایه او در لیدربورد."""
+
+    total_users: int  # تعداد کل کاربران رتبهبندی شده
+    above: List[LeaderboardEntry] = []  # کاربران بالاتر (نزدیکترین در انتها)
+    below: List[LeaderboardEntry] = []  # کاربران پایینتر (نزدیکترین در ابتدا)
+
+
 class AdminUser(BaseModel):
     """مدل داده برای نمایش کاربر در پنل ادمین."""
 
@@ -0,0 +1,11 @@
+# conftest.py
+
+import os
+import sys
+
+# ماژول‌های backend به صورت مستقیم (مثل main و db) وارد می‌شوند
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# main هنگام import به تنظیمات Supabase نیاز دارد؛ درخواست‌ها به سرور واقعی نمی‌روند
+os.environ.setdefault("SUPABASE_URL", "http://supabase.test")
+os.environ.setdefault("SUPABASE_KEY", "test-key")
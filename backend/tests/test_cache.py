@@ -0,0 +1,149 @@
+# test_cache.py
+#
+# رفتار ReadThroughCache روی هر دو ذخیره‌ساز: MemoryCache و RedisCache با
+# fakeredis به جای سرور Redis واقعی.
+
+import asyncio
+
+import fakeredis
+import pytest
+
+from cache import MemoryCache, ReadThroughCache, RedisCache
+
+
+@pytest.fixture(params=["memory", "redis"])
+def cache(request):
+    if request.param == "memory":
+        backend = MemoryCache(max_entries=100)
+    else:
+        backend = RedisCache(fakeredis.FakeAsyncRedis(), prefix="test:")
+    return ReadThroughCache(backend, ttl=30)
+
+
+class Loader:
+    """loader شمارنده‌دار؛ delay اجرای هم‌زمان را شبیه‌سازی می‌کند."""
+
+    def __init__(self, value=None, delay: float = 0):
+        self.value = value
+        self.delay = delay
+        self.calls = []
+
+    async def __call__(self, *args):
+        self.calls.append(args)
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        return self.value
+
+
+def test_invalidate_changes_namespace_version(cache):
+    async def run():
+        posts = Loader({"items": [1, 2]})
+        other = Loader({"items": [3]})
+        assert await cache.get_or_load("posts", (20,), posts) == {"items": [1, 2]}
+        assert await cache.get_or_load("posts", (20,), posts) == {"items": [1, 2]}
+        await cache.get_or_load("comments:1", (), other)
+        before = await cache.validator("posts")
+
+        await cache.invalidate("posts")
+        posts.value = {"items": [9]}
+        assert await cache.get_or_load("posts", (20,), posts) == {"items": [9]}
+        await cache.get_or_load("comments:1", (), other)
+        assert await cache.validator("posts") != before
+        return posts, other
+
+    posts, other = asyncio.run(run())
+    assert len(posts.calls) == 2
+    assert len(other.calls) == 1  # فضای نام دیگر نامعتبر نشده است
+    assert cache.hits == 2 and cache.invalidations == 1
+
+
+def test_none_is_not_cached(cache):
+    async def run():
+        missing = Loader(None)
+        assert await cache.get_or_load("post:404", (), missing) is None
+        assert await cache.get_or_load("post:404", (), missing) is None
+        return missing
+
+    assert len(asyncio.run(run()).calls) == 2
+
+
+def test_concurrent_misses_share_one_load(cache):
+    async def run():
+        loader = Loader({"items": []}, delay=0.05)
+        results = await asyncio.gather(*[
+            cache.get_or_load("posts", (20,), loader) for _ in range(10)
+        ])
+        return loader, results
+
+    loader, results = asyncio.run(run())
+    assert len(loader.calls) == 1
+    assert results == [{"items": []}] * 10
+
+
+def test_get_or_load_many_loads_only_missing(cache):
+    async def run():
+        await cache.get_or_load("post:1", (), Loader({"id": 1}))
+        loader = Loader()
+        loader.value = {2: {"id": 2}, 3: None}
+        found = await cache.get_or_load_many("post:", [1, 2, 3], loader)
+        again = await cache.get_or_load_many("post:", [1, 2], Loader({}))
+        await cache.invalidate("post:2")
+        reloaded = Loader({2: {"id": 2, "title": "new"}})
+        fresh = await cache.get_or_load_many("post:", [1, 2], reloaded)
+        return loader, found, again, reloaded, fresh
+
+    loader, found, again, reloaded, fresh = asyncio.run(run())
+    assert loader.calls == [([2, 3],)]
+    assert found == {1: {"id": 1}, 2: {"id": 2}}  # None ذخیره و برگردانده نمی‌شود
+    assert again == {1: {"id": 1}, 2: {"id": 2}}
+    # ورودی‌های همان get_or_load هستند و invalidate روی آنها هم اثر دارد
+    assert reloaded.calls == [([2],)]
+    assert fresh[2] == {"id": 2, "title": "new"}
+
+
+class BrokenBackend:
+    async def get(self, key):
+        raise ConnectionError("cache down")
+
+    async def set(self, key, value, ttl=None):
+        raise ConnectionError("cache down")
+
+    async def delete(self, key):
+        raise ConnectionError("cache down")
+
+    async def close(self):
+        pass
+
+    def stats(self) -> dict:
+        return {}
+
+
+def test_backend_errors_fall_back_to_loader():
+    cache = ReadThroughCache(BrokenBackend(), ttl=30)
+
+    async def run():
+        loader = Loader({"items": [1]})
+        value = await cache.get_or_load("posts", (20,), loader)
+        many = await cache.get_or_load_many("post:", [1], Loader({1: {"id": 1}}))
+        await cache.invalidate("posts")  # خطا درخواست را خراب نمی‌کند
+        version = await cache.validator("posts")
+        return value, many, version
+
+    value, many, version = asyncio.run(run())
+    assert value == {"items": [1]}
+    assert many == {1: {"id": 1}}
+    assert version is None
+    assert cache.errors == 4
+
+
+def test_failed_write_still_returns_value():
+    class ReadOnly(MemoryCache):
+        async def set(self, key, value, ttl=None):
+            if not key.startswith("gen:"):
+                raise ConnectionError("read only")
+            await super().set(key, value, ttl)
+
+    cache = ReadThroughCache(ReadOnly(), ttl=30)
+    loader = Loader({"items": []})
+    assert asyncio.run(cache.get_or_load("posts", (), loader)) == {"items": []}
+    assert cache.errors == 1
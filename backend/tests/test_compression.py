@@ -0,0 +1,133 @@
+# test_compression.py
+#
+# CompressionMiddleware روی یک برنامه کوچک Starlette: JSON بزرگ فشرده می‌شود و
+# پاسخ‌های کوچک، Range دار و جریان SSE دست‌نخورده می‌مانند.
+
+import gzip
+import json
+
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+import compression
+from compression import CompressionMiddleware
+
+ITEMS = [{"id": i, "title": f"post {i}"} for i in range(200)]
+
+
+async def big_json(request):
+    return JSONResponse(ITEMS)
+
+
+async def small_json(request):
+    return JSONResponse({"ok": True})
+
+
+async def streamed_json(request):
+    async def chunks():
+        for item in ITEMS:
+            yield json.dumps(item, separators=(",", ":")) + "\n"
+
+    return StreamingResponse(chunks(), media_type="application/json")
+
+
+async def partial_content(request):
+    return Response(
+        b"x" * 5000,
+        status_code=206,
+        media_type="text/plain",
+        headers={"Content-Range": "bytes 0-4999/10000"},
+    )
+
+
+async def ranged(request):
+    return Response(
+        b"x" * 5000, media_type="text/plain", headers={"Accept-Ranges": "bytes"}
+    )
+
+
+async def event_stream(request):
+    async def events():
+        for i in range(100):
+            yield f"data: {'x' * 50} {i}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+async def already_encoded(request):
+    return Response(
+        gzip.compress(b"x" * 5000),
+        media_type="text/plain",
+        headers={"Content-Encoding": "gzip"},
+    )
+
+
+app = Starlette(
+    routes=[
+        Route("/big", big_json),
+        Route("/small", small_json),
+        Route("/streamed", streamed_json),
+        Route("/partial", partial_content),
+        Route("/ranged", ranged),
+        Route("/events", event_stream),
+        Route("/encoded", already_encoded),
+    ]
+)
+app.add_middleware(CompressionMiddleware, minimum_size=500)
+client = TestClient(app)
+
+GZIP = {"Accept-Encoding": "gzip"}
+
+
+def test_large_json_is_gzipped():
+    response = client.get("/big", headers=GZIP)
+    assert response.headers["content-encoding"] == "gzip"
+    assert "accept-encoding" in response.headers["vary"].lower()
+    assert int(response.headers["content-length"]) < len(response.content)
+    assert response.json() == ITEMS
+
+
+def test_streamed_json_is_gzipped_without_length():
+    response = client.get("/streamed", headers=GZIP)
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    assert response.text.splitlines()[-1] == '{"id":199,"title":"post 199"}'
+
+
+def test_no_accept_encoding_is_identity():
+    response = client.get("/big", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in response.headers
+    assert response.json() == ITEMS
+
+
+@pytest.mark.parametrize(
+    "path, content_encoding",
+    [
+        ("/small", None),
+        ("/partial", None),
+        ("/ranged", None),
+        ("/events", None),
+        ("/encoded", "gzip"),  # بدنه دوباره فشرده نمی‌شود
+    ],
+)
+def test_skipped_responses(path, content_encoding):
+    response = client.get(path, headers=GZIP)
+    assert response.headers.get("content-encoding") == content_encoding
+    assert "accept-encoding" not in response.headers.get("vary", "").lower()
+
+
+def test_partial_content_keeps_original_bytes():
+    response = client.get("/partial", headers=GZIP)
+    assert response.status_code == 206
+    assert response.headers["content-length"] == "5000"
+    assert response.content == b"x" * 5000
+
+
+@pytest.mark.skipif(compression.brotli is None, reason="brotli نصب نیست")
+def test_brotli_is_preferred():
+    response = client.get("/big", headers={"Accept-Encoding": "gzip, br"})
+    assert response.headers["content-encoding"] == "br"
+    assert response.json() == ITEMS  # httpx با بسته brotli بدنه را باز می‌کند
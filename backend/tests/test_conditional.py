@@ -0,0 +1,73 @@
+# test_conditional.py
+#
+# درخواست‌های شرطی: مقایسه ضعیف If-None-Match، ساخت ETag و پاسخ 304 با
+# هدرهای کش در not_modified.
+
+import pytest
+from fastapi import Request, Response
+
+from conditional import conditional_stats, etag_matches, make_etag, not_modified
+
+ETAG = make_etag("posts", 3, "/posts?limit=20", None)
+
+
+@pytest.mark.parametrize(
+    "if_none_match, expected",
+    [
+        (None, False),
+        ("", False),
+        (ETAG, True),
+        (ETAG.removeprefix("W/"), True),  # مقایسه ضعیف: W/ نادیده گرفته می‌شود
+        (f'"other", {ETAG}', True),
+        (f' "other" ,  {ETAG} ', True),
+        ("*", True),
+        (' "other" ', False),
+        (ETAG[:-2] + '"', False),
+    ],
+)
+def test_etag_matches(if_none_match, expected):
+    assert etag_matches(if_none_match, ETAG) is expected
+
+
+def test_make_etag_depends_on_every_part():
+    base = make_etag("posts", 3, "/posts", None)
+    assert base == make_etag("posts", 3, "/posts", None)
+    variants = {
+        make_etag("posts", 4, "/posts", None),
+        make_etag("posts", 3, "/posts?limit=5", None),
+        make_etag("posts", 3, "/posts", "user_1"),
+    }
+    assert len(variants) == 3 and base not in variants
+    assert ETAG.startswith('W/"') and ETAG.endswith('"')
+
+
+def _request(if_none_match=None) -> Request:
+    headers = []
+    if if_none_match is not None:
+        headers.append((b"if-none-match", if_none_match.encode()))
+    return Request({"type": "http", "method": "GET", "headers": headers})
+
+
+def test_not_modified_returns_304_with_cache_headers():
+    before = conditional_stats.not_modified
+    result = not_modified(_request(ETAG), Response(), ETAG, private=False)
+    assert result.status_code == 304
+    assert result.body == b""
+    assert result.headers["etag"] == ETAG
+    assert result.headers["cache-control"].startswith("public, max-age=")
+    assert result.headers["vary"] == "Authorization"
+    assert conditional_stats.not_modified == before + 1
+
+
+def test_changed_etag_sets_headers_on_full_response():
+    response = Response()
+    assert not_modified(_request('W/"stale"'), response, ETAG, private=True) is None
+    assert response.headers["etag"] == ETAG
+    assert response.headers["cache-control"] == "private, no-cache"
+
+
+def test_missing_etag_only_sets_cache_control():
+    response = Response()
+    assert not_modified(_request("*"), response, None, private=False) is None
+    assert "etag" not in response.headers
+    assert response.headers["cache-control"].startswith("public")
@@ -0,0 +1,92 @@
+# test_leaderboard.py
+#
+# Leaderboard: رتبه‌بندی رقابتی هم‌امتیازها (۱، ۲، ۲، ۴) در top با offset،
+# rank و neighbors، و حفظ تغییرات هم‌زمان با بازسازی LeaderboardEngine.
+
+import asyncio
+
+from leaderboard import Leaderboard, LeaderboardEngine
+
+ROWS = [
+    {"user_id": "d", "name": "D", "coins": 5},
+    {"user_id": "a", "name": "A", "coins": 50},
+    {"user_id": "c", "name": "C", "coins": 20},
+    {"user_id": "b", "name": None, "coins": 20},
+    {"user_id": "e", "name": "E", "coins": 20},
+]
+
+
+def board() -> Leaderboard:
+    b = Leaderboard()
+    b.load(ROWS)
+    return b
+
+
+def ranks(entries):
+    return [(e["user_id"], e["rank"]) for e in entries]
+
+
+def test_ties_share_rank_and_skip_next():
+    assert ranks(board().top(10)) == [
+        ("a", 1),
+        ("b", 2),
+        ("c", 2),
+        ("e", 2),
+        ("d", 5),
+    ]
+
+
+def test_offset_inside_a_tie_keeps_tied_rank():
+    b = board()
+    assert ranks(b.top(2, offset=2)) == [("c", 2), ("e", 2)]
+    assert ranks(b.top(5, offset=3)) == [("e", 2), ("d", 5)]
+    assert b.top(2, offset=10) == []
+
+
+def test_rank_and_unknown_name():
+    b = board()
+    assert b.rank("e") == {"user_id": "e", "name": "E", "coins": 20, "rank": 2}
+    assert b.rank("b")["name"] == "Unknown"
+    assert b.rank("zz") is None
+
+
+def test_update_moves_user_and_keeps_name():
+    b = board()
+    b.update("d", 20)
+    assert ranks(b.top(10))[-1] == ("e", 2)
+    assert b.rank("d")["name"] == "D"
+    b.update("d", 60, "Dee")
+    assert b.top(1)[0] == {"user_id": "d", "name": "Dee", "coins": 60, "rank": 1}
+    b.remove("a")
+    assert len(b) == 4 and b.rank("c")["rank"] == 2
+
+
+def test_neighbors_window():
+    result = board().neighbors("c", 1)
+    assert result["rank"] == 2 and result["total_users"] == 5
+    assert ranks(result["above"]) == [("b", 2)]
+    assert ranks(result["below"]) == [("e", 2)]
+    top = board().neighbors("a", 2)
+    assert top["above"] == [] and ranks(top["below"]) == [("b", 2), ("c", 2)]
+
+
+def test_changes_during_rebuild_are_reapplied():
+    async def run():
+        gate = asyncio.Event()
+
+        async def loader():
+            await gate.wait()
+            return ROWS  # تصویر پیش از تغییرات زیر
+
+        engine = LeaderboardEngine(loader, rebuild_interval=0)
+        rebuild = asyncio.create_task(engine.rebuild())
+        await asyncio.sleep(0)
+        engine.update("d", 100)
+        engine.remove("a")
+        gate.set()
+        await rebuild
+        return engine
+
+    engine = asyncio.run(run())
+    assert ranks(engine.board.top(2)) == [("d", 1), ("b", 2)]
+    assert engine.board.rank("a") is None
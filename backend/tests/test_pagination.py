@@ -0,0 +1,98 @@
+# test_pagination.py
+#
+# نشانگر صفحه‌بندی keyset: رفت و برگشت encode/decode، رد نشانگر نامعتبر یا
+# دست‌کاری شده با خطای 400 و ساخت صفحه و شرط PostgREST.
+
+import base64
+import json
+
+import pytest
+from fastapi import HTTPException
+
+from pagination import decode_cursor, encode_cursor, keyset_page, split_page
+
+ROW = {"id": 42, "created_at": "2024-05-01T10:20:30.123456+00:00"}
+
+
+def _cursor(value) -> str:
+    raw = json.dumps(value).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor(ROW)
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (ROW["created_at"], 42)
+
+
+def test_decode_normalizes_timestamp():
+    assert decode_cursor(_cursor(["2024-05-01 10:20:30", "7"])) == (
+        "2024-05-01T10:20:30",
+        7,
+    )
+
+
+@pytest.mark.parametrize(
+    "cursor",
+    [
+        "",
+        "not base64!",
+        _cursor(["2024-05-01T10:20:30"]),  # بدون id
+        _cursor({"created_at": "2024-05-01", "id": 1}),
+        _cursor(["2024-05-01T10:20:30", "abc"]),
+        # تزریق به فیلتر PostgREST از راه created_at
+        _cursor(['2024-05-01",id.gt.0,created_at.lt."2030', 1]),
+    ],
+)
+def test_invalid_cursor_is_400(cursor):
+    with pytest.raises(HTTPException) as e:
+        decode_cursor(cursor)
+    assert e.value.status_code == 400
+
+
+class Query:
+    """کوئری PostgREST ساختگی که فراخوانی‌های زنجیره‌ای را ثبت می‌کند."""
+
+    def __init__(self):
+        self.calls = []
+
+    def __getattr__(self, name):
+        def call(*args, **kwargs):
+            self.calls.append((name, args, kwargs))
+            return self
+
+        return call
+
+
+def test_keyset_page_filters_after_cursor():
+    query = keyset_page(Query(), 20, encode_cursor(ROW))
+    created_at = ROW["created_at"]
+    assert query.calls == [
+        (
+            "or_",
+            (
+                f'created_at.lt."{created_at}",'
+                f'and(created_at.eq."{created_at}",id.lt.42)',
+            ),
+            {},
+        ),
+        ("order", ("created_at",), {"desc": True}),
+        ("order", ("id",), {"desc": True}),
+        ("limit", (21,), {}),
+    ]
+
+
+def test_first_page_has_no_filter():
+    assert [name for name, *_ in keyset_page(Query(), 5, None).calls] == [
+        "order",
+        "order",
+        "limit",
+    ]
+
+
+def test_split_page():
+    rows = [{"id": i, "created_at": f"2024-05-0{9 - i}T00:00:00"} for i in range(3)]
+    page, cursor = split_page(rows, 2)
+    assert page == rows[:2]
+    assert decode_cursor(cursor) == ("2024-05-08T00:00:00", 1)
+    assert split_page(rows, 3) == (rows, None)
@@ -0,0 +1,60 @@
+# test_projection.py
+#
+# پارامتر fields=: تبدیل به فیلدهای مدل با ترتیب ثابت، رد فیلد ناشناخته و
+# ستون‌های select لازم برای فیلدهای خواسته شده.
+
+import pytest
+from fastapi import HTTPException
+
+from projection import POST_COLUMNS, parse_fields, select_columns, wants
+from schemas import Posts
+
+
+def test_no_fields_means_all():
+    assert parse_fields(Posts, None) is None
+    assert wants(None, "liked_by_me")
+    assert select_columns(POST_COLUMNS, None) == ", ".join(POST_COLUMNS)
+
+
+def test_fields_follow_model_order():
+    assert parse_fields(Posts, "title, id,title,,like_count") == (
+        "id",
+        "title",
+        "like_count",
+    )
+    # ترتیب پارامتر روی نتیجه (کلید کش و ETag) اثری ندارد
+    assert parse_fields(Posts, "like_count,title,id") == parse_fields(
+        Posts, "id,title,like_count"
+    )
+
+
+def test_computed_fields_are_allowed():
+    assert parse_fields(Posts, "author_badge") == ("author_badge",)
+
+
+@pytest.mark.parametrize(
+    "fields, detail",
+    [
+        ("id,search,password", "password, search"),  # مرتب شده
+        ("", ""),
+        (" , ,", " , ,"),
+    ],
+)
+def test_unknown_or_empty_fields_are_400(fields, detail):
+    with pytest.raises(HTTPException) as e:
+        parse_fields(Posts, fields)
+    assert e.value.status_code == 400
+    assert e.value.detail.endswith(detail)
+
+
+def test_wants():
+    fields = parse_fields(Posts, "id,title")
+    assert wants(fields, "title")
+    assert not wants(fields, "liked_by_me", "viewed_by_me")
+
+
+def test_select_columns_adds_page_keys_only():
+    fields = parse_fields(Posts, "title,author_badge,liked_by_me")
+    # فیلدهای محاسبه‌شده و پرچم‌های کاربر ستون جدول نیستند
+    assert select_columns(POST_COLUMNS, fields) == "id, created_at, title"
+    assert select_columns(POST_COLUMNS, fields, required=()) == "title"
@@ -0,0 +1,152 @@
+# test_query_counts.py
+#
+# تعداد رفت و برگشت‌های پایگاه داده endpointهای نوشتن پست و کامنت، با
+# QueryCountMiddleware و یک PostgREST جعلی (httpx.MockTransport).
+#
+# اجرا (از پوشه backend):
+#     python -m pytest -q tests
+
+import json
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+import auth
+import db as db_module
+import main
+
+ROW = {
+    "id": 7,
+    "post_id": 5,
+    "user_id": "author",
+    "creator": "نویسنده",
+    "title": "عنوان",
+    "contains": "متن پست",
+    "content": "متن کامنت",
+    "created_at": "2024-01-01T00:00:00+00:00",
+    "like_count": 1,
+    "view_count": 0,
+    "liked_by_me": True,
+    "viewed_by_me": False,
+    "changed": True,
+    "author_coins": 12,
+}
+
+
+def _postgrest(request: httpx.Request) -> httpx.Response:
+    path = request.url.path
+    if path.endswith("/rpc/insert_comment"):
+        if json.loads(request.content)["post_id_in"] == 404:
+            return httpx.Response(
+                400,
+                json={
+                    "code": "P0002",
+                    "message": "post_not_found",
+                    "details": None,
+                    "hint": None,
+                },
+            )
+        return httpx.Response(200, json=ROW)
+    if "/rpc/" in path:
+        return httpx.Response(200, json=ROW)
+    if request.method == "DELETE":
+        return httpx.Response(204, headers={"Content-Range": "*/1"})
+    return httpx.Response(200, json=[])
+
+
+async def _user():
+    return {"sub": "viewer", "name": "کاربر", "email": "viewer@example.com"}
+
+
+@pytest.fixture(scope="module")
+def client():
+    # یک lifespan برای کل ماژول: نمونه‌های مشترک (event_bus، بافرها) به
+    # event loop همان اجرا وابسته‌اند
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(
+            db_module.Database,
+            "_http_client",
+            lambda self: httpx.AsyncClient(
+                transport=httpx.MockTransport(_postgrest), base_url="http://db.test"
+            ),
+        )
+        patch.setitem(main.app.dependency_overrides, auth.get_current_user, _user)
+        with TestClient(main.app) as test_client:
+            yield test_client
+
+
+@pytest.fixture(autouse=True)
+def clear_query_stats():
+    db_module.query_stats.routes.clear()
+
+
+def _queries(method: str, route: str) -> int:
+    requests, queries, _ = db_module.query_stats.routes[f"{method} {route}"]
+    assert requests == 1
+    return queries
+
+
+@pytest.mark.parametrize(
+    "method, path, route, body, expected",
+    [
+        ("POST", "/posts", "/posts", {"title": "عنوان", "contains": "متن"}, 1),
+        ("DELETE", "/posts/5", "/posts/{post_id}", None, 1),
+        ("POST", "/posts/5/like", "/posts/{post_id}/like", None, 1),
+        ("DELETE", "/posts/5/like", "/posts/{post_id}/like", None, 1),
+        (
+            "POST",
+            "/posts/5/comments",
+            "/posts/{post_id}/comments",
+            {"content": "سلام"},
+            1,
+        ),
+        (
+            "POST",
+            "/posts/5/comments/7/like",
+            "/posts/{post_id}/comments/{comment_id}/like",
+            None,
+            1,
+        ),
+        (
+            "DELETE",
+            "/posts/5/comments/7/like",
+            "/posts/{post_id}/comments/{comment_id}/like",
+            None,
+            1,
+        ),
+        # بازدیدها در ViewBuffer جمع و دسته‌ای ثبت می‌شوند؛ خود درخواست کوئری ندارد
+        ("POST", "/posts/5/view", "/posts/{post_id}/view", None, 0),
+        (
+            "POST",
+            "/posts/5/comments/7/view",
+            "/posts/{post_id}/comments/{comment_id}/view",
+            None,
+            0,
+        ),
+    ],
+)
+def test_write_endpoints_round_trips(client, method, path, route, body, expected):
+    response = client.request(method, path, json=body)
+    assert response.status_code < 300, response.text
+    assert _queries(method, route) == expected
+
+
+def test_comment_on_missing_post_is_one_query(client):
+    # وجود پست با کلید خارجی در همان درج بررسی می‌شود
+    response = client.post("/posts/404/comments", json={"content": "سلام"})
+    assert response.status_code == 404
+    assert _queries("POST", "/posts/{post_id}/comments") == 1
+
+
+def test_query_header(client):
+    # هدر با DB_QUERY_HEADER هنگام ساخت middleware فعال می‌شود؛ اینجا مستقیم
+    middleware = client.app.middleware_stack
+    while not isinstance(middleware, db_module.QueryCountMiddleware):
+        middleware = middleware.app
+    middleware.header = "X-DB-Queries"
+    try:
+        response = client.post("/posts/5/comments/7/like")
+    finally:
+        middleware.header = None
+    assert response.headers["X-DB-Queries"] == "1"
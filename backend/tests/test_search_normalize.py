@@ -0,0 +1,77 @@
+# test_search_normalize.py
+#
+# search_normalize (migrations/009_search.sql) فقط یک translate و lower است.
+# جدول‌های translate از خود فایل SQL خوانده و با همان معنای Postgres (نویسه
+# بدون معادل حذف می‌شود) در پایتون اعمال می‌شوند؛ پس هم ترتیب دو رشته و هم
+# یکسان‌سازی متن فارسی بدون پایگاه داده بررسی می‌شود.
+
+import re
+from pathlib import Path
+
+import pytest
+
+SQL = (
+    Path(__file__).resolve().parent.parent / "migrations" / "009_search.sql"
+).read_text(encoding="utf-8")
+
+LITERAL = re.compile(r"(U&)?'((?:[^']|'')*)'")
+
+
+def _literals(part: str) -> str:
+    text = ""
+    for unicode_escape, value in LITERAL.findall(part):
+        value = value.replace("''", "'")
+        if unicode_escape:
+            value = re.sub(r"\\([0-9A-Fa-f]{4})", lambda m: chr(int(m[1], 16)), value)
+        text += value
+    return text
+
+
+def _translate_table() -> dict:
+    body = SQL.split("create or replace function search_normalize", 1)[1]
+    args = body.split("coalesce(t, ''),", 1)[1].split("));", 1)[0]
+    # بدون توضیح‌ها؛ رشته اول تا سطری است که با ویرگول تمام می‌شود
+    lines = [line.split("--")[0] for line in args.splitlines()]
+    split = next(i for i, line in enumerate(lines) if line.rstrip().endswith("',"))
+    source = _literals("\n".join(lines[: split + 1]))
+    target = _literals("\n".join(lines[split + 1 :]))
+    assert len(source) == len(set(source)) and len(target) <= len(source)
+    return {
+        ord(ch): (target[i] if i < len(target) else None) for i, ch in enumerate(source)
+    }
+
+
+TABLE = _translate_table()
+
+
+def search_normalize(text: str) -> str:
+    return text.translate(TABLE).lower()
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("كتاب", "کتاب"),  # ک عربی
+        ("علي", "علی"),  # ی عربی
+        ("مصطفى", "مصطفی"),  # الف مقصوره
+        ("مدرسة", "مدرسه"),
+        ("خانۀ", "خانه"),
+        ("أحمد إبراهیم", "احمد ابراهیم"),
+        ("کتاب‌ها", "کتاب ها"),  # نیم‌فاصله
+        ("می‌روم", "می روم"),
+        ("كـــتاب", "کتاب"),  # کشیده
+        ("مُحَمَّد", "محمد"),  # اعراب
+        ("کتاباً", "کتابا"),  # تنوین
+        ("۱۴۰۳", "1403"),
+        ("٢٠٢٤", "2024"),
+        ("Python ۳ Guide", "python 3 guide"),
+        ("سلام", "سلام"),  # متن یکسان‌شده تغییر نمی‌کند
+    ],
+)
+def test_search_normalize(text, expected):
+    assert search_normalize(text) == expected
+
+
+def test_normalize_is_idempotent():
+    text = "كتابهاي مُحَمَّد‌ ۱۲"
+    assert search_normalize(search_normalize(text)) == search_normalize(text)
@@ -0,0 +1,90 @@
+# test_token_cache.py
+#
+# TokenCache: انقضا در زمان exp توکن، حذف LRU با سقف تعداد و حجم، و
+# صرف‌نظر کردن verify_token از اعتبارسنجی امضا برای توکن کش شده.
+
+import asyncio
+
+import pytest
+
+import auth
+from auth import TokenCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(auth.time, "time", lambda: now[0])
+    return now
+
+
+def test_entry_expires_at_token_exp(clock):
+    cache = TokenCache()
+    cache.put("t", {"sub": "u1", "exp": clock[0] + 60})
+    assert cache.get("t") == {"sub": "u1", "exp": clock[0] + 60}
+
+    clock[0] += 60
+    assert cache.get("t") is None
+    assert cache.stats()["entries"] == 0
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_tokens_without_exp_are_not_cached(clock):
+    cache = TokenCache()
+    cache.put("t", {"sub": "u1"})
+    cache.put("s", {"sub": "u1", "exp": "soon"})
+    assert cache.get("t") is None and cache.get("s") is None
+
+
+def test_least_recently_used_is_evicted(clock):
+    cache = TokenCache(max_entries=2)
+    exp = clock[0] + 60
+    cache.put("a", {"sub": "a", "exp": exp})
+    cache.put("b", {"sub": "b", "exp": exp})
+    cache.get("a")  # b قدیمی‌ترین استفاده را دارد
+    cache.put("c", {"sub": "c", "exp": exp})
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert cache.evictions == 1
+
+
+def test_byte_limit_evicts_and_skips_oversized(clock):
+    exp = clock[0] + 60
+    small = {"sub": "u", "exp": exp}
+    size = len(auth.json.dumps(small)) + TokenCache.ENTRY_OVERHEAD
+    cache = TokenCache(max_entries=100, max_bytes=size * 2)
+
+    cache.put("a", small)
+    cache.put("b", small)
+    cache.put("c", small)
+    assert cache.stats()["entries"] == 2
+    assert cache.stats()["bytes"] <= size * 2
+    assert cache.get("a") is None
+
+    cache.put("big", {"sub": "u", "exp": exp, "claims": "x" * size * 2})
+    assert cache.get("big") is None
+    assert cache.stats()["entries"] == 2
+
+
+def test_replacing_a_token_keeps_byte_count(clock):
+    cache = TokenCache()
+    payload = {"sub": "u", "exp": clock[0] + 60}
+    cache.put("t", payload)
+    before = cache.stats()["bytes"]
+    cache.put("t", payload)
+    stats = cache.stats()
+    assert (stats["entries"], stats["bytes"], stats["evictions"]) == (1, before, 0)
+
+
+def test_verify_token_skips_signature_check_when_cached(clock, monkeypatch):
+    cache = TokenCache()
+    monkeypatch.setattr(auth, "token_cache", cache)
+    payload = {"sub": "u1", "exp": clock[0] + 60}
+    cache.put("cached-token", payload)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("jwt.decode called for a cached token")
+
+    monkeypatch.setattr(auth.jwt, "decode", fail)
+    assert asyncio.run(auth.verify_token("cached-token")) == payload
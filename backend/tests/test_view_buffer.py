@@ -0,0 +1,100 @@
+# test_view_buffer.py
+#
+# ViewBuffer: حذف بازدید تکراری، برگشت بازدیدها به بافر پس از ثبت ناموفق،
+# سقف بافر (limit) و ثبت زودهنگام با رسیدن به max_pending.
+
+import asyncio
+
+from view_buffer import ViewBuffer
+
+
+class Sink:
+    """تابع flush ساختگی؛ fail خطای پایگاه داده را شبیه‌سازی می‌کند."""
+
+    def __init__(self):
+        self.batches = []
+        self.fail = False
+        self.during = None  # فراخوانی هم‌زمان با ثبت (مثلاً بازدید جدید)
+
+    async def __call__(self, views):
+        if self.during is not None:
+            self.during()
+        if self.fail:
+            raise ConnectionError("db down")
+        self.batches.append(sorted(views))
+
+
+def test_duplicates_are_buffered_once():
+    sink = Sink()
+    buffer = ViewBuffer("posts", sink)
+    assert buffer.add(1, "u1") is True
+    assert buffer.add(1, "u1") is False
+    assert buffer.add(1, "u2") is True
+
+    asyncio.run(buffer.flush())
+    assert sink.batches == [[(1, "u1"), (1, "u2")]]
+    assert buffer.depth == 0
+    assert (buffer.recorded, buffer.duplicates, buffer.flushed) == (2, 1, 2)
+
+
+def test_failed_flush_requeues_views():
+    sink = Sink()
+    buffer = ViewBuffer("posts", sink)
+    buffer.add(1, "u1")
+    sink.fail = True
+    # بازدیدی که هنگام ثبت ناموفق می‌رسد هم حفظ می‌شود
+    sink.during = lambda: buffer.add(2, "u1")
+
+    asyncio.run(buffer.flush())
+    assert buffer.depth == 2
+    assert buffer.flush_errors == 1
+    assert buffer.add(1, "u1") is False  # هنوز در بافر است
+
+    sink.fail = False
+    sink.during = None
+    asyncio.run(buffer.flush())
+    assert sink.batches == [[(1, "u1"), (2, "u1")]]
+    assert buffer.depth == 0 and buffer.dropped == 0
+
+
+def test_limit_drops_new_views():
+    buffer = ViewBuffer("posts", Sink(), limit=2)
+    assert buffer.add(1, "u1") and buffer.add(2, "u1")
+    assert buffer.add(3, "u1") is False
+    assert buffer.depth == 2 and buffer.dropped == 1
+
+
+def test_requeue_overflow_drops_oldest():
+    sink = Sink()
+    buffer = ViewBuffer("posts", sink, limit=3)
+    for item_id in (1, 2, 3):
+        buffer.add(item_id, "u1")
+    sink.fail = True
+    sink.during = lambda: [buffer.add(item_id, "u2") for item_id in (4, 5)]
+
+    asyncio.run(buffer.flush())
+    assert buffer.depth == 3
+    assert buffer.dropped == 2
+    sink.fail = False
+    sink.during = None
+    asyncio.run(buffer.flush())
+    assert sink.batches == [[(3, "u1"), (4, "u2"), (5, "u2")]]
+
+
+def test_max_pending_wakes_flush_loop():
+    async def run():
+        sink = Sink()
+        buffer = ViewBuffer("posts", sink, interval=3600, max_pending=2)
+        buffer.start()
+        buffer.add(1, "u1")
+        await asyncio.sleep(0.01)
+        assert sink.batches == []  # زیر max_pending تا interval صبر می‌کند
+        buffer.add(2, "u1")
+        await asyncio.sleep(0.01)
+        assert sink.batches == [[(1, "u1"), (2, "u1")]]
+
+        buffer.add(3, "u1")
+        await buffer.close()  # باقیمانده بافر پیش از خاموشی ثبت می‌شود
+        return sink
+
+    assert asyncio.run(run()).batches[-1] == [(3, "u1")]
@@ -0,0 +1,233 @@
+# uploads.py
+
+import base64
+import hashlib
+import json
+import os
+from typing import BinaryIO, Iterable
+
+import httpx
+from dotenv import load_dotenv
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+
+# این فایل آپلود فایل‌های بزرگ را بدون نگه داشتن کل فایل در حافظه انجام می‌دهد:
+# - BodySizeLimitMiddleware بدنه درخواست‌های آپلود را هنگام دریافت می‌شمارد و به
+#   محض عبور از سقف حجم، درخواست را با 413 رد می‌کند.
+# - upload_resumable فایل را تکه به تکه با پروتکل TUS (آپلود resumable در
+#   Supabase Storage) ارسال می‌کند؛ در هر لحظه حداکثر یک تکه در حافظه است.
+#   هش SHA-256 فایل پیش از آن یک بار با file_sha256 محاسبه می‌شود، چون مسیر
+#   محتوا-محور و بررسی تکراری بودن پیش از شروع آپلود به هش نیاز دارند.
+# - فایل‌ها محتوا-محور ذخیره می‌شوند (content_path): محتوای تکراری با کمک جدول
+#   file_objects (migrations/007) اصلاً دوباره آپلود نمی‌شود.
+
+# بارگذاری متغیرهای محیطی از فایل .env
+load_dotenv()
+
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(50 * 1024 * 1024)))
+# Supabase اندازه تکه‌های TUS را دقیقاً 6MB می‌خواهد (به جز تکه آخر)
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(6 * 1024 * 1024)))
+# سربار قالب multipart (مرزها و هدرهای هر بخش) علاوه بر خود فایل
+MULTIPART_OVERHEAD = 64 * 1024
+TUS_VERSION = "1.0.0"
+
+TOO_LARGE_DETAIL = (
+    f"حجم فایل نباید بیشتر از {UPLOAD_MAX_BYTES // (1024 * 1024)} مگابایت باشد."
+)
+
+
+class UploadTooLarge(HTTPException):
+    """بدنه درخواست از سقف حجم بیشتر شده است (413).
+
+    از HTTPException ارث می‌برد تا FastAPI آن را هنگام خواندن فرم به خطای
+    عمومی 400 تبدیل نکند.
+    """
+
+    def __init__(self):
+        super().__init__(status_code=413, detail=TOO_LARGE_DETAIL)
+
+
+class UploadStats:
+    """شمارنده‌های آپلود؛ peak_chunk_bytes بیشترین حافظه بافر شده برای یک آپلود است."""
+
+    def __init__(self):
+        self.uploads = 0
+        self.bytes = 0
+        self.rejected = 0
+        self.resumed_chunks = 0
+        self.in_flight = 0
+        self.peak_chunk_bytes = 0
+        self.deduplicated = 0
+        self.bytes_saved = 0
+
+    def stats(self) -> dict:
+        return {
+            "uploads": self.uploads,
+            "bytes": self.bytes,
+            "rejected_too_large": self.rejected,
+            "resumed_chunks": self.resumed_chunks,
+            "in_flight": self.in_flight,
+            "peak_chunk_bytes": self.peak_chunk_bytes,
+            "deduplicated": self.deduplicated,
+            "bytes_saved": self.bytes_saved,
+            "max_upload_bytes": UPLOAD_MAX_BYTES,
+            "chunk_size": UPLOAD_CHUNK_SIZE,
+        }
+
+
+upload_stats = UploadStats()
+
+
+class BodySizeLimitMiddleware:
+    """حجم بدنه درخواست‌های مسیرهای مشخص را محدود می‌کند (میان‌افزار ASGI).
+
+    اگر Content-Length از سقف بیشتر باشد، درخواست بدون خواندن بدنه رد می‌شود؛
+    در غیر این صورت بایت‌ها هنگام دریافت شمرده می‌شوند و با عبور از سقف (مثلاً
+    در ارسال chunked) خواندن با UploadTooLarge متوقف می‌شود.
+    """
+
+    def __init__(self, app, paths: Iterable[str], max_bytes: int):
+        self.app = app
+        self.paths = set(paths)
+        self.max_bytes = max_bytes
+
+    async def _reject(self, send):
+        upload_stats.rejected += 1
+        body = json.dumps({"detail": TOO_LARGE_DETAIL}, ensure_ascii=False).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"connection", b"close"),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            return await self.app(scope, receive, send)
+
+        length = dict(scope["headers"]).get(b"content-length")
+        if length is not None and length.isdigit() and int(length) > self.max_bytes:
+            return await self._reject(send)
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    upload_stats.rejected += 1
+                    raise UploadTooLarge()
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+def file_sha256(fileobj: BinaryIO, chunk_size: int = UPLOAD_CHUNK_SIZE) -> str:
+    """هش SHA-256 فایل را تکه به تکه (بدون خواندن کل فایل در حافظه) محاسبه می‌کند."""
+    digest = hashlib.sha256()
+    fileobj.seek(0)
+    while block := fileobj.read(chunk_size):
+        digest.update(block)
+    fileobj.seek(0)
+    return digest.hexdigest()
+
+
+def content_path(sha256: str, extension: str) -> str:
+    """مسیر محتوا-محور یک فایل در باکت؛ محتوای یکسان همیشه به یک مسیر می‌رسد."""
+    suffix = f".{extension}" if extension else ""
+    return f"objects/{sha256[:2]}/{sha256}{suffix}"
+
+
+def _tus_metadata(**fields: str) -> str:
+    return ",".join(
+        f"{key} {base64.b64encode(value.encode()).decode()}"
+        for key, value in fields.items()
+    )
+
+
+async def _tus_offset(client: httpx.AsyncClient, location: str) -> int:
+    response = await client.head(location, headers={"Tus-Resumable": TUS_VERSION})
+    response.raise_for_status()
+    return int(response.headers["Upload-Offset"])
+
+
+def _read_at(fileobj: BinaryIO, offset: int, size: int) -> bytes:
+    fileobj.seek(offset)
+    return fileobj.read(size)
+
+
+async def upload_resumable(
+    client: httpx.AsyncClient,
+    bucket: str,
+    path: str,
+    fileobj: BinaryIO,
+    size: int,
+    content_type: str,
+    chunk_size: int = UPLOAD_CHUNK_SIZE,
+) -> None:
+    """فایل را تکه به تکه با TUS در Storage آپلود می‌کند.
+
+    client همان کلاینت http استوریج (با base_url و هدرهای احراز هویت) است. اگر
+    ارسال یک تکه ناموفق شود، offset فعلی از سرور پرسیده و ارسال از همان‌جا یک
+    بار دیگر ادامه پیدا می‌کند. خواندن تکه‌ها از فایل موقت (که ممکن است روی
+    دیسک باشد) خارج از event loop انجام می‌شود.
+    """
+    response = await client.post(
+        "upload/resumable",
+        headers={
+            "Tus-Resumable": TUS_VERSION,
+            "Upload-Length": str(size),
+            "Upload-Metadata": _tus_metadata(
+                bucketName=bucket,
+                objectName=path,
+                contentType=content_type,
+                cacheControl="3600",
+            ),
+            "x-upsert": "false",
+        },
+    )
+    response.raise_for_status()
+    location = response.headers["Location"]
+
+    offset = 0
+    upload_stats.in_flight += 1
+    try:
+        while offset < size:
+            chunk = await run_in_threadpool(_read_at, fileobj, offset, chunk_size)
+            if not chunk:
+                break
+            upload_stats.peak_chunk_bytes = max(
+                upload_stats.peak_chunk_bytes, len(chunk)
+            )
+            headers = {
+                "Tus-Resumable": TUS_VERSION,
+                "Upload-Offset": str(offset),
+                "Content-Type": "application/offset+octet-stream",
+            }
+            try:
+                response = await client.patch(location, content=chunk, headers=headers)
+                response.raise_for_status()
+                offset = int(response.headers.get("Upload-Offset", offset + len(chunk)))
+            except httpx.HTTPError:
+                # ادامه از آخرین offset ثبت شده در سرور (فقط یک تلاش مجدد برای هر تکه)
+                upload_stats.resumed_chunks += 1
+                resumed = await _tus_offset(client, location)
+                if resumed > offset:
+                    offset = resumed
+                    continue
+                response = await client.patch(location, content=chunk, headers=headers)
+                response.raise_for_status()
+                offset = int(response.headers.get("Upload-Offset", offset + len(chunk)))
+        if offset != size:
+            raise httpx.HTTPError(f"آپلود ناقص ماند ({offset} از {size} بایت)")
+    finally:
+        upload_stats.in_flight -= 1
+
+    upload_stats.uploads += 1
+    upload_stats.bytes += size
@@ -0,0 +1,143 @@
+# view_buffer.py
+
+import asyncio
+import os
+import time
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+# این فایل بافر write-behind بازدیدها را پیاده‌سازی می‌کند. بازدیدها (پربارترین
+# نوشتن برنامه) فوراً تأیید و در حافظه جمع می‌شوند و به صورت دوره‌ای با یک
+# فراخوانی دسته‌ای در پایگاه داده ثبت می‌شوند.
+#
+# پنجره از دست رفتن داده: اگر پردازه ناگهان متوقف شود، حداکثر بازدیدهای
+# VIEW_FLUSH_INTERVAL ثانیه آخر و حداکثر VIEW_MAX_PENDING بازدید از بین می‌رود
+# (با رسیدن بافر به این اندازه، ثبت فوراً انجام می‌شود). در خاموشی عادی بافر
+# پیش از بسته شدن اتصال‌ها خالی می‌شود.
+
+# بارگذاری متغیرهای محیطی از فایل .env
+load_dotenv()
+
+VIEW_FLUSH_INTERVAL = float(os.getenv("VIEW_FLUSH_INTERVAL", "5"))  # ثانیه
+VIEW_MAX_PENDING = int(os.getenv("VIEW_MAX_PENDING", "1000"))
+# سقف بافر وقتی ثبت در پایگاه داده پیاپی شکست می‌خورد؛ بیش از آن دور ریخته می‌شود
+VIEW_BUFFER_LIMIT = int(os.getenv("VIEW_BUFFER_LIMIT", "100000"))
+
+View = Tuple[int, str]  # (شناسه پست یا کامنت، شناسه کاربر)
+
+
+class ViewBuffer:
+    """بافر بازدیدهای یکتا (بر اساس شناسه و کاربر) با ثبت دسته‌ای دوره‌ای.
+
+    flush تابعی است که لیست بازدیدها را در پایگاه داده ثبت می‌کند؛ اگر خطا
+    بدهد بازدیدها به بافر برمی‌گردند و در دور بعد دوباره ارسال می‌شوند.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        flush: Callable[[List[View]], Awaitable[None]],
+        interval: float = VIEW_FLUSH_INTERVAL,
+        max_pending: int = VIEW_MAX_PENDING,
+        limit: int = VIEW_BUFFER_LIMIT,
+    ):
+        self.name = name
+        self._flush = flush
+        self.interval = interval
+        self.max_pending = max_pending
+        self.limit = limit
+        self._pending: dict = {}  # (id, user_id) -> زمان اولین ثبت
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        # شمارنده‌ها
+        self.recorded = 0
+        self.duplicates = 0
+        self.flushed = 0
+        self.flushes = 0
+        self.flush_errors = 0
+        self.dropped = 0
+
+    def add(self, item_id: int, user_id: str) -> bool:
+        """یک بازدید را به بافر اضافه می‌کند؛ اگر قبلاً در بافر بوده False برمی‌گرداند."""
+        key = (item_id, user_id)
+        if key in self._pending:
+            self.duplicates += 1
+            return False
+        if len(self._pending) >= self.limit:
+            self.dropped += 1
+            return False
+        self._pending[key] = time.monotonic()
+        self.recorded += 1
+        if len(self._pending) >= self.max_pending:
+            self._wakeup.set()
+        return True
+
+    async def flush(self):
+        """همه بازدیدهای فعلی بافر را ثبت می‌کند."""
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            batch, self._pending = self._pending, {}
+            try:
+                await self._flush(list(batch))
+            except Exception as e:
+                self.flush_errors += 1
+                print(f"خطا در ثبت بازدیدهای {self.name}: {e}")
+                # بازدیدهای ناموفق به بافر برمی‌گردند (با حفظ زمان اولین ثبت)
+                batch.update(self._pending)
+                overflow = len(batch) - self.limit
+                if overflow > 0:
+                    for key in list(batch)[:overflow]:
+                        del batch[key]
+                    self.dropped += overflow
+                self._pending = batch
+                return
+            self.flushes += 1
+            self.flushed += len(batch)
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        """حلقه ثبت دوره‌ای را متوقف و باقیمانده بافر را ثبت می‌کند."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    @property
+    def depth(self) -> int:
+        return len(self._pending)
+
+    def stats(self) -> dict:
+        oldest = min(self._pending.values(), default=None)
+        return {
+            "depth": self.depth,
+            "oldest_pending_seconds": (
+                round(time.monotonic() - oldest, 1) if oldest is not None else None
+            ),
+            "recorded": self.recorded,
+            "duplicates": self.duplicates,
+            "flushed": self.flushed,
+            "flushes": self.flushes,
+            "flush_errors": self.flush_errors,
+            "dropped": self.dropped,
+            "flush_interval_seconds": self.interval,
+            "max_pending": self.max_pending,
+        }
@@ -22,6 +22,8 @@ import SellProductModal from "./components/SellProductModal";
 import Leaderboard from "./components/Leaderboard";
 import AdminPanel from "./components/AdminPanel";
 import PurchaseConfirmation from "./components/PurchaseConfirmation";
+import { idempotentPost } from "./utils/idempotentPost";
+import { onLiveEvent } from "./utils/liveEvents";
 
 const TEXT = {
   en: {
@@ -57,6 +59,7 @@ const TEXT = {
     post: "Post",
     noPosts: "No posts yet.",
     loading: "Loading...",
+    loadMore: "Load more",
     addComment: "Add a Comment",
     commentPlaceholder: "Write your comment...",
     commenting: "Commenting...",
@@ -126,6 +129,7 @@ const TEXT = {
     post: "ارسال",
     noPosts: "هنوز پستی وجود ندارد.",
     loading: "در حال بارگذاری...",
+    loadMore: "نمایش بیشتر",
     addComment: "افزودن نظر",
     commentPlaceholder: "نظر خود را بنویسید...",
     commenting: "در حال ارسال نظر...",
@@ -168,11 +172,15 @@ interface PostDisponivel {
   id: string;
   title: string;
   contains: string;
-  likes: string[];
-  views: string[];
+  like_count: number;
+  view_count: number;
+  liked_by_me: boolean;
+  viewed_by_me: boolean;
   user_id: string;
   creator: string;
   created_at: string;
+  author_coins: number;
+  author_badge: string;
 }
 
 interface CommentDisponivel {
@@ -182,8 +190,12 @@ interface CommentDisponivel {
   creator: string;
   content: string;
   created_at: string;
-  likes: string[];
-  views: string[];
+  like_count: number;
+  view_count: number;
+  liked_by_me: boolean;
+  viewed_by_me: boolean;
+  author_coins: number;
+  author_badge: string;
 }
 
 interface Product {
@@ -195,12 +207,31 @@ interface Product {
   description: string;
   price: number;
   file_url: string;
+  purchase_count: number;
+  owned_by_me: boolean;
+  seller_coins: number;
+  seller_badge: string;
 }
 
 interface LibraryItem {
   product: Product;
 }
 
+function LoadMoreButton({
+  loading,
+  onClick,
+}: {
+  loading: boolean;
+  onClick: () => void;
+}) {
+  const { lang } = useLang();
+  return (
+    <button className="load-more-btn" onClick={onClick} disabled={loading}>
+      {loading ? TEXT[lang].loading : TEXT[lang].loadMore}
+    </button>
+  );
+}
+
 function PostCard({
   post,
   onLike,
@@ -217,25 +248,8 @@ function PostCard({
   const { lang } = useLang();
   const isFarsi = /[\u0600-\u06FF]/.test(post.contains);
   const isOwner = currentUserId ? post.user_id === currentUserId : false;
-  const hasLiked = currentUserId ? post.likes.includes(currentUserId) : false;
+  const hasLiked = currentUserId ? post.liked_by_me : false;
   const { getToken } = useAuth();
-  const [userCoins, setUserCoins] = useState<number>(0);
-
-  useEffect(() => {
-    const fetchUserCoins = async () => {
-      try {
-        const res = await fetch(`${API_URL}/users/${post.user_id}/coins`);
-        if (res.ok) {
-          const coins = await res.json();
-          setUserCoins(coins);
-        }
-      } catch (err) {
-        console.error("Failed to fetch user coins:", err);
-      }
-    };
-
-    fetchUserCoins();
-  }, [post.user_id]);
 
   const handleLikeClick = async (e: React.MouseEvent) => {
     e.stopPropagation();
@@ -292,7 +306,7 @@ function PostCard({
           <div className="post-author-with-badge">
             <span className="post-author">{post.creator}</span>
             <UserBadge
-              coins={userCoins}
+              coins={post.author_coins}
               lang={lang}
               size="small"
               showTooltip={true}
@@ -328,13 +342,13 @@ function PostCard({
           <svg viewBox="0 0 24 24" width="24" height="24">
             <path d="M12 21.35l-1.45-1.32C5.4 15.36 2 12.28 2 8.5 2 5.42 4.42 3 7.5 3c1.74 0 3.41.81 4.5 2.09C13.09 3.81 14.76 3 16.5 3 19.58 3 22 5.42 22 8.5c0 3.78-3.4 6.86-8.55 11.54L12 21.35z" />
           </svg>
-          <span className="like-count">{post.likes.length}</span>
+          <span className="like-count">{post.like_count}</span>
         </button>
         <div className="view-count">
           <svg viewBox="0 0 24 24" width="20" height="20">
             <path d="M12 4.5C7 4.5 2.73 7.61 1 12c1.73 4.39 6 7.5 11 7.5s9.27-3.11 11-7.5c-1.73-4.39-6-7.5-11-7.5zM12 17c-2.76 0-5-2.24-5-5s2.24-5 5-5 5 2.24 5 5-2.24 5-5 5zm0-8c-1.66 0-3 1.34-3 3s1.34 3 3 3 3-1.34 3-3-1.34-3-3-3z" />
           </svg>
-          <span>{post.views.length}</span>
+          <span>{post.view_count}</span>
         </div>
       </div>
     </li>
@@ -553,8 +567,10 @@ function SideNavigation({ currentPage, setPage }: NavProps) {
         setLoading(false);
         setInitialized(true);
       }
-      const interval = setInterval(fetchUserCoins, 10000);
-      return () => clearInterval(interval);
+      // تغییرات بعدی موجودی با رویداد زنده coins.updated می‌رسد
+      return onLiveEvent("coins.updated", (data) => {
+        if (data.user_id === user?.id) setCoins(data.coins);
+      });
     }
   }, [isSignedIn, user?.id, getToken, initialized]);
 
@@ -731,8 +747,10 @@ function BottomNavigation({ currentPage, setPage }: NavProps) {
 
     if (isSignedIn) {
       fetchUserCoins();
-      const interval = setInterval(fetchUserCoins, 10000);
-      return () => clearInterval(interval);
+      // تغییرات بعدی موجودی با رویداد زنده coins.updated می‌رسد
+      return onLiveEvent("coins.updated", (data) => {
+        if (data.user_id === user?.id) setCoins(data.coins);
+      });
     }
   }, [isSignedIn, user?.id, getToken]);
 
@@ -863,23 +881,32 @@ function MainFeed({
   const { user } = useUser();
   useTheme();
   const [posts, setPosts] = useState<PostDisponivel[]>([]);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
   const [loading, setLoading] = useState(false);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [error, setError] = useState("");
   const { getToken } = useAuth();
   const { lang } = useLang();
 
-  const fetchPosts = async () => {
-    setLoading(true);
+  const fetchPosts = async (before?: string) => {
+    if (before) setLoadingMore(true);
+    else setLoading(true);
     setError("");
     try {
-      const res = await fetch(`${API_URL}/posts`);
+      const token = await getToken({ template: "fullname" });
+      const query = before ? `?before=${encodeURIComponent(before)}` : "";
+      const res = await fetch(`${API_URL}/posts${query}`, {
+        headers: token ? { Authorization: `Bearer ${token}` } : {},
+      });
       if (!res.ok) throw new Error("Failed to fetch posts");
       const data = await res.json();
-      setPosts(data);
+      setPosts((prev) => (before ? [...prev, ...data.items] : data.items));
+      setNextCursor(data.next_cursor);
     } catch (err: any) {
       setError(err.message);
     } finally {
       setLoading(false);
+      setLoadingMore(false);
     }
   };
 
@@ -894,11 +921,29 @@ function MainFeed({
     }
   }, [newPost, setNewPost]);
 
+  useEffect(() => {
+    // شمارنده‌های لایک و بازدید و حذف پست‌ها به صورت زنده اعمال می‌شوند
+    const offUpdated = onLiveEvent("post.updated", (data) => {
+      setPosts((prev) =>
+        prev.map((p) =>
+          String(p.id) === String(data.id) ? { ...p, ...data, id: p.id } : p
+        )
+      );
+    });
+    const offDeleted = onLiveEvent("post.deleted", (data) => {
+      setPosts((prev) => prev.filter((p) => String(p.id) !== String(data.id)));
+    });
+    return () => {
+      offUpdated();
+      offDeleted();
+    };
+  }, []);
+
   const handleLike = async (id: string) => {
     try {
       const token = await getToken({ template: "fullname" });
       const post = posts.find((p) => p.id === id);
-      const hasLiked = post?.likes.includes(user?.id || "");
+      const hasLiked = post?.liked_by_me;
 
       const res = await fetch(`${API_URL}/posts/${id}/like`, {
         method: hasLiked ? "DELETE" : "POST",
@@ -958,18 +1003,26 @@ function MainFeed({
         ) : posts.length === 0 ? (
           <div>{TEXT[lang].noPosts}</div>
         ) : (
-          <ul className="post-list">
-            {posts.map((post) => (
-              <PostCard
-                key={post.id}
-                post={post}
-                onLike={handleLike}
-                onDelete={handleDelete}
-                currentUserId={user?.id || ""}
-                showAlert={showAlert}
+          <>
+            <ul className="post-list">
+              {posts.map((post) => (
+                <PostCard
+                  key={post.id}
+                  post={post}
+                  onLike={handleLike}
+                  onDelete={handleDelete}
+                  currentUserId={user?.id || ""}
+                  showAlert={showAlert}
+                />
+              ))}
+            </ul>
+            {nextCursor && (
+              <LoadMoreButton
+                loading={loadingMore}
+                onClick={() => fetchPosts(nextCursor)}
               />
-            ))}
-          </ul>
+            )}
+          </>
         )}
       </div>
     </main>
@@ -1100,53 +1153,43 @@ function PostPage({
   const [commentLoading, setCommentLoading] = useState(false);
   const [error, setError] = useState("");
   const [loading, setLoading] = useState(true);
-  const [postAuthorCoins, setPostAuthorCoins] = useState<number>(0);
-  const [commentCoins, setCommentCoins] = useState<{ [key: string]: number }>(
-    {}
-  );
+  const [commentsCursor, setCommentsCursor] = useState<string | null>(null);
+  const [loadingMoreComments, setLoadingMoreComments] = useState(false);
+
+  const fetchComments = async (before?: string) => {
+    try {
+      const token = await getToken({ template: "fullname" });
+      const query = before ? `?before=${encodeURIComponent(before)}` : "";
+      const res = await fetch(`${API_URL}/posts/${postId}/comments${query}`, {
+        headers: token ? { Authorization: `Bearer ${token}` } : {},
+      });
+      if (!res.ok) throw new Error("Failed to fetch comments");
+      const data = await res.json();
+      const page: CommentDisponivel[] = data.items;
+      setComments((prev) => (before ? [...prev, ...page] : page));
+      setCommentsCursor(data.next_cursor);
+    } catch (err: any) {
+      setError(err.message);
+    }
+  };
+
+  const loadMoreComments = async () => {
+    if (!commentsCursor) return;
+    setLoadingMoreComments(true);
+    await fetchComments(commentsCursor);
+    setLoadingMoreComments(false);
+  };
 
   useEffect(() => {
     const fetchPost = async () => {
       try {
-        const res = await fetch(`${API_URL}/posts/${postId}`);
+        const token = await getToken({ template: "fullname" });
+        const res = await fetch(`${API_URL}/posts/${postId}`, {
+          headers: token ? { Authorization: `Bearer ${token}` } : {},
+        });
         if (!res.ok) throw new Error("Failed to fetch post");
         const data = await res.json();
         setPost(data);
-
-        // Fetch post author coins
-        const coinsRes = await fetch(`${API_URL}/users/${data.user_id}/coins`);
-        if (coinsRes.ok) {
-          const coins = await coinsRes.json();
-          setPostAuthorCoins(coins);
-        }
-      } catch (err: any) {
-        setError(err.message);
-      }
-    };
-
-    const fetchComments = async () => {
-      try {
-        const res = await fetch(`${API_URL}/posts/${postId}/comments`);
-        if (!res.ok) throw new Error("Failed to fetch comments");
-        const data = await res.json();
-        setComments(data);
-
-        // Fetch coins for all comment authors
-        const coinsMap: { [key: string]: number } = {};
-        for (const comment of data) {
-          try {
-            const coinsRes = await fetch(
-              `${API_URL}/users/${comment.user_id}/coins`
-            );
-            if (coinsRes.ok) {
-              const coins = await coinsRes.json();
-              coinsMap[comment.user_id] = coins;
-            }
-          } catch (err) {
-            console.error("Failed to fetch coins for user:", comment.user_id);
-          }
-        }
-        setCommentCoins(coinsMap);
       } catch (err: any) {
         setError(err.message);
       }
@@ -1161,7 +1204,7 @@ function PostPage({
     if (!post) return;
     try {
       const token = await getToken({ template: "fullname" });
-      const hasLiked = post.likes.includes(user?.id || "");
+      const hasLiked = post.liked_by_me;
 
       const res = await fetch(`${API_URL}/posts/${post.id}/like`, {
         method: hasLiked ? "DELETE" : "POST",
@@ -1185,7 +1228,7 @@ function PostPage({
     try {
       const token = await getToken({ template: "fullname" });
       const comment = comments.find((c) => c.id === commentId);
-      const hasLiked = comment?.likes.includes(user?.id || "");
+      const hasLiked = comment?.liked_by_me;
 
       const res = await fetch(
         `${API_URL}/posts/${postId}/comments/${commentId}/like`,
@@ -1214,7 +1257,7 @@ function PostPage({
     try {
       const token = await getToken({ template: "fullname" });
       const comment = comments.find((c) => c.id === commentId);
-      if (!comment?.views.includes(user?.id || "")) {
+      if (comment && !comment.viewed_by_me) {
         const res = await fetch(
           `${API_URL}/posts/${postId}/comments/${commentId}/view`,
           {
@@ -1226,9 +1269,18 @@ function PostPage({
           }
         );
         if (!res.ok) throw new Error("Failed to update comment view count");
-        const updated = await res.json();
+        // Views are recorded in the background; update the count locally
+        const { queued } = await res.json();
         setComments((prev) =>
-          prev.map((c) => (c.id === updated.id ? updated : c))
+          prev.map((c) =>
+            c.id === commentId
+              ? {
+                  ...c,
+                  viewed_by_me: true,
+                  view_count: c.view_count + (queued ? 1 : 0),
+                }
+              : c
+          )
         );
       }
     } catch (err) {
@@ -1281,7 +1333,7 @@ function PostPage({
   if (!post) return <div className="post-page-error">Post not found</div>;
 
   const isFarsi = detectFarsi(post.contains);
-  const hasLiked = post?.likes.includes(user?.id || "");
+  const hasLiked = post?.liked_by_me;
 
   return (
     <main className="main-feed">
@@ -1312,7 +1364,7 @@ function PostPage({
               <div className="post-author-with-badge">
                 <span className="post-author">@{post.creator}</span>
                 <UserBadge
-                  coins={postAuthorCoins}
+                  coins={post.author_coins}
                   lang={lang}
                   size="small"
                   showTooltip={true}
@@ -1341,13 +1393,13 @@ function PostPage({
               <svg viewBox="0 0 24 24" width="24" height="24">
                 <path d="M12 21.35l-1.45-1.32C5.4 15.36 2 12.28 2 8.5 2 5.42 4.42 3 7.5 3c1.74 0 3.41.81 4.5 2.09C13.09 3.81 14.76 3 16.5 3 19.58 3 22 5.42 22 8.5c0 3.78-3.4 6.86-8.55 11.54L12 21.35z" />
               </svg>
-              <span className="like-count">{post.likes.length}</span>
+              <span className="like-count">{post.like_count}</span>
             </button>
             <div className="view-count">
               <svg viewBox="0 0 24 24" width="20" height="20">
                 <path d="M12 4.5C7 4.5 2.73 7.61 1 12c1.73 4.39 6 7.5 11 7.5s9.27-3.11 11-7.5c-1.73-4.39-6-7.5-11-7.5zM12 17c-2.76 0-5-2.24-5-5s2.24-5 5-5 5 2.24 5 5-2.24 5-5 5zm0-8c-1.66 0-3 1.34-3 3s1.34 3 3 3 3-1.34 3-3-1.34-3-3-3z" />
               </svg>
-              <span>{post.views.length}</span>
+              <span>{post.view_count}</span>
             </div>
           </div>
         </article>
@@ -1374,7 +1426,7 @@ function PostPage({
                     <div className="post-author-with-badge">
                       <span className="comment-author">{comment.creator}</span>
                       <UserBadge
-                        coins={commentCoins[comment.user_id] || 0}
+                        coins={comment.author_coins}
                         lang={lang}
                         size="small"
                         showTooltip={true}
@@ -1391,26 +1443,32 @@ function PostPage({
                   <div className="post-actions" style={{ direction: "ltr" }}>
                     <button
                       className={`like-btn ${
-                        comment.likes.includes(user?.id || "") ? "liked" : ""
+                        comment.liked_by_me ? "liked" : ""
                       }`}
                       onClick={() => handleCommentLike(comment.id)}
                     >
                       <svg viewBox="0 0 24 24" width="24" height="24">
                         <path d="M12 21.35l-1.45-1.32C5.4 15.36 2 12.28 2 8.5 2 5.42 4.42 3 7.5 3c1.74 0 3.41.81 4.5 2.09C13.09 3.81 14.76 3 16.5 3 19.58 3 22 5.42 22 8.5c0 3.78-3.4 6.86-8.55 11.54L12 21.35z" />
                       </svg>
-                      <span className="like-count">{comment.likes.length}</span>
+                      <span className="like-count">{comment.like_count}</span>
                     </button>
                     <div className="view-count">
                       <svg viewBox="0 0 24 24" width="20" height="20">
                         <path d="M12 4.5C7 4.5 2.73 7.61 1 12c1.73 4.39 6 7.5 11 7.5s9.27-3.11 11-7.5c-1.73-4.39-6-7.5-11-7.5zM12 17c-2.76 0-5-2.24-5-5s2.24-5 5-5 5 2.24 5 5-2.24 5-5 5zm0-8c-1.66 0-3 1.34-3 3s1.34 3 3 3 3-1.34 3-3-1.34-3-3-3z" />
                       </svg>
-                      <span>{comment.views.length}</span>
+                      <span>{comment.view_count}</span>
                     </div>
                   </div>
                 </li>
               ))}
             </ul>
           )}
+          {commentsCursor && (
+            <LoadMoreButton
+              loading={loadingMoreComments}
+              onClick={loadMoreComments}
+            />
+          )}
         </section>
         <SignedIn>
           <button
@@ -1695,58 +1753,28 @@ function MainArea({
 function ProductCard({
   product,
   onBuy,
+  onDownload,
   lang,
 }: {
   product: Product;
   onBuy: (product: Product) => void;
+  onDownload: (product: Product) => void;
   lang: "en" | "fa";
 }) {
-  const [sellerCoins, setSellerCoins] = useState<number>(0);
-  const [buyerCount, setBuyerCount] = useState<number>(0);
-
-  useEffect(() => {
-    const fetchSellerCoins = async () => {
-      try {
-        const res = await fetch(`${API_URL}/users/${product.seller_id}/coins`);
-        if (res.ok) {
-          const coins = await res.json();
-          setSellerCoins(coins);
-        }
-      } catch (err) {
-        console.error("Failed to fetch seller coins:", err);
-      }
-    };
-
-    const fetchBuyerCount = async () => {
-      try {
-        const res = await fetch(`${API_URL}/shop/products/${product.id}/stats`);
-        if (res.ok) {
-          const data = await res.json();
-          setBuyerCount(data.purchase_count || 0);
-        }
-      } catch (err) {
-        console.error("Failed to fetch buyer count:", err);
-      }
-    };
-
-    fetchSellerCoins();
-    fetchBuyerCount();
-  }, [product.seller_id]);
-
   return (
     <div className="product-card">
       <div className="product-seller">
         <span>{TEXT[lang].seller}:</span>
         <span>{product.seller_name}</span>
         <UserBadge
-          coins={sellerCoins}
+          coins={product.seller_coins}
           lang={lang}
           size="small"
           showTooltip={true}
           creator={product.seller_name}
         />
         <span className="product-buyer-count">
-          {buyerCount} {lang === "fa" ? "خریدار" : "buyers"}
+          {product.purchase_count} {lang === "fa" ? "خریدار" : "buyers"}
         </span>
       </div>
       <h3 className="product-title">{product.title}</h3>
@@ -1756,9 +1784,15 @@ function ProductCard({
           <CoinIcon />
           <span>{product.price}</span>
         </div>
-        <button className="buy-btn" onClick={() => onBuy(product)}>
-          {TEXT[lang].buy}
-        </button>
+        {product.owned_by_me ? (
+          <button className="download-btn" onClick={() => onDownload(product)}>
+            {TEXT[lang].download}
+          </button>
+        ) : (
+          <button className="buy-btn" onClick={() => onBuy(product)}>
+            {TEXT[lang].buy}
+          </button>
+        )}
       </div>
     </div>
   );
@@ -1782,7 +1816,11 @@ function ShopPage({ showAlert }: { showAlert: (message: string) => void }) {
     setLoading(true);
     setError("");
     try {
-      const res = await fetch(`${API_URL}/shop/products`);
+      // With a token the list also says which products the user already owns
+      const token = await getToken({ template: "fullname" });
+      const res = await fetch(`${API_URL}/shop/products`, {
+        headers: token ? { Authorization: `Bearer ${token}` } : {},
+      });
       if (!res.ok) throw new Error("Failed to fetch products");
       const data = await res.json();
       setProducts(data);
@@ -1791,7 +1829,7 @@ function ShopPage({ showAlert }: { showAlert: (message: string) => void }) {
     } finally {
       setLoading(false);
     }
-  }, []);
+  }, [getToken]);
 
   const fetchLibrary = useCallback(async () => {
     setLoading(true);
@@ -1819,6 +1857,30 @@ function ShopPage({ showAlert }: { showAlert: (message: string) => void }) {
     }
   }, [activeTab, fetchMarketplace, fetchLibrary]);
 
+  const handleDownload = async (product: Product) => {
+    // Open the tab synchronously so popup blockers allow it, then point it
+    // at the short-lived signed URL issued for this purchase.
+    const win = window.open("", "_blank");
+    if (win) win.opener = null;
+    try {
+      const token = await getToken({ template: "fullname" });
+      const res = await fetch(
+        `${API_URL}/shop/products/${product.id}/download`,
+        { headers: { Authorization: `Bearer ${token}` } }
+      );
+      if (!res.ok) {
+        const errData = await res.json();
+        throw new Error(errData.detail || "Download failed");
+      }
+      const { url } = await res.json();
+      if (win) win.location.href = url;
+      else window.location.assign(url);
+    } catch (err: any) {
+      win?.close();
+      showAlert(err.message || "Download failed");
+    }
+  };
+
   const handleBuy = async (product: Product) => {
     // open confirmation modal handled by parent component render
     setConfirmProduct(product);
@@ -1836,12 +1898,9 @@ function ShopPage({ showAlert }: { showAlert: (message: string) => void }) {
           setConfirmOpen(false);
           try {
             const token = await getToken({ template: "fullname" });
-            const res = await fetch(
+            const res = await idempotentPost(
               `${API_URL}/shop/products/${confirmProduct.id}/buy`,
-              {
-                method: "POST",
-                headers: { Authorization: `Bearer ${token}` },
-              }
+              { headers: { Authorization: `Bearer ${token}` } }
             );
             if (!res.ok) {
               const errData = await res.json();
@@ -1909,6 +1968,7 @@ function ShopPage({ showAlert }: { showAlert: (message: string) => void }) {
                 key={product.id}
                 product={product}
                 onBuy={handleBuy}
+                onDownload={handleDownload}
                 lang={lang}
               />
             ))}
@@ -1928,14 +1988,12 @@ function ShopPage({ showAlert }: { showAlert: (message: string) => void }) {
                   </span>
                 </div>
               </div>
-              <a
-                href={item.product.file_url}
-                target="_blank"
-                rel="noopener noreferrer"
+              <button
                 className="download-btn"
+                onClick={() => handleDownload(item.product)}
               >
                 {TEXT[lang].download}
-              </a>
+              </button>
             </div>
           ))}
         </div>
@@ -1963,6 +2021,8 @@ function ProfilePage() {
   const { getToken } = useAuth();
   const [activeTab, setActiveTab] = useState<"posts" | "level">("posts");
   const [userPosts, setUserPosts] = useState<PostDisponivel[]>([]);
+  const [postsCursor, setPostsCursor] = useState<string | null>(null);
+  const [loadingMorePosts, setLoadingMorePosts] = useState(false);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState("");
   const [coins, setCoins] = useState<number>(0);
@@ -2005,10 +2065,11 @@ function ProfilePage() {
       if (!postsResponse.ok) throw new Error("Failed to fetch user posts");
       if (!coinsResponse.ok) throw new Error("Failed to fetch user coins");
 
-      const userPosts = await postsResponse.json();
+      const postsPage = await postsResponse.json();
       const userCoins = await coinsResponse.json();
 
-      setUserPosts(userPosts);
+      setUserPosts(postsPage.items);
+      setPostsCursor(postsPage.next_cursor);
       setCoins(userCoins);
     } catch (err: any) {
       setError(err.message);
@@ -2017,6 +2078,26 @@ function ProfilePage() {
     }
   };
 
+  const loadMoreUserPosts = async () => {
+    if (!postsCursor) return;
+    try {
+      setLoadingMorePosts(true);
+      const token = await getToken({ template: "fullname" });
+      const res = await fetch(
+        `${API_URL}/myposts?before=${encodeURIComponent(postsCursor)}`,
+        { headers: { Authorization: `Bearer ${token}` } }
+      );
+      if (!res.ok) throw new Error("Failed to fetch user posts");
+      const postsPage = await res.json();
+      setUserPosts((prev) => [...prev, ...postsPage.items]);
+      setPostsCursor(postsPage.next_cursor);
+    } catch (err: any) {
+      setError(err.message);
+    } finally {
+      setLoadingMorePosts(false);
+    }
+  };
+
   useEffect(() => {
     if (user?.id) {
       fetchUserPosts();
@@ -2027,7 +2108,7 @@ function ProfilePage() {
     try {
       const token = await getToken({ template: "fullname" });
       const post = userPosts.find((p) => p.id === id);
-      const hasLiked = post?.likes.includes(user?.id || "");
+      const hasLiked = post?.liked_by_me;
 
       const res = await fetch(`${API_URL}/posts/${id}/like`, {
         method: hasLiked ? "DELETE" : "POST",
@@ -2128,18 +2209,26 @@ function ProfilePage() {
                         : "You haven't created any posts yet"}
                     </div>
                   ) : (
-                    <ul className="post-list">
-                      {userPosts.map((post) => (
-                        <PostCard
-                          key={post.id}
-                          post={post}
-                          onLike={handleLike}
-                          onDelete={handleDelete}
-                          currentUserId={user?.id}
-                          showAlert={() => {}}
+                    <>
+                      <ul className="post-list">
+                        {userPosts.map((post) => (
+                          <PostCard
+                            key={post.id}
+                            post={post}
+                            onLike={handleLike}
+                            onDelete={handleDelete}
+                            currentUserId={user?.id}
+                            showAlert={() => {}}
+                          />
+                        ))}
+                      </ul>
+                      {postsCursor && (
+                        <LoadMoreButton
+                          loading={loadingMorePosts}
+                          onClick={loadMoreUserPosts}
                         />
-                      ))}
-                    </ul>
+                      )}
+                    </>
                   )}
                 </div>
               ) : (
@@ -1,5 +1,6 @@
 import React, { useState, useEffect } from "react";
 import { useAuth } from "@clerk/clerk-react";
+import { idempotentPost } from "../utils/idempotentPost";
 
 interface AdminUser {
   id: number;
@@ -68,10 +69,9 @@ const AdminPanel: React.FC<AdminPanelProps> = ({ lang, showAlert }) => {
       setAddingCoins(true);
       const token = await getToken({ template: "fullname" });
       const amount = actionType === "add" ? coinsToAdd : -coinsToAdd;
-      const response = await fetch(
+      const response = await idempotentPost(
         `${API_URL}/admin/users/${selectedUser}/coins`,
         {
-          method: "POST",
           headers: {
             Authorization: `Bearer ${token}`,
             "Content-Type": "application/json",
@@ -1,4 +1,5 @@
 import React, { useState, useEffect } from 'react';
+import { useAuth } from '@clerk/clerk-react';
 
 interface LeaderboardEntry {
   user_id: string;
@@ -7,6 +8,10 @@ interface LeaderboardEntry {
   rank: number;
 }
 
+interface UserRank extends LeaderboardEntry {
+  total_users: number;
+}
+
 interface LeaderboardProps {
   lang: 'en' | 'fa';
 }
@@ -17,6 +22,8 @@ const Leaderboard: React.FC<LeaderboardProps> = ({ lang }) => {
   const [leaderboard, setLeaderboard] = useState<LeaderboardEntry[]>([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState('');
+  const [myRank, setMyRank] = useState<UserRank | null>(null);
+  const { isSignedIn, getToken } = useAuth();
 
   useEffect(() => {
     const fetchLeaderboard = async () => {
@@ -35,6 +42,22 @@ const Leaderboard: React.FC<LeaderboardProps> = ({ lang }) => {
     fetchLeaderboard();
   }, []);
 
+  useEffect(() => {
+    const fetchMyRank = async () => {
+      try {
+        const token = await getToken({ template: 'fullname' });
+        const response = await fetch(`${API_URL}/leaderboard/me?neighbors=0`, {
+          headers: { Authorization: `Bearer ${token}` },
+        });
+        if (response.ok) setMyRank(await response.json());
+      } catch (err) {
+        console.error('Failed to fetch my rank:', err);
+      }
+    };
+
+    if (isSignedIn) fetchMyRank();
+  }, [isSignedIn, getToken]);
+
   const getRankIcon = (rank: number) => {
     switch (rank) {
       case 1:
@@ -90,6 +113,13 @@ const Leaderboard: React.FC<LeaderboardProps> = ({ lang }) => {
           </div>
         ))}
       </div>
+      {myRank && !leaderboard.some((entry) => entry.user_id === myRank.user_id) && (
+        <div className="leaderboard-me">
+          {lang === 'fa'
+            ? `رتبه شما: ${myRank.rank} از ${myRank.total_users} (${myRank.coins} سکه)`
+            : `Your rank: ${myRank.rank} of ${myRank.total_users} (${myRank.coins} coins)`}
+        </div>
+      )}
     </div>
   );
 };
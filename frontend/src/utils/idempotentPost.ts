@@ -0,0 +1,21 @@
+// idempotentPost.ts
+// این فایل درخواست‌های POST را با هدر Idempotency-Key ارسال می‌کند تا تلاش مجدد
+// پس از قطع شبکه (وقتی درخواست اول شاید در سرور انجام شده باشد) دوباره سکه
+// کم یا اضافه نکند؛ سرور برای همان کلید پاسخ اول را برمی‌گرداند.
+
+export async function idempotentPost(
+  url: string,
+  init: RequestInit = {},
+  retries = 1
+): Promise<Response> {
+  const headers = new Headers(init.headers);
+  headers.set("Idempotency-Key", crypto.randomUUID());
+  for (let attempt = 0; ; attempt++) {
+    try {
+      return await fetch(url, { ...init, method: "POST", headers });
+    } catch (err) {
+      // فقط خطای شبکه دوباره امتحان می‌شود، نه پاسخ‌های خطای سرور
+      if (attempt >= retries) throw err;
+    }
+  }
+}
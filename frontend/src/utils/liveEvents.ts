@@ -0,0 +1,54 @@
+// liveEvents.ts
+// این فایل یک اتصال مشترک SSE به /events برای کل برنامه باز می‌کند تا
+// کامپوننت‌ها تغییرات (لایک، بازدید، کامنت و سکه) را همان لحظه دریافت کنند و
+// لازم نباشد هر کدام جداگانه و دوره‌ای از سرور بپرسند. اتصال با اولین مشترک باز
+// و با رفتن آخرین مشترک بسته می‌شود؛ EventSource پس از قطع شبکه خودکار دوباره
+// وصل می‌شود.
+
+const API_URL = import.meta.env.VITE_API_URL;
+
+export type LiveEventName =
+  | "post.created"
+  | "post.updated"
+  | "post.deleted"
+  | "comment.created"
+  | "comment.updated"
+  | "coins.updated";
+
+type Listener = (data: any) => void;
+
+const listeners = new Map<LiveEventName, Set<Listener>>();
+let source: EventSource | null = null;
+
+function connect() {
+  source = new EventSource(`${API_URL}/events`);
+  for (const name of listeners.keys()) attach(name);
+}
+
+function attach(name: LiveEventName) {
+  source?.addEventListener(name, (e) => {
+    const data = JSON.parse((e as MessageEvent).data);
+    listeners.get(name)?.forEach((listener) => listener(data));
+  });
+}
+
+// listener را برای رویداد name ثبت می‌کند و تابع لغو اشتراک را برمی‌گرداند
+export function onLiveEvent(name: LiveEventName, listener: Listener) {
+  let set = listeners.get(name);
+  if (!set) {
+    set = new Set();
+    listeners.set(name, set);
+    if (source) attach(name);
+  }
+  set.add(listener);
+  if (!source) connect();
+
+  return () => {
+    set!.delete(listener);
+    if ([...listeners.values()].every((s) => s.size === 0)) {
+      source?.close();
+      source = null;
+      listeners.clear();
+    }
+  };
+}